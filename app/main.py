@@ -1,16 +1,57 @@
-from fastapi import FastAPI
-from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import asyncio
+import math
 import os
 
 from app.routes import courses
 from app.routes import quizzes
-load_dotenv()
+from app.routes import notes
+from app.routes import videos
+from app.routes import ai
+from app.routes import search
+from app.routes import metrics
+from app.services.job_service import job_queue
+from app.services.resilience import DeadlineMiddleware, UpstreamError
+from app.services.metrics import MetricsMiddleware
+from app.services.service_registry import ServiceNotConfigured
+from app.config import config
 
-app = FastAPI()
+def create_app() -> FastAPI:
+    ## OpenAI and Cloudinary clients are created on first use (service_registry): the app starts,
+    ## and the CRUD endpoints work, without their credentials.
+    app = FastAPI()
 
-app.include_router(courses.router)
-app.include_router(quizzes.router)
+    app.add_middleware(DeadlineMiddleware)
+    if config.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    for module in (courses, quizzes, notes, videos, ai, search, metrics):
+        app.include_router(module.router)
+
+    @app.exception_handler(ServiceNotConfigured)
+    async def service_not_configured(request: Request, exc: ServiceNotConfigured):
+        return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+    @app.exception_handler(UpstreamError)
+    async def upstream_error(request: Request, exc: UpstreamError):
+        # 429 (quota OpenAI), 503 (circuit ouvert), 504 (échéance de la requête dépassée)
+        headers = {"Retry-After": str(math.ceil(exc.retry_after))} if exc.retry_after is not None else None
+        return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)}, headers=headers)
+
+    @app.on_event("startup")
+    async def resume_jobs():
+        job_queue.bind_loop(asyncio.get_running_loop())
+        job_queue.resume_pending()
+
+    @app.on_event("shutdown")
+    def stop_jobs():
+        job_queue.shutdown(wait=False)
+
+    return app
+
+app = create_app()
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
@@ -3,4 +3,12 @@ from app.models.quiz import Quiz
 from app.models.question import Question
 from app.models.answer import Answer
 from app.models.note import Note
+from app.models.note_chunk_summary import NoteChunkSummary
+from app.models.flashcard import Flashcard
+from app.models.quiz_attempt import QuizAttempt
+from app.models.quiz_response import QuizResponse
+from app.models.quiz_stats import QuizStats
+from app.models.question_stats import QuestionStats
 from app.models.video import Video
+from app.models.job import Job
+from app.models.ai_cache import AICacheEntry
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, Text, DateTime
+from datetime import datetime
+from app.services.db import Base
+
+class AICacheEntry(Base):
+    __tablename__ = 'ai_cache_entries'
+    key = Column(String(64), primary_key=True) # sha256 of prompt, model and sampling parameters
+    model = Column(String(100), nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
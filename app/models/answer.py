@@ -7,6 +7,6 @@ class Answer(Base):
     id = Column(Integer, primary_key=True, index=True)
     text = Column(Text, nullable=False)
     is_correct = Column(Boolean, default=False, nullable=False)
-    question_id = Column(Integer, ForeignKey('questions.id'), nullable=False)
+    question_id = Column(Integer, ForeignKey('questions.id', ondelete='CASCADE'), nullable=False)
 
     question = relationship("Question", back_populates="answers")
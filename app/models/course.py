@@ -8,7 +8,8 @@ class Course(Base) :
     title = Column(String(200), nullable=False)
     description = Column(Text, nullable=True)
 
-    quizzes = relationship("Quiz", back_populates="course", cascade="all, delete")
-    videos = relationship("Video", back_populates="course", cascade="all, delete")
-    notes = relationship("Note", back_populates="course", cascade="all, delete")
+    # ON DELETE CASCADE en base : passive_deletes évite de charger les enfants pour les supprimer un par un
+    quizzes = relationship("Quiz", back_populates="course", cascade="all, delete", passive_deletes=True)
+    videos = relationship("Video", back_populates="course", cascade="all, delete", passive_deletes=True)
+    notes = relationship("Note", back_populates="course", cascade="all, delete", passive_deletes=True)
 
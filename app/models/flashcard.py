@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.services.db import Base
+
+class Flashcard(Base):
+    __tablename__ = 'flashcards'
+    __table_args__ = (
+        Index('ix_flashcards_note_id_position', 'note_id', 'position'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    note_id = Column(Integer, ForeignKey('notes.id', ondelete='CASCADE'), nullable=False)
+    content_hash = Column(String(64), nullable=False) # sha256 of the note content the card was generated from
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    position = Column(Integer, nullable=False, default=0)
+    num_cards = Column(Integer, nullable=True) # cards requested for the set (the model may return fewer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    note = relationship("Note", back_populates="flashcards")
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint
+from datetime import datetime
+from app.services.db import Base
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    __table_args__ = (UniqueConstraint('kind', 'idempotency_key', name='uq_jobs_kind_idempotency_key'),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(100), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="pending", index=True) # pending, running, succeeded, failed
+    idempotency_key = Column(String(255), nullable=True)
+    payload = Column(Text, nullable=False, default="{}") # JSON
+    result = Column(Text, nullable=True) # JSON
+    error = Column(Text, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True) # renewed while running; a stale running job is re-queued
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.services.db import Base
 
 class Note(Base):
     __tablename__ = 'notes'
+    __table_args__ = (
+        # keyset pagination: ORDER BY created_at, id (optionally filtered by course)
+        Index('ix_notes_created_at_id', 'created_at', 'id'),
+        Index('ix_notes_course_id_created_at_id', 'course_id', 'created_at', 'id'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
     content = Column(Text, nullable=False)
@@ -13,3 +18,9 @@ class Note(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     course = relationship("Course", back_populates="notes")
+    chunk_summaries = relationship(
+        "NoteChunkSummary", cascade="all, delete-orphan", passive_deletes=True,
+        order_by="NoteChunkSummary.position")
+    flashcards = relationship(
+        "Flashcard", back_populates="note", cascade="all, delete-orphan", passive_deletes=True,
+        order_by="Flashcard.position")
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index
+from datetime import datetime
+from app.services.db import Base
+
+class NoteChunkSummary(Base):
+    """Partial summary of one chunk of a note, reused while the chunk content is unchanged."""
+    __tablename__ = 'note_chunk_summaries'
+    __table_args__ = (
+        Index('ix_note_chunk_summaries_note_id_position', 'note_id', 'position'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    note_id = Column(Integer, ForeignKey('notes.id', ondelete='CASCADE'), nullable=False)
+    position = Column(Integer, nullable=False)
+    content_hash = Column(String(64), nullable=False) # sha256 of prompt version + chunk text
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -7,7 +7,9 @@ class Question(Base):
     id = Column(Integer, primary_key=True, index=True)
     text = Column(Text, nullable=False)
     explanation = Column(Text, nullable=True)
-    quiz_id = Column(Integer, ForeignKey('quizzes.id'), nullable=False)
+    quiz_id = Column(Integer, ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False)
+    position = Column(Integer, nullable=True) # order in the quiz
 
     quiz = relationship("Quiz", back_populates="questions")
-    answers = relationship("Answer", back_populates="question", cascade="all, delete")
+    answers = relationship("Answer", back_populates="question", cascade="all, delete", passive_deletes=True)
+    stats = relationship("QuestionStats", cascade="all, delete", passive_deletes=True)
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from app.services.db import Base
+
+class QuestionStats(Base):
+    # compteurs mis à jour à chaque tentative (upsert), jamais recalculés depuis quiz_responses
+    __tablename__ = 'question_stats'
+
+    question_id = Column(Integer, ForeignKey('questions.id', ondelete='CASCADE'), primary_key=True)
+    quiz_id = Column(Integer, ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False, index=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0)
@@ -8,7 +8,10 @@ class Quiz(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
     description = Column(Text, nullable=True)
-    course_id = Column(Integer, ForeignKey('courses.id'), nullable=False)
+    course_id = Column(Integer, ForeignKey('courses.id', ondelete='CASCADE'), nullable=False)
 
     course = relationship("Course", back_populates="quizzes")
-    questions = relationship("Question", back_populates="quiz", cascade="all, delete")
+    questions = relationship("Question", back_populates="quiz", cascade="all, delete", passive_deletes=True,
+                             order_by="(Question.position, Question.id)")
+    attempts = relationship("QuizAttempt", cascade="all, delete", passive_deletes=True)
+    stats = relationship("QuizStats", cascade="all, delete", passive_deletes=True)
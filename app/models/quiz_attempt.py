@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.services.db import Base
+
+class QuizAttempt(Base):
+    __tablename__ = 'quiz_attempts'
+    __table_args__ = (
+        Index('ix_quiz_attempts_quiz_id_created_at', 'quiz_id', 'created_at'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    quiz_id = Column(Integer, ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False)
+    score = Column(Integer, nullable=False) # correctly answered questions
+    total = Column(Integer, nullable=False) # questions in the quiz when graded
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    responses = relationship("QuizResponse", back_populates="attempt", cascade="all, delete-orphan",
+                             passive_deletes=True)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, ForeignKey, Boolean
+from sqlalchemy.orm import relationship
+from app.services.db import Base
+
+class QuizResponse(Base):
+    __tablename__ = 'quiz_responses'
+
+    id = Column(Integer, primary_key=True, index=True)
+    attempt_id = Column(Integer, ForeignKey('quiz_attempts.id', ondelete='CASCADE'), nullable=False, index=True)
+    question_id = Column(Integer, ForeignKey('questions.id', ondelete='CASCADE'), nullable=False)
+    answer_id = Column(Integer, ForeignKey('answers.id', ondelete='SET NULL'), nullable=True) # None: not answered
+    is_correct = Column(Boolean, nullable=False)
+
+    attempt = relationship("QuizAttempt", back_populates="responses")
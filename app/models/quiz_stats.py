@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from app.services.db import Base
+
+class QuizStats(Base):
+    # compteurs mis à jour à chaque tentative (upsert), jamais recalculés depuis quiz_attempts
+    __tablename__ = 'quiz_stats'
+
+    quiz_id = Column(Integer, ForeignKey('quizzes.id', ondelete='CASCADE'), primary_key=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    correct = Column(Integer, nullable=False, default=0) # sum of the attempt scores
+    answered = Column(Integer, nullable=False, default=0) # sum of the attempt totals
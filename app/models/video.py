@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.services.db import Base
 
 class Video(Base):
     __tablename__ = 'videos'
+    __table_args__ = (
+        # keyset pagination: ORDER BY created_at, id (optionally filtered by course)
+        Index('ix_videos_created_at_id', 'created_at', 'id'),
+        Index('ix_videos_course_id_created_at_id', 'course_id', 'created_at', 'id'),
+        Index('ix_videos_pending_transcripts', 'is_synchronized', 'transcript_next_attempt_at'),
+    )
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
     description = Column(Text, nullable=True)
@@ -14,6 +20,9 @@ class Video(Base):
     transcript = Column(Text, nullable=True)
     course_id = Column(Integer, ForeignKey('courses.id', ondelete='CASCADE'), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
-    is_synchronized = Column(Boolean, default=True)
+    is_synchronized = Column(Boolean, default=True) # False while the transcript is pending
+    transcript_attempts = Column(Integer, default=0, nullable=False)
+    transcript_next_attempt_at = Column(DateTime, nullable=True) # retry backoff / worker lease
+    transcript_error = Column(Text, nullable=True)
 
     course = relationship("Course", back_populates="videos")
@@ -1,53 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Header
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
+from app.schemas.job import Job, JobAccepted
 from app.services.db import get_db
 from app.services.ai_service import AIService
+from app.services.ai_cache import ai_cache
+from app.services.job_service import job_queue, JobQueueFull, IdempotencyConflict
+from app.services.llm_scheduler import in_background
+from app.services.quiz_persistence import QuizPersistenceService
+from app.services.ai_streams import AIStreamService
+from app.services.sse import sse_response
 from app.models.course import Course as CourseModel
-from app.models.quiz import Quiz as QuizModel
-from app.models.question import Question as QuestionModel
-from app.models.answer import Answer as AnswerModel
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
-@router.post("/generate-quiz/{course_id}", status_code=status.HTTP_202_ACCEPTED)
-def generate_quiz(course_id: int, num_questions: int = 5, db: Session = Depends(get_db)):
+def run_generate_quiz_job(db: Session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    course_id = payload["course_id"]
     course = db.query(CourseModel).filter(CourseModel.id == course_id).first()
     if course is None:
-        raise HTTPException(status_code=404, detail="Course not found")
+        raise ValueError(f"Course with id {course_id} not found")
 
-    quiz_data = AIService.generate_quiz(
+    quiz_data = job_queue.run_coroutine(in_background(AIService.generate_quiz(
         course_title=course.title,
         course_description=course.description or "",
-        num_questions=num_questions
-    )
-
-    db_quiz = QuizModel(
-        title=quiz_data["title"],
-        description=quiz_data["description"],
-        course_id=course_id
-    )
-    db.add(db_quiz)
-    db.flush() # get quiz id
-
-    for question_data in quiz_data["questions"]:
-        db_question = QuestionModel(
-            text=question_data["text"],
-            explanation=question_data.get("explanation", ""),
-            quiz_id=db_quiz.id
+        num_questions=payload["num_questions"],
+        refresh=payload.get("refresh", False)
+    )))
+
+    quiz_id = QuizPersistenceService.create_quiz_tree(db, course_id, quiz_data)
+    db.commit()
+    return {"quiz_id": quiz_id}
+
+job_queue.register("generate_quiz", run_generate_quiz_job)
+
+@router.post("/generate-quiz/{course_id}", response_model=JobAccepted, status_code=status.HTTP_202_ACCEPTED)
+def generate_quiz(
+    course_id: int,
+    num_questions: int = 5,
+    refresh: bool = False,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    course = db.query(CourseModel).filter(CourseModel.id == course_id).first()
+    if course is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    AIService.ensure_configured()
+
+    try:
+        job, created = job_queue.submit(
+            db,
+            "generate_quiz",
+            {"course_id": course_id, "num_questions": num_questions, "refresh": refresh},
+            idempotency_key=idempotency_key
         )
-        db.add(db_question)
-        db.flush()
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "5"})
 
-        for answer_data in question_data["answers"]:
-            db_answer = AnswerModel(
-                text=answer_data["text"],
-                is_correct=answer_data["is_correct"],
-                question_id=db_question.id
-            )
-            db.add(db_answer)
+    message = "Quiz generation started" if created else "Quiz generation already requested"
+    return {"message": message, "job_id": job.id, "status": job.status}
 
-    db.commit()
+@router.post("/generate-quiz/{course_id}/stream")
+def stream_quiz(
+    course_id: int,
+    num_questions: int = 5,
+    refresh: bool = False,
+    tokens: bool = False,
+    db: Session = Depends(get_db)
+):
+    ## Server-sent events: "quiz", one "question" per generated question (already saved), then "done" or "error".
+    course = db.query(CourseModel).filter(CourseModel.id == course_id).first()
+    if course is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    AIService.ensure_configured()
+
+    return sse_response(AIStreamService.quiz_events(
+        course_id, course.title, course.description or "", num_questions, refresh=refresh, tokens=tokens
+    ))
+
+@router.get("/jobs/{job_id}", response_model=Job)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    job = job_queue.get(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-    return {"message": "Quiz generation started", "quiz_id": db_quiz.id}
\ No newline at end of file
+@router.get("/cache/stats")
+def get_cache_stats() -> Dict[str, Any]:
+    return ai_cache.stats()
@@ -1,16 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Any, Dict, List, Optional
 
+from app.config import config
 from app.schemas.course import Course, CourseCreate, CourseUpdate
+from app.schemas.course_transfer import CourseImportResult
+from app.schemas.flashcard import NoteFlashcards
 from app.models.course import Course as CourseModel
+from app.models.flashcard import Flashcard as FlashcardModel
+from app.models.note import Note as NoteModel
+from app.models.quiz import Quiz as QuizModel
+from app.models.video import Video as VideoModel
+from app.services.cloudinary_service import CloudinaryService
 from app.services.db import get_db
+from app.services.entity_cache import entity_cache
+from app.services.job_service import job_queue
+from app.services.quiz_grading import answer_keys
+from app.services.search_service import search_index
+from app.services.vector_index import vector_index
+from app.services.course_transfer import CourseImporter, CourseImportError, CourseTransferService, ndjson_lines
+from app.services.pagination import paginate, set_next_page_headers, InvalidCursor, MAX_PAGE_SIZE
 
 router = APIRouter(prefix="/courses", tags=["courses"])
 
+def run_delete_video_assets_job(db: Session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return CloudinaryService.delete_videos(payload["public_ids"])
+
+job_queue.register("delete_video_assets", run_delete_video_assets_job)
+
 @router.get("/", response_model=List[Course])
-def get_courses(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    courses = db.query(CourseModel).offset(skip).limit(limit).all()
+def get_courses(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    try:
+        courses, next_cursor = paginate(db.query(CourseModel), (CourseModel.id,), limit, cursor=cursor, skip=skip)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_next_page_headers(request, response, next_cursor)
     return courses
 
 @router.post("/", response_model=Course, status_code=status.HTTP_201_CREATED)
@@ -21,12 +55,66 @@ def create_course(course: CourseCreate, db: Session = Depends(get_db)):
     db.refresh(db_course)
     return db_course
 
+IMPORT_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/x-ndjson": {"schema": {"type": "string", "format": "binary"}}}
+    }
+}
+
+@router.post("/import", response_model=CourseImportResult, status_code=status.HTTP_201_CREATED,
+             openapi_extra=IMPORT_OPENAPI)
+async def import_courses(request: Request, db: Session = Depends(get_db)):
+    ## NDJSON body (same format as the export, several courses allowed), written in one transaction.
+    importer = CourseImporter(db)
+    try:
+        async for lines in ndjson_lines(request.stream(), config.COURSE_IMPORT_MAX_LINE_BYTES,
+                                        config.COURSE_IMPORT_BATCH_SIZE):
+            await run_in_threadpool(importer.feed, lines)
+        return await run_in_threadpool(importer.finish)
+    except CourseImportError as e:
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except BaseException:
+        await run_in_threadpool(db.rollback)
+        raise
+
+@router.get("/{course_id}/export", response_class=StreamingResponse,
+            responses={200: {"content": {"application/x-ndjson": {}}}})
+def export_course(course_id: int, db: Session = Depends(get_db)):
+    if db.query(CourseModel.id).filter(CourseModel.id == course_id).first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Course with id {course_id} not found")
+    return StreamingResponse(
+        CourseTransferService.export_chunks(course_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="course-{course_id}.ndjson"'}
+    )
+
 @router.get("/{course_id}", response_model=Course)
-def get_course(course_id: int, db: Session = Depends(get_db)):
-    course = db.query(CourseModel).filter(CourseModel.id == course_id).first()
-    if course is None:
+def get_course(course_id: int, request: Request, db: Session = Depends(get_db)):
+    def load():
+        course = db.query(CourseModel).filter(CourseModel.id == course_id).first()
+        if course is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Course with id {course_id} not found")
+        return course
+    return entity_cache.respond(request, ("course", course_id), Course, load)
+
+@router.get("/{course_id}/flashcards", response_model=List[NoteFlashcards])
+def get_course_flashcards(course_id: int, db: Session = Depends(get_db)):
+    ## Flashcards of every note of the course, fetched in one query (update_note deletes stale sets).
+    cards = (
+        db.query(FlashcardModel)
+        .join(NoteModel, FlashcardModel.note_id == NoteModel.id)
+        .filter(NoteModel.course_id == course_id)
+        .order_by(FlashcardModel.note_id, FlashcardModel.position)
+        .all()
+    )
+    by_note = {}
+    for card in cards:
+        by_note.setdefault(card.note_id, []).append(card)
+    if not by_note and db.query(CourseModel.id).filter(CourseModel.id == course_id).first() is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Course with id {course_id} not found")
-    return course
+    return [{"note_id": note_id, "flashcards": cards} for note_id, cards in by_note.items()]
 
 @router.put("/{course_id}", response_model=Course)
 def update_course(course_id: int, course: CourseUpdate, db: Session = Depends(get_db)):
@@ -39,15 +127,30 @@ def update_course(course_id: int, course: CourseUpdate, db: Session = Depends(ge
         setattr(db_course, key, value)
 
     db.commit()
+    entity_cache.invalidate("course", course_id)
     db.refresh(db_course)
     return db_course
 
 @router.delete("/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_course(course_id: int, db: Session = Depends(get_db)):
-    db_course = db.query(CourseModel).filter(CourseModel.id == course_id).first()
-    if db_course is None:
+    ## Notes, videos and quizzes go with the course through ON DELETE CASCADE; the Cloudinary files
+    ## of its videos are deleted afterwards by a background job.
+    if db.query(CourseModel.id).filter(CourseModel.id == course_id).first() is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Course with id {course_id} not found")
 
-    db.delete(db_course)
+    public_ids = [public_id for (public_id,) in
+                  db.query(VideoModel.cloudinary_public_id).filter(VideoModel.course_id == course_id)]
+    quiz_ids = [quiz_id for (quiz_id,) in db.query(QuizModel.id).filter(QuizModel.course_id == course_id)]
+    # le job est créé dans la même transaction : pas de fichiers orphelins si le processus s'arrête
+    job_id = job_queue.enqueue(db, "delete_video_assets", {"public_ids": public_ids}).id if public_ids else None
+    db.execute(delete(CourseModel).where(CourseModel.id == course_id))
     db.commit()
+
+    entity_cache.invalidate_course(course_id)
+    vector_index.drop_course(course_id)
+    search_index.remove_course(course_id)
+    for quiz_id in quiz_ids:
+        answer_keys.invalidate(quiz_id)
+    if job_id is not None:
+        job_queue.dispatch_committed(job_id)
     return None
\ No newline at end of file
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, HTTPException, Response
+from typing import Dict, Any
+
+from app.services.db import get_pool_status
+from app.services.metrics import registry
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=Response)
+def get_metrics():
+    ## Prometheus text exposition format.
+    if not registry.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@router.get("/metrics/db-pool")
+def get_db_pool_metrics() -> Dict[str, Any]:
+    return get_pool_status()
@@ -1,77 +1,148 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from app.schemas.note import Note, NoteCreate, NoteUpdate, NoteWithSummary
+from app.schemas.note import (
+    Note, NoteCreate, NoteUpdate, NoteWithSummary, NoteListItem, NOTE_LIST_FIELDS, NOTE_LIST_DEFAULT_FIELDS
+)
+from app.schemas.flashcard import NoteFlashcards
+from app.schemas.search import SimilarResult
 from app.services.db import get_db
+from app.services.entity_cache import entity_cache
+from app.services.fieldsets import select_fields, projected_query, rows_to_dicts, InvalidFields
+from app.services.pagination import paginate, set_next_page_headers, InvalidCursor, MAX_PAGE_SIZE
 from app.services.ai_service import AIService
+from app.services.note_summary import NoteSummaryService
+from app.services.flashcard_service import FlashcardService
+from app.services.resilience import UpstreamError
+from app.services.ai_streams import AIStreamService
+from app.services.sse import sse_response
+from app.services.vector_index import vector_index, DOC_TYPES
 from app.models.note import Note as NoteModel
+from app.models.flashcard import Flashcard as FlashcardModel
 from app.models.course import Course as CourseModel
 
 router = APIRouter(prefix="/notes", tags=["notes"])
 
-@router.get("/", response_model=List[Note])
+def _get_note(db: Session, note_id: int) -> NoteModel:
+    db_note = db.query(NoteModel).filter(NoteModel.id == note_id).first()
+    if db_note is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return db_note
+
+def _flashcards_response(note_id: int, flashcards: List[FlashcardModel]) -> NoteFlashcards:
+    # construite avant de rendre la session : aucun chargement différé sur la boucle d'événements
+    return NoteFlashcards.model_validate({"note_id": note_id, "flashcards": flashcards}, from_attributes=True)
+
+@router.get("/", response_model=List[NoteListItem], response_model_exclude_unset=True)
 def get_notes(
-    skip: int = 0, 
-    limit: int = 100, 
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     title: Optional[str] = None,
     course_id: Optional[int] = None,
+    fields: Optional[str] = Query(
+        None, description=f"Comma-separated fields among {', '.join(NOTE_LIST_FIELDS)} "
+                          f"(default: {', '.join(NOTE_LIST_DEFAULT_FIELDS)})"
+    ),
     db: Session = Depends(get_db)
 ):
-    ## Get all notes with options of filtering.
-    query = db.query(NoteModel)
+    ## Get all notes with options of filtering. content and summary are only selected when listed in fields.
+    try:
+        names = select_fields(fields, NOTE_LIST_FIELDS, NOTE_LIST_DEFAULT_FIELDS)
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    order_columns = (NoteModel.created_at, NoteModel.id)
+    query = projected_query(db, NoteModel, names, order_columns)
     if title:
         query = query.filter(NoteModel.title.contains(title))
     if course_id:
         query = query.filter(NoteModel.course_id == course_id)
-    notes = query.offset(skip).limit(limit).all()
-    return notes
+    try:
+        notes, next_cursor = paginate(query, order_columns, limit, cursor=cursor, skip=skip)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_page_headers(request, response, next_cursor)
+    return rows_to_dicts(notes, names)
 
 @router.post("/", response_model=Note, status_code=status.HTTP_201_CREATED)
-def create_note(note: NoteCreate, generate_summary: bool = True, db: Session = Depends(get_db)):
-    course = db.query(CourseModel).filter(CourseModel.id == note.course_id).first()
-    if course is None:
+async def create_note(note: NoteCreate, generate_summary: bool = True, db: Session = Depends(get_db)):
+    def course_exists() -> bool:
+        exists = db.query(CourseModel.id).filter(CourseModel.id == note.course_id).first() is not None
+        db.close() # connexion rendue au pool pendant l'appel OpenAI
+        return exists
+
+    def save(db_note: NoteModel) -> NoteModel:
+        db.add(db_note)
+        db.commit()
+        db.refresh(db_note)
+        return db_note
+
+    if not await run_in_threadpool(course_exists):
         raise HTTPException(status_code=404, detail="Course not found")
 
     db_note = NoteModel(**note.dict())
-    db.add(db_note)
-    db.flush()
-
-    if generate_summary:
-        summary = AIService.generate_summary(note.content)
-        db_note.summary = summary
-
-    db.commit()
-    db.refresh(db_note)
-    return db_note
+    # résumé avant l'INSERT : aucune transaction d'écriture ouverte pendant l'appel OpenAI
+    if generate_summary and AIService.is_configured():
+        chunks, known = NoteSummaryService.plan(db_note.content)
+        partials, summary = await NoteSummaryService.generate(chunks, known)
+        NoteSummaryService.apply(db_note, chunks, partials, summary)
+    return await run_in_threadpool(save, db_note)
 
 @router.get("/{note_id}", response_model=NoteWithSummary)
-def get_note(note_id: int, db: Session = Depends(get_db)):
-    note = db.query(NoteModel).filter(NoteModel.id == note_id).first()
-    if note is None:
-        raise HTTPException(status_code=404, detail="Note not found")
-    return note
+def get_note(note_id: int, request: Request, db: Session = Depends(get_db)):
+    def load():
+        note = db.query(NoteModel).filter(NoteModel.id == note_id).first()
+        if note is None:
+            raise HTTPException(status_code=404, detail="Note not found")
+        return note
+    return entity_cache.respond(request, ("note", note_id), NoteWithSummary, load)
 
 @router.put("/{note_id}", response_model=Note)
-def update_note(note_id: int, note: NoteUpdate, regenerate_summary: bool = False, db: Session = Depends(get_db)):
-    db_note = db.query(NoteModel).filter(NoteModel.id == note_id).first()
-    if db_note is None:
-        raise HTTPException(status_code=404, detail="Note not found")
-    if note.course_id is not None and note.course_id != db_note.course_id:
-        course = db.query(CourseModel).filter(CourseModel.id == note.course_id).first()
-        if course is None:
-            raise HTTPException(status_code=404, detail="Course not found")
-
+async def update_note(note_id: int, note: NoteUpdate, regenerate_summary: bool = False, db: Session = Depends(get_db)):
     update_data = note.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_note, key, value)
 
-    if regenerate_summary or 'content' in update_data:
-        db_note.summary = AIService.generate_summary(db_note.content)
-
-    db.commit()
-    db.refresh(db_note)
-    return db_note
+    def load() -> NoteModel:
+        db_note = _get_note(db, note_id)
+        if note.course_id is not None and note.course_id != db_note.course_id:
+            course = db.query(CourseModel.id).filter(CourseModel.id == note.course_id).first()
+            if course is None:
+                raise HTTPException(status_code=404, detail="Course not found")
+        return db_note
+
+    def plan() -> Tuple[List[str], Dict[str, str]]:
+        db_note = load()
+        chunks_and_known = NoteSummaryService.plan(update_data.get('content', db_note.content), db_note.chunk_summaries)
+        db.close() # connexion rendue au pool pendant l'appel OpenAI
+        return chunks_and_known
+
+    def save(chunks: Optional[List[str]], generated: Optional[Tuple[List[str], str]]) -> NoteModel:
+        db_note = load()
+        if update_data.get('content', db_note.content) != db_note.content:
+            FlashcardService.invalidate(db_note)
+        for key, value in update_data.items():
+            setattr(db_note, key, value)
+
+        if generated is not None:
+            partials, summary = generated
+            NoteSummaryService.apply(db_note, chunks, partials, summary)
+        elif 'content' in update_data:
+            db_note.summary = None # plus à jour ; sera regénéré par regenerate-summary
+
+        db.commit()
+        entity_cache.invalidate("note", note_id)
+        db.refresh(db_note)
+        return db_note
+
+    chunks = generated = None
+    if regenerate_summary or ('content' in update_data and AIService.is_configured()):
+        # seuls les blocs modifiés repassent par OpenAI
+        chunks, known = await run_in_threadpool(plan)
+        generated = await NoteSummaryService.generate(chunks, known)
+    return await run_in_threadpool(save, chunks, generated)
 
 @router.delete("/{note_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_note(note_id: int, db: Session = Depends(get_db)):
@@ -81,29 +152,88 @@ def delete_note(note_id: int, db: Session = Depends(get_db)):
 
     db.delete(db_note)
     db.commit()
+    entity_cache.invalidate("note", note_id)
     return None
 
 @router.post("/{note_id}/regenerate-summary", response_model=Note)
-def regenerate_summary(note_id: int, db: Session = Depends(get_db)):
-    db_note = db.query(NoteModel).filter(NoteModel.id == note_id).first()
-    if db_note is None:
+async def regenerate_summary(note_id: int, refresh: bool = False, db: Session = Depends(get_db)):
+    def plan() -> Tuple[List[str], Dict[str, str]]:
+        db_note = _get_note(db, note_id)
+        chunks_and_known = NoteSummaryService.plan(db_note.content, db_note.chunk_summaries, refresh=refresh)
+        db.close() # connexion rendue au pool pendant l'appel OpenAI
+        return chunks_and_known
+
+    def save(chunks: List[str], partials: List[str], summary: str) -> NoteModel:
+        db_note = _get_note(db, note_id)
+        NoteSummaryService.apply(db_note, chunks, partials, summary, refresh=refresh)
+        db.commit()
+        entity_cache.invalidate("note", note_id)
+        db.refresh(db_note)
+        return db_note
+
+    chunks, known = await run_in_threadpool(plan)
+    partials, summary = await NoteSummaryService.generate(chunks, known, refresh=refresh)
+    return await run_in_threadpool(save, chunks, partials, summary)
+
+@router.post("/{note_id}/regenerate-summary/stream")
+def stream_summary(note_id: int, refresh: bool = False, db: Session = Depends(get_db)):
+    ## Server-sent events: "token" deltas of the summary, then "done" (summary saved) or "error".
+    if db.query(NoteModel.id).filter(NoteModel.id == note_id).first() is None:
         raise HTTPException(status_code=404, detail="Note not found")
-
-    db_note.summary = AIService.generate_summary(db_note.content)
-
-    db.commit()
-    db.refresh(db_note)
-    return db_note
-
-@router.post("/{note_id}/generate-flashcards", status_code=status.HTTP_200_OK)
-def generate_flashcards(note_id: int, num_cards: int = 10, db: Session = Depends(get_db)):
+    AIService.ensure_configured()
+    return sse_response(AIStreamService.summary_events(note_id, refresh=refresh))
+
+@router.post("/{note_id}/generate-flashcards", response_model=NoteFlashcards, status_code=status.HTTP_200_OK)
+async def generate_flashcards(note_id: int, num_cards: int = 10, refresh: bool = False, db: Session = Depends(get_db)):
+    ## Generates the set once; later calls are served from the database until the content changes.
+    def load() -> Tuple[Optional[NoteFlashcards], str]:
+        db_note = _get_note(db, note_id)
+        stored = FlashcardService.stored(db_note, num_cards, refresh=refresh)
+        content = db_note.content
+        served = None if stored is None else _flashcards_response(note_id, stored)
+        db.close() # connexion rendue au pool pendant l'appel OpenAI
+        return served, content
+
+    def save(content: str, cards: List[Dict[str, str]]) -> NoteFlashcards:
+        db_note = _get_note(db, note_id)
+        stored = FlashcardService.store(db_note, content, cards, num_cards)
+        db.flush()
+        served = _flashcards_response(note_id, stored)
+        db.commit()
+        return served
+
+    served, content = await run_in_threadpool(load)
+    if served is not None:
+        return served
+    try:
+        cards = await FlashcardService.generate(content, num_cards, refresh=refresh)
+    except UpstreamError:
+        raise # 429 / 503 / 504 (gestionnaire de l'application)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+    return await run_in_threadpool(save, content, cards)
+
+@router.get("/{note_id}/flashcards", response_model=NoteFlashcards)
+def get_flashcards(note_id: int, db: Session = Depends(get_db)):
     db_note = db.query(NoteModel).filter(NoteModel.id == note_id).first()
     if db_note is None:
         raise HTTPException(status_code=404, detail="Note not found")
+    return {"note_id": note_id, "flashcards": db_note.flashcards}
 
-    flashcards = AIService.generate_flashcards(db_note.content, num_cards)
-
-    return {
-        "note_id": note_id,
-        "flashcards": flashcards
-    }
+@router.get("/{note_id}/related", response_model=List[SimilarResult])
+def get_related_notes(
+    note_id: int,
+    types: List[str] = Query(list(DOC_TYPES)),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    ## Notes and videos of the same course with the most similar content (vector index).
+    if not vector_index.enabled:
+        raise HTTPException(status_code=503, detail="Vector index is disabled")
+    note = db.query(NoteModel.course_id).filter(NoteModel.id == note_id).first()
+    if note is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    try:
+        return vector_index.related(db, note.course_id, "note", note_id, types=types, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,17 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
 
-from app.schemas.quiz import Quiz, QuizCreate, QuizUpdate, QuizWithQuestions
+from app.schemas.quiz import Quiz, QuizCreate, QuizUpdate, QuizWithQuestions, QuizWithQuestionsAndAnswers
+from app.schemas.quiz_attempt import QuizAttemptCreate, QuizAttemptResult, QuizStats
 from app.services.db import get_db
+from app.services.entity_cache import entity_cache
+from app.services.quiz_grading import QuizGradingService, InvalidAttempt, answer_keys
+from app.services.pagination import paginate, set_next_page_headers, InvalidCursor, MAX_PAGE_SIZE
 from app.models.quiz import Quiz as QuizModel
+from app.models.question import Question as QuestionModel
 from app.models.course import Course as CourseModel
 
 router = APIRouter(prefix="/quizzes", tags=["quizzes"])
 
 @router.get("/", response_model=List[Quiz])
-def get_quizzes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    quizzes = db.query(QuizModel).offset(skip).limit(limit).all()
+def get_quizzes(
+    request: Request,
+    response: Response,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    try:
+        quizzes, next_cursor = paginate(db.query(QuizModel), (QuizModel.id,), limit, cursor=cursor, skip=skip)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    set_next_page_headers(request, response, next_cursor)
     return quizzes
 
 @router.post("/", response_model=Quiz, status_code=status.HTTP_201_CREATED)
@@ -31,11 +47,33 @@ def create_quiz(quiz: QuizCreate, db: Session = Depends(get_db)):
     return db_quiz
 
 @router.get("/{quiz_id}", response_model=QuizWithQuestions)
-def get_quiz(quiz_id: int, db: Session = Depends(get_db)):
-    quiz = db.query(QuizModel).filter(QuizModel.id == quiz_id).first()
-    if quiz is None:
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    return quiz
+def get_quiz(quiz_id: int, request: Request, db: Session = Depends(get_db)):
+    def load():
+        quiz = (
+            db.query(QuizModel)
+            .options(selectinload(QuizModel.questions))
+            .filter(QuizModel.id == quiz_id)
+            .first()
+        )
+        if quiz is None:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        return quiz
+    return entity_cache.respond(request, ("quiz", quiz_id), QuizWithQuestions, load)
+
+@router.get("/{quiz_id}/full", response_model=QuizWithQuestionsAndAnswers)
+def get_quiz_full(quiz_id: int, request: Request, db: Session = Depends(get_db)):
+    ## Quiz -> questions -> answers in 3 queries, whatever the number of questions (select-in loading).
+    def load():
+        quiz = (
+            db.query(QuizModel)
+            .options(selectinload(QuizModel.questions).selectinload(QuestionModel.answers))
+            .filter(QuizModel.id == quiz_id)
+            .first()
+        )
+        if quiz is None:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        return quiz
+    return entity_cache.respond(request, ("quiz", quiz_id), QuizWithQuestionsAndAnswers, load, view="full")
 
 @router.put("/{quiz_id}", response_model=Quiz)
 def update_quiz(quiz_id: int, quiz: QuizUpdate, db: Session = Depends(get_db)):
@@ -54,6 +92,7 @@ def update_quiz(quiz_id: int, quiz: QuizUpdate, db: Session = Depends(get_db)):
         setattr(db_quiz, key, value)
 
     db.commit()
+    entity_cache.invalidate("quiz", quiz_id)
     db.refresh(db_quiz)
     return db_quiz
 
@@ -65,4 +104,25 @@ def delete_quiz(quiz_id: int, db: Session = Depends(get_db)):
 
     db.delete(db_quiz)
     db.commit()
-    return None
\ No newline at end of file
+    entity_cache.invalidate("quiz", quiz_id)
+    answer_keys.invalidate(quiz_id)
+    return None
+
+@router.post("/{quiz_id}/attempts", response_model=QuizAttemptResult, status_code=status.HTTP_201_CREATED)
+def submit_attempt(quiz_id: int, attempt: QuizAttemptCreate, db: Session = Depends(get_db)):
+    ## Graded on the server against the cached answer key: is_correct never has to reach the client before.
+    if db.query(QuizModel.id).filter(QuizModel.id == quiz_id).first() is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    try:
+        result = QuizGradingService.submit(db, quiz_id, attempt.responses)
+    except InvalidAttempt as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    db.commit()
+    return result
+
+@router.get("/{quiz_id}/stats", response_model=QuizStats)
+def get_quiz_stats(quiz_id: int, db: Session = Depends(get_db)):
+    if db.query(QuizModel.id).filter(QuizModel.id == quiz_id).first() is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    return QuizGradingService.get_stats(db, quiz_id)
\ No newline at end of file
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+
+from app.schemas.search import SearchResult, SimilarResult
+from app.services.db import get_db
+from app.services.search_service import SearchService, SEARCH_TYPES
+from app.services.vector_index import vector_index, DOC_TYPES
+from app.models.course import Course as CourseModel
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("/", response_model=List[SearchResult])
+def search(
+    q: str = Query(..., min_length=1),
+    course_id: Optional[int] = None,
+    types: List[str] = Query(list(SEARCH_TYPES)),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    ## Ranked full-text search over note titles/contents and video titles/descriptions/transcripts.
+    unknown = set(types) - set(SEARCH_TYPES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(sorted(unknown))}")
+    return SearchService.search(db, q, course_id=course_id, types=types, skip=skip, limit=limit)
+
+@router.get("/semantic", response_model=List[SimilarResult])
+def semantic_search(
+    q: str = Query(..., min_length=1),
+    course_id: int = Query(...),
+    types: List[str] = Query(list(DOC_TYPES)),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    ## Notes and videos of a course closest to the query in the vector index (no LLM call).
+    if not vector_index.enabled:
+        raise HTTPException(status_code=503, detail="Vector index is disabled")
+    if db.query(CourseModel.id).filter(CourseModel.id == course_id).first() is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    try:
+        return vector_index.search(db, course_id, q, types=types, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
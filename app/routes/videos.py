@@ -1,77 +1,209 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
+import os
 
-from app.schemas.video import Video, VideoCreate, VideoUpdate, VideoUpload, VideoWithTranscript
+from app.config import config
+from app.schemas.video import (
+    Video, VideoCreate, VideoUpdate, VideoWithTranscript, VideoListItem, VIDEO_LIST_FIELDS, VIDEO_LIST_DEFAULT_FIELDS
+)
 from app.services.db import get_db
+from app.services.entity_cache import entity_cache
+from app.services.fieldsets import select_fields, projected_query, rows_to_dicts, InvalidFields
+from app.services.pagination import paginate, set_next_page_headers, InvalidCursor, MAX_PAGE_SIZE
+from app.services.upload_spool import spool_to_disk, parse_multipart, UploadTooLarge
 from app.services.ai_service import AIService
 from app.services.cloudinary_service import CloudinaryService
+from app.services.service_registry import ServiceNotConfigured
+from app.services.resilience import UpstreamError
+from app.services.transcript_pipeline import transcript_pipeline
+from app.services.ai_streams import AIStreamService
+from app.services.sse import sse_response
+from app.services.vector_index import vector_index, DOC_TYPES
+from app.schemas.search import SimilarResult
 from app.models.video import Video as VideoModel
 from app.models.course import Course as CourseModel
 
 router = APIRouter(prefix="/videos", tags=["videos"])
 
-@router.get("/", response_model=List[Video])
+@router.on_event("startup")
+async def start_transcript_pipeline():
+    transcript_pipeline.start()
+
+@router.on_event("shutdown")
+async def stop_transcript_pipeline():
+    await transcript_pipeline.stop()
+
+@router.get("/", response_model=List[VideoListItem], response_model_exclude_unset=True)
 def get_videos(
-        skip: int = 0,
-        limit: int = 100,
+        request: Request,
+        response: Response,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
         title: Optional[str] = None,
         course_id: Optional[int] = None,
+        fields: Optional[str] = Query(
+            None, description=f"Comma-separated fields among {', '.join(VIDEO_LIST_FIELDS)} "
+                              f"(default: {', '.join(VIDEO_LIST_DEFAULT_FIELDS)})"
+        ),
         db: Session = Depends(get_db)
 ):
-    ## Get all videos with options of filtering.
-    query = db.query(VideoModel)
+    ## Get all videos with options of filtering. The transcript is only selected when listed in fields.
+    try:
+        names = select_fields(fields, VIDEO_LIST_FIELDS, VIDEO_LIST_DEFAULT_FIELDS)
+    except InvalidFields as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    order_columns = (VideoModel.created_at, VideoModel.id)
+    query = projected_query(db, VideoModel, names, order_columns)
     if title:
         query = query.filter(VideoModel.title.contains(title))
     if course_id:
         query = query.filter(VideoModel.course_id == course_id)
-    videos = query.offset(skip).limit(limit).all()
-    return videos
+    try:
+        videos, next_cursor = paginate(query, order_columns, limit, cursor=cursor, skip=skip)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    set_next_page_headers(request, response, next_cursor)
+    return rows_to_dicts(videos, names)
+
+VIDEO_METADATA_FIELDS = ("title", "description", "course_id")
+
+def _parse_video_metadata(metadata: Dict[str, Any]) -> VideoCreate:
+    try:
+        return VideoCreate(**metadata)
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
 
-@router.post("/upload", response_model=Video, status_code=status.HTTP_201_CREATED)
-def upload_video(video_data: VideoUpload, generate_transcript: bool = True, db: Session = Depends(get_db)):
-    course = db.query(CourseModel).filter(CourseModel.id == video_data.course_id).first()
+def _get_course_or_404(db: Session, course_id: int) -> CourseModel:
+    course = db.query(CourseModel).filter(CourseModel.id == course_id).first()
     if course is None:
         raise HTTPException(status_code=404, detail="Course not found")
+    return course
+
+def _get_video_or_404(db: Session, video_id: int) -> VideoModel:
+    video = db.query(VideoModel).filter(VideoModel.id == video_id).first()
+    if video is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    return video
 
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file", "title", "course_id"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary"},
+                        "title": {"type": "string"},
+                        "description": {"type": "string"},
+                        "course_id": {"type": "integer"}
+                    }
+                }
+            },
+            "video/*": {"schema": {"type": "string", "format": "binary"}},
+            "application/octet-stream": {"schema": {"type": "string", "format": "binary"}}
+        }
+    },
+    "parameters": [
+        {"name": name, "in": "query", "required": False, "schema": {"type": type_},
+         "description": "Video metadata when the body is the raw file"}
+        for name, type_ in (("title", "string"), ("description", "string"), ("course_id", "integer"))
+    ]
+}
+
+@router.post("/upload", response_model=Video, status_code=status.HTTP_201_CREATED, openapi_extra=UPLOAD_OPENAPI)
+async def upload_video(request: Request, generate_transcript: bool = True, db: Session = Depends(get_db)):
+    ## Accepts multipart/form-data (file + metadata fields) or the raw file as body (metadata in query).
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > config.VIDEO_UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Video file is too large")
+    CloudinaryService.ensure_configured()
+
+    def check_course(course_id: int) -> None:
+        _get_course_or_404(db, course_id)
+        db.close() # connexion rendue au pool pendant la réception du fichier et l'envoi à Cloudinary
+
+    def save(db_video: VideoModel) -> VideoModel:
+        db.add(db_video)
+        db.commit()
+        db.refresh(db_video)
+        return db_video
+
+    form = None
+    temp_path = None
     try:
-        upload_result = CloudinaryService.upload_video(video_data.file)
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            # parties fichier dans un SpooledTemporaryFile : mémoire bornée, taille totale bornée même sans Content-Length
+            try:
+                form = await parse_multipart(request.headers, request.stream(), config.VIDEO_UPLOAD_MAX_BYTES)
+            except MultiPartException as e:
+                raise HTTPException(status_code=400, detail=e.message)
+            upload = form.get("file")
+            if not isinstance(upload, UploadFile):
+                raise HTTPException(status_code=422, detail="Missing 'file' part")
+            metadata = {key: form.get(key) for key in VIDEO_METADATA_FIELDS if form.get(key) is not None}
+            video_data = _parse_video_metadata(metadata)
+            await run_in_threadpool(check_course, video_data.course_id)
+            source, filename = upload.file, upload.filename
+        else:
+            metadata = {key: request.query_params[key] for key in VIDEO_METADATA_FIELDS if key in request.query_params}
+            video_data = _parse_video_metadata(metadata)
+            await run_in_threadpool(check_course, video_data.course_id)
+            temp_path = await spool_to_disk(request.stream(), config.VIDEO_UPLOAD_MAX_BYTES, suffix=".mp4")
+            source, filename = temp_path, None
+
+        upload_result = await run_in_threadpool(CloudinaryService.upload_video, source, filename)
         db_video = VideoModel(
             title=video_data.title,
             description=video_data.description,
             course_id=video_data.course_id,
             cloudinary_public_id=upload_result["public_id"],
             cloudinary_url=upload_result["secure_url"],
-            duration=upload_result.get("duration")
+            duration=upload_result.get("duration"),
+            # la transcription est faite en arrière-plan par transcript_pipeline
+            is_synchronized=not generate_transcript
         )
 
-        db.add(db_video)
-        db.flush()
-
+        db_video = await run_in_threadpool(save, db_video)
         if generate_transcript:
-            transcript = AIService.generate_transcript(db_video.cloudinary_url)
-            db_video.transcript = transcript
-
-        db.commit()
-        db.refresh(db_video)
+            transcript_pipeline.notify()
         return db_video
 
+    except (HTTPException, RequestValidationError, ServiceNotConfigured, UpstreamError):
+        raise
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
     except ValueError as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=str(e))  # binascii.Error (invalid Base64)
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        db.rollback()
+        await run_in_threadpool(db.rollback)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error while uploading the video: {str(e)}"
         )
+    finally:
+        if form is not None:
+            await form.close()
+        if temp_path is not None:
+            os.unlink(temp_path)
 
 @router.get("/{video_id}", response_model=VideoWithTranscript)
-def get_video(video_id: int, db: Session = Depends(get_db)):
-    video = db.query(VideoModel).filter(VideoModel.id == video_id).first()
-    if video is None:
-        raise HTTPException(status_code=404, detail="Video not found")
-    return video
+def get_video(video_id: int, request: Request, db: Session = Depends(get_db)):
+    def load():
+        video = db.query(VideoModel).filter(VideoModel.id == video_id).first()
+        if video is None:
+            raise HTTPException(status_code=404, detail="Video not found")
+        return video
+    return entity_cache.respond(request, ("video", video_id), VideoWithTranscript, load)
 
 @router.put("/{video_id}", response_model=Video)
 def update_video(video_id: int, video: VideoUpdate, db: Session = Depends(get_db)):
@@ -89,6 +221,7 @@ def update_video(video_id: int, video: VideoUpdate, db: Session = Depends(get_db
         setattr(db_video, key, value)
 
     db.commit()
+    entity_cache.invalidate("video", video_id)
     db.refresh(db_video)
     return db_video
 
@@ -100,6 +233,8 @@ def delete_video(video_id: int, db: Session = Depends(get_db)):
 
     try:
         CloudinaryService.delete_video(db_video.cloudinary_public_id)
+    except (ServiceNotConfigured, UpstreamError):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -108,16 +243,56 @@ def delete_video(video_id: int, db: Session = Depends(get_db)):
 
     db.delete(db_video)
     db.commit()
+    entity_cache.invalidate("video", video_id)
     return None
 
 @router.post("/{video_id}/regenerate-transcript", response_model=Video)
-def regenerate_transcript(video_id: int, db: Session = Depends(get_db)):
+async def regenerate_transcript(video_id: int, refresh: bool = False, db: Session = Depends(get_db)):
+    def load() -> str:
+        db_video = _get_video_or_404(db, video_id)
+        url = db_video.cloudinary_url
+        db.close() # connexion rendue au pool pendant l'appel OpenAI
+        return url
+
+    def save(transcript: str) -> VideoModel:
+        db_video = _get_video_or_404(db, video_id)
+        db_video.transcript = transcript
+        db_video.is_synchronized = True
+        db_video.transcript_error = None
+        db_video.transcript_next_attempt_at = None
+
+        db.commit()
+        entity_cache.invalidate("video", video_id)
+        db.refresh(db_video)
+        return db_video
+
+    url = await run_in_threadpool(load)
+    transcript = await AIService.generate_transcript(url, refresh=refresh)
+    return await run_in_threadpool(save, transcript)
+
+@router.post("/{video_id}/regenerate-transcript/stream")
+def stream_transcript(video_id: int, refresh: bool = False, db: Session = Depends(get_db)):
+    ## Server-sent events: "token" deltas of the transcript, then "done" (transcript saved) or "error".
     db_video = db.query(VideoModel).filter(VideoModel.id == video_id).first()
     if db_video is None:
         raise HTTPException(status_code=404, detail="Video not found")
+    AIService.ensure_configured()
+    return sse_response(AIStreamService.transcript_events(video_id, db_video.cloudinary_url, refresh=refresh))
 
-    db_video.transcript = AIService.generate_transcript(db_video.cloudinary_url)
-
-    db.commit()
-    db.refresh(db_video)
-    return db_video
\ No newline at end of file
+@router.get("/{video_id}/related", response_model=List[SimilarResult])
+def get_related_videos(
+    video_id: int,
+    types: List[str] = Query(list(DOC_TYPES)),
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    ## Notes and videos of the same course with the most similar content (vector index).
+    if not vector_index.enabled:
+        raise HTTPException(status_code=503, detail="Vector index is disabled")
+    video = db.query(VideoModel.course_id).filter(VideoModel.id == video_id).first()
+    if video is None:
+        raise HTTPException(status_code=404, detail="Video not found")
+    try:
+        return vector_index.related(db, video.course_id, "video", video_id, types=types, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,48 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+
+# Lignes NDJSON de l'import/export : un objet par ligne, distingué par "type".
+# Une ligne "course" ouvre un cours ; les lignes suivantes lui appartiennent.
+
+class CourseRecord(BaseModel):
+    title: str
+    description: Optional[str] = None
+
+class NoteRecord(BaseModel):
+    title: str
+    content: str
+    summary: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class VideoRecord(BaseModel):
+    title: str
+    description: Optional[str] = None
+    cloudinary_public_id: str
+    cloudinary_url: str
+    duration: Optional[int] = None
+    transcript: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+class AnswerRecord(BaseModel):
+    text: str
+    is_correct: bool = False
+
+class QuestionRecord(BaseModel):
+    text: str
+    explanation: Optional[str] = None
+    answers: List[AnswerRecord] = []
+
+class QuizRecord(BaseModel):
+    title: str
+    description: Optional[str] = None
+    questions: List[QuestionRecord] = []
+
+class CourseImportResult(BaseModel):
+    course_ids: List[int] = []
+    notes: int = 0
+    videos: int = 0
+    quizzes: int = 0
+    questions: int = 0
+    answers: int = 0
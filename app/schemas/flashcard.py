@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List
+
+class Flashcard(BaseModel):
+    id: int
+    question: str
+    answer: str
+    position: int
+
+    class Config:
+        orm_mode = True
+
+class NoteFlashcards(BaseModel):
+    note_id: int
+    flashcards: List[Flashcard] = []
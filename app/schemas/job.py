@@ -0,0 +1,33 @@
+from pydantic import BaseModel, field_validator
+from typing import Optional, Any, Dict
+from datetime import datetime
+import json
+
+class JobBase(BaseModel):
+    kind: str
+    status: str
+
+class JobAccepted(BaseModel):
+    message: str
+    job_id: int
+    status: str
+
+class Job(JobBase):
+    id: int
+    idempotency_key: Optional[str] = None
+    payload: Dict[str, Any] = {}
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    # payload et result sont stockés en JSON (Text) dans la table jobs
+    @field_validator("payload", "result", mode="before")
+    @classmethod
+    def parse_json(cls, value):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    class Config:
+        orm_mode = True
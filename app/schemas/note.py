@@ -29,3 +29,16 @@ class Note(NoteInDBBase):
 
 class NoteWithSummary(Note):
     pass
+
+class NoteListItem(BaseModel):
+    # élément de GET /notes/ : seuls les champs sélectionnés (fields=) sont présents
+    id: int
+    title: Optional[str] = None
+    content: Optional[str] = None
+    summary: Optional[str] = None
+    course_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+NOTE_LIST_FIELDS = tuple(NoteListItem.model_fields)
+NOTE_LIST_DEFAULT_FIELDS = ("id", "title", "course_id", "created_at", "updated_at")
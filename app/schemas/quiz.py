@@ -1,7 +1,7 @@
 
 from pydantic import BaseModel
 from typing import Optional, List
-from app.schemas.question import Question
+from app.schemas.question import Question, QuestionWithAnswers
 
 class QuizBase(BaseModel):
     title: str
@@ -27,3 +27,8 @@ class QuizWithQuestions(Quiz):
     questions: List[Question] = []
     class Config:
         orm_mode = True
+
+class QuizWithQuestionsAndAnswers(Quiz):
+    questions: List[QuestionWithAnswers] = []
+    class Config:
+        orm_mode = True
@@ -0,0 +1,36 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from datetime import datetime
+
+class AttemptAnswer(BaseModel):
+    question_id: int
+    answer_id: Optional[int] = None # None : question passée
+
+class QuizAttemptCreate(BaseModel):
+    responses: List[AttemptAnswer] = []
+
+class GradedResponse(BaseModel):
+    question_id: int
+    answer_id: Optional[int] = None
+    is_correct: bool
+    correct_answer_ids: List[int] = []
+
+class QuizAttemptResult(BaseModel):
+    id: int
+    quiz_id: int
+    score: int
+    total: int
+    created_at: datetime
+    responses: List[GradedResponse] = []
+
+class QuestionStats(BaseModel):
+    question_id: int
+    attempts: int = 0
+    correct: int = 0
+    correct_rate: Optional[float] = None
+
+class QuizStats(BaseModel):
+    quiz_id: int
+    attempts: int = 0
+    average_score: Optional[float] = None # fraction of questions answered correctly
+    questions: List[QuestionStats] = []
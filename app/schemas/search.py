@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+
+class SearchResult(BaseModel):
+    type: str  # "note" ou "video"
+    id: int
+    title: str
+    course_id: int
+    rank: float
+
+class SimilarResult(BaseModel):
+    type: str  # "note" ou "video"
+    id: int
+    title: str
+    course_id: int
+    score: float  # similarité cosinus
@@ -10,9 +10,6 @@ class VideoBase(BaseModel):
 class VideoCreate(VideoBase):
     pass
 
-class VideoUpload(VideoCreate):
-    file: str  # Base64 encoded string de la vidéo
-
 class VideoUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -26,6 +23,8 @@ class VideoInDBBase(VideoBase):
     transcript: Optional[str] = None
     created_at: datetime
     is_synchronized: bool
+    transcript_attempts: int = 0
+    transcript_error: Optional[str] = None
 
     class Config:
         orm_mode = True
@@ -35,3 +34,21 @@ class Video(VideoInDBBase):
 
 class VideoWithTranscript(Video):
     pass
+
+class VideoListItem(BaseModel):
+    # élément de GET /videos/ : seuls les champs sélectionnés (fields=) sont présents
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    course_id: Optional[int] = None
+    cloudinary_public_id: Optional[str] = None
+    cloudinary_url: Optional[str] = None
+    duration: Optional[int] = None
+    transcript: Optional[str] = None
+    created_at: Optional[datetime] = None
+    is_synchronized: Optional[bool] = None
+    transcript_attempts: Optional[int] = None
+    transcript_error: Optional[str] = None
+
+VIDEO_LIST_FIELDS = tuple(VideoListItem.model_fields)
+VIDEO_LIST_DEFAULT_FIELDS = ("id", "title", "course_id", "cloudinary_url", "duration", "created_at", "is_synchronized")
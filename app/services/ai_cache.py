@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.config import config
+from app.models.ai_cache import AICacheEntry
+from app.services.db import SessionLocal
+from app.services.metrics import registry, gauge_lines
+
+logger = logging.getLogger(__name__)
+
+
+class AICache:
+    """Content-addressed cache of LLM responses: in-process LRU in front of the ai_cache_entries table."""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, enabled: bool = True):
+        self.enabled = enabled
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict() # key -> (expires_at, response)
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "db_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int) -> str:
+        payload = json.dumps(
+            {"messages": messages, "model": model, "temperature": temperature, "max_tokens": max_tokens},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, response = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return response
+                del self._entries[key]
+
+        response = self._load(key)
+        with self._lock:
+            if response is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["db_hits"] += 1
+        self._remember(key, response)
+        return response
+
+    def set(self, key: str, model: str, response: str) -> None:
+        self._remember(key, response)
+        try:
+            with SessionLocal() as db:
+                db.merge(AICacheEntry(key=key, model=model, response=response, created_at=datetime.utcnow()))
+                db.commit()
+        except SQLAlchemyError as e:
+            # le cache ne doit jamais faire échouer un appel IA
+            logger.error(f"Unable to persist AI cache entry: {e}")
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["db_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "max_entries": self._max_entries,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+            }
+
+    def _remember(self, key: str, response: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _load(self, key: str) -> Optional[str]:
+        try:
+            with SessionLocal() as db:
+                entry = db.query(AICacheEntry).filter(AICacheEntry.key == key).first()
+                if entry is None:
+                    return None
+                if entry.created_at < datetime.utcnow() - timedelta(seconds=self._ttl):
+                    db.delete(entry)
+                    db.commit()
+                    return None
+                return entry.response
+        except SQLAlchemyError as e:
+            logger.error(f"Unable to read AI cache entry: {e}")
+            return None
+
+
+ai_cache = AICache(max_entries=config.AI_CACHE_SIZE, ttl_seconds=config.AI_CACHE_TTL, enabled=config.AI_CACHE_ENABLED)
+
+
+def _collect_cache_metrics():
+    stats = ai_cache.stats()
+    lines = []
+    for key in ("memory_hits", "db_hits", "misses", "evictions"):
+        lines += gauge_lines(f"ai_cache_{key}_total", f"AI response cache {key.replace('_', ' ')}", stats[key], "counter")
+    lines += gauge_lines("ai_cache_size", "Entries in the in-process AI response cache", stats["size"])
+    return lines
+
+registry.register_collector(_collect_cache_metrics)
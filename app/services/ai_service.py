@@ -1,19 +1,58 @@
-import openai
+import asyncio
+import time
 import os
 import json
-from typing import Dict, Any
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Any, AsyncIterator, List, Callable, Optional
 
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("OPENAI_API_KEY is not set in the environment variables")
+from app.config import config
+from app.services.ai_cache import ai_cache
+from app.services.metrics import ai_request_duration, ai_tokens, ai_stream_first_token
+from app.services.llm_scheduler import estimate_tokens, llm_scheduler
+from app.services.resilience import (
+    DeadlineExceeded, UpstreamError, deadline_expired, hedged, openai_breaker, remaining
+)
+from app.services.service_registry import LazyModule, ServiceNotConfigured, services
+from app.services.single_flight import ai_flights
+from app.services.text_chunker import content_hash, split_into_chunks
 
-openai.api_key = openai_api_key
+openai = LazyModule("openai") # importé au premier appel : démarrage plus rapide sans IA
 
-class AIService:
-    @staticmethod
-    def generate_quiz(course_title: str, course_description: str, num_questions: int = 5) -> Dict[str, Any]:
-        """Generates a quiz based on the provided course."""
-        prompt = f"""Generate a quiz with {num_questions} questions on the topic: {course_title}.
+MODEL = "gpt-3.5-turbo"
+SUMMARY_PROMPT_VERSION = "v1" # à incrémenter quand le prompt de résumé change : invalide les résumés de blocs
+
+def _create_openai_client():
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not openai_api_key:
+        raise ServiceNotConfigured("OPENAI_API_KEY is not set in the environment variables")
+    import httpx
+
+    # Un seul client partagé : les connexions HTTP sont réutilisées entre les appels
+    return openai.AsyncOpenAI(
+        api_key=openai_api_key,
+        timeout=config.AI_TIMEOUT,
+        max_retries=0, # les nouvelles tentatives passent par llm_scheduler (budget, 429)
+        http_client=openai.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=config.AI_MAX_CONNECTIONS,
+                max_keepalive_connections=config.AI_MAX_CONNECTIONS
+            )
+        )
+    )
+
+services.register("openai", _create_openai_client)
+
+concurrency_limiter = asyncio.Semaphore(config.AI_MAX_CONCURRENCY)
+
+QUIZ_COMPLETION = {"max_tokens": 2000, "temperature": 0.7}
+TRANSCRIPT_COMPLETION = {"max_tokens": 2000, "temperature": 0.3}
+SUMMARY_MAP_COMPLETION = {"max_tokens": 300, "temperature": 0.3}
+SUMMARY_REDUCE_COMPLETION = {"max_tokens": 500, "temperature": 0.3}
+
+# Les variantes streaming réutilisent les mêmes prompts et paramètres : même clé de cache
+
+def _quiz_messages(course_title: str, course_description: str, num_questions: int) -> List[Dict[str, str]]:
+    prompt = f"""Generate a quiz with {num_questions} questions on the topic: {course_title}.
 
 Course description: {course_description}
 
@@ -38,59 +77,496 @@ Return format:
 }}
 Ensure the response is a valid JSON object.
 """
+    return [
+        {"role": "system", "content": "You are an assistant that generates educational quizzes."},
+        {"role": "user", "content": prompt}
+    ]
+
+def _parse_quiz(content: str) -> Dict[str, Any]:
+    quiz_data = json.loads(content)
+    if not all(key in quiz_data for key in ["title", "description", "questions"]):
+        raise ValueError("Invalid quiz format returned by OpenAI")
+    return quiz_data
+
+def _transcript_messages(video_url: str) -> List[Dict[str, str]]:
+    prompt = f"""You are an AI assistant capable of transcribing audio from a video. 
+The video is located at this URL: {video_url}. 
+Based on the content of this educational video, provide a textual transcript of the spoken content. 
+Return the transcript as a plain text string. If the transcription fails or the content is unclear, return 'Transcription not available'.
+"""
+    return [
+        {"role": "system", "content": "You are an AI that transcribes educational video content."},
+        {"role": "user", "content": prompt}
+    ]
+
+def normalize_transcript(transcript: str) -> str:
+    if not transcript or "transcription not available" in transcript.lower():
+        return "Transcription not available"
+    return transcript
+
+def _summary_chunk_messages(chunk: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": "You are an assistant that summarizes course notes for students."},
+        {"role": "user", "content": f"""Summarize the following excerpt of course notes.
+Keep the key concepts, definitions and formulas. Answer with the summary only.
+
+{chunk}"""}
+    ]
+
+def _summary_reduce_messages(group: List[str]) -> List[Dict[str, str]]:
+    joined = "\n\n".join(f"Part {index}:\n{partial}" for index, partial in enumerate(group, 1))
+    return [
+        {"role": "system", "content": "You are an assistant that summarizes course notes for students."},
+        {"role": "user", "content": f"""The following are summaries of consecutive parts of the same course notes.
+Combine them into a single coherent summary, without repeating information. Answer with the summary only.
+
+{joined}"""}
+    ]
+
+class AIService:
+    @staticmethod
+    def is_configured() -> bool:
+        return bool(os.getenv("OPENAI_API_KEY"))
+
+    @staticmethod
+    def ensure_configured() -> None:
+        """Raises ServiceNotConfigured before work is queued or a stream has started."""
+        services.get("openai")
+
+    @staticmethod
+    async def _complete(
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        bypass_cache: bool = False,
+        refresh: bool = False,
+        parse: Optional[Callable[[str], Any]] = None,
+        timeout: Optional[float] = None,
+        operation: str = "completion"
+    ) -> Any:
+        """Runs a chat completion through the response cache and the global concurrency limiter.
+
+        bypass_cache skips the cache entirely, refresh calls OpenAI and overwrites the cached entry.
+        Only responses accepted by parse are cached. timeout covers waiting for a slot and the call.
+        Concurrent calls with the same cache key share one OpenAI call (ai_flights), admitted
+        by llm_scheduler within the RPM/TPM budget. timeout is capped by the request deadline;
+        while openai_breaker is open the call fails at once with CircuitOpen.
+        """
+        parse = parse or (lambda content: content)
+        use_cache = ai_cache.enabled and not bypass_cache
+        key = ai_cache.make_key(messages, MODEL, temperature, max_tokens)
+
+        if use_cache and not refresh:
+            cached = await run_in_threadpool(ai_cache.get, key)
+            if cached is not None:
+                return parse(cached)
+
+        timeout = remaining(timeout or config.AI_TIMEOUT)
+        openai_breaker.check()
+
+        estimated_tokens = estimate_tokens(messages, max_tokens)
+
+        async def call() -> str:
+            # un seul verdict pour openai_breaker, nouvelles tentatives de llm_scheduler et requête doublée comprises
+            with openai_breaker.track() as tracked:
+                async def request():
+                    async with concurrency_limiter:
+                        with tracked.attempt():
+                            return await services.get("openai").chat.completions.create(
+                                model=MODEL,
+                                messages=messages,
+                                max_tokens=max_tokens,
+                                temperature=temperature,
+                                timeout=timeout
+                            )
+
+                # sans effet de bord : une seconde complétion peut partir si la première tarde (AI_HEDGE_AFTER)
+                response = await hedged(lambda: llm_scheduler.run(request, estimated_tokens),
+                                        config.AI_HEDGE_AFTER, "openai")
+            used_tokens = estimated_tokens
+            if response.usage is not None:
+                ai_tokens.labels(operation, "prompt").inc(response.usage.prompt_tokens)
+                ai_tokens.labels(operation, "completion").inc(response.usage.completion_tokens)
+                used_tokens = response.usage.total_tokens
+            llm_scheduler.settle(estimated_tokens, used_tokens)
+            return response.choices[0].message.content.strip()
+
+        async def flight() -> str:
+            # mis en cache ici : la réponse est gardée même si tous les appelants sont partis
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                content = await call()
+                outcome = "success"
+            except asyncio.CancelledError:
+                outcome = "timeout" # seul ai_flights annule l'appel, quand son délai expire
+                raise
+            except UpstreamError as e:
+                outcome = e.outcome
+                raise
+            finally:
+                ai_request_duration.labels(operation, outcome).observe(time.perf_counter() - start)
+            if use_cache:
+                try:
+                    parse(content)
+                except ValueError:
+                    return content
+                await run_in_threadpool(ai_cache.set, key, MODEL, content)
+            return content
 
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an assistant that generates educational quizzes."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=2000,
-                temperature=0.7
-            )
+            content, _ = await ai_flights.do(key, flight, timeout, operation)
+        except asyncio.TimeoutError:
+            if deadline_expired():
+                raise DeadlineExceeded()
+            raise ValueError(f"OpenAI request timed out after {timeout}s")
+        return parse(content)
 
-            content = response.choices[0].message.content.strip()
-            quiz_data = json.loads(content)
+    @staticmethod
+    async def _stream(
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        refresh: bool = False,
+        parse: Optional[Callable[[str], Any]] = None,
+        timeout: Optional[float] = None,
+        operation: str = "completion"
+    ) -> AsyncIterator[str]:
+        """Streaming counterpart of _complete: yields the completion text as it is generated.
+
+        Shares the response cache with _complete: a cached response is replayed in one piece,
+        a finished stream is cached when parse accepts it. timeout bounds the wait for a slot
+        and each read of the stream. OpenAI errors are raised as ValueError.
+        """
+        use_cache = ai_cache.enabled
+        key = ai_cache.make_key(messages, MODEL, temperature, max_tokens)
 
-            if not all(key in quiz_data for key in ["title", "description", "questions"]):
-                raise ValueError("Invalid quiz format returned by OpenAI")
+        if use_cache and not refresh:
+            cached = await run_in_threadpool(ai_cache.get, key)
+            if cached is not None:
+                yield cached
+                return
 
-            return quiz_data
+        timeout = remaining(timeout or config.AI_TIMEOUT)
+        openai_breaker.check()
+        start = time.perf_counter()
+        outcome = "error"
+        parts: List[str] = []
+        client = services.get("openai")
+        estimated_tokens = estimate_tokens(messages, max_tokens)
+        used_tokens = estimated_tokens
 
+        async def open_stream(tracked):
+            # le créneau de concurrence reste pris jusqu'à la fin du flux (relâché plus bas)
+            await concurrency_limiter.acquire()
+            try:
+                with tracked.attempt(): # jusqu'aux en-têtes de la réponse
+                    return await client.chat.completions.create(
+                        model=MODEL,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        timeout=timeout,
+                        stream=True,
+                        stream_options={"include_usage": True}
+                    )
+            except BaseException:
+                concurrency_limiter.release()
+                raise
+
+        try:
+            with openai_breaker.track() as tracked: # un verdict pour l'ouverture, nouvelles tentatives comprises
+                stream = await asyncio.wait_for(
+                    llm_scheduler.run(lambda: open_stream(tracked), estimated_tokens), timeout)
+        except (asyncio.TimeoutError, openai.APITimeoutError):
+            ai_request_duration.labels(operation, "timeout").observe(time.perf_counter() - start)
+            if deadline_expired():
+                raise DeadlineExceeded()
+            raise ValueError(f"OpenAI request timed out after {timeout}s")
+        except UpstreamError as e:
+            ai_request_duration.labels(operation, e.outcome).observe(time.perf_counter() - start)
+            raise
+        except openai.OpenAIError as e:
+            ai_request_duration.labels(operation, "error").observe(time.perf_counter() - start)
+            raise ValueError(f"OpenAI API error: {str(e)}")
+
+        try:
+            try:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        ai_tokens.labels(operation, "prompt").inc(chunk.usage.prompt_tokens)
+                        ai_tokens.labels(operation, "completion").inc(chunk.usage.completion_tokens)
+                        used_tokens = chunk.usage.total_tokens
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        if not parts:
+                            ai_stream_first_token.labels(operation).observe(time.perf_counter() - start)
+                        parts.append(delta)
+                        yield delta
+            finally:
+                await stream.close()
+            outcome = "success"
+        except openai.APITimeoutError:
+            outcome = "timeout"
+            raise ValueError(f"OpenAI request timed out after {timeout}s")
+        except openai.OpenAIError as e:
+            raise ValueError(f"OpenAI API error: {str(e)}")
+        finally:
+            concurrency_limiter.release()
+            llm_scheduler.settle(estimated_tokens, used_tokens)
+            ai_request_duration.labels(operation, outcome).observe(time.perf_counter() - start)
+
+        if use_cache:
+            content = "".join(parts).strip()
+            try:
+                (parse or (lambda text: text))(content)
+            except ValueError:
+                return
+            await run_in_threadpool(ai_cache.set, key, MODEL, content)
+
+    @staticmethod
+    async def generate_quiz(
+        course_title: str,
+        course_description: str,
+        num_questions: int = 5,
+        bypass_cache: bool = False,
+        refresh: bool = False,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Generates a quiz based on the provided course."""
+        try:
+            return await AIService._complete(
+                messages=_quiz_messages(course_title, course_description, num_questions),
+                **QUIZ_COMPLETION,
+                bypass_cache=bypass_cache,
+                refresh=refresh,
+                parse=_parse_quiz,
+                timeout=timeout,
+                operation="quiz"
+            )
+
+        except (ServiceNotConfigured, UpstreamError):
+            raise
         except json.JSONDecodeError as e:
             raise ValueError(f"Failed to parse quiz response: {str(e)}")
-        except openai.error.OpenAIError as e:
+        except openai.OpenAIError as e:
             raise ValueError(f"OpenAI API error: {str(e)}")
         except Exception as e:
             raise ValueError(f"Unexpected error while generating quiz: {str(e)}")
 
     @staticmethod
-    def generate_transcript(video_url: str) -> str:
+    async def generate_transcript(
+        video_url: str,
+        bypass_cache: bool = False,
+        refresh: bool = False,
+        timeout: Optional[float] = None
+    ) -> str:
         """Generates a transcript from the audio content of the video at the given URL."""
-        prompt = f"""You are an AI assistant capable of transcribing audio from a video. 
-The video is located at this URL: {video_url}. 
-Based on the content of this educational video, provide a textual transcript of the spoken content. 
-Return the transcript as a plain text string. If the transcription fails or the content is unclear, return 'Transcription not available'.
+        try:
+            transcript = await AIService._complete(
+                messages=_transcript_messages(video_url),
+                **TRANSCRIPT_COMPLETION,
+                bypass_cache=bypass_cache,
+                refresh=refresh,
+                timeout=timeout,
+                operation="transcript"
+            )
+
+            return normalize_transcript(transcript)
+
+        except (ServiceNotConfigured, UpstreamError):
+            raise
+        except openai.OpenAIError as e:
+            raise ValueError(f"OpenAI API error during transcription: {str(e)}")
+        except Exception as e:
+            raise ValueError(f"Unexpected error while generating transcript: {str(e)}")
+
+    @staticmethod
+    def summary_chunk_key(chunk: str) -> str:
+        """Content hash under which the partial summary of a chunk is stored."""
+        return content_hash(f"{SUMMARY_PROMPT_VERSION}\n{chunk}")
+
+    @staticmethod
+    async def summarize_chunks(
+        chunks: List[str],
+        known: Optional[Dict[str, str]] = None,
+        refresh: bool = False,
+        timeout: Optional[float] = None
+    ) -> List[str]:
+        """Summarizes chunks concurrently, reusing the summaries in known (keyed by summary_chunk_key)."""
+        known = known or {}
+
+        async def summarize(chunk: str) -> str:
+            cached = known.get(AIService.summary_chunk_key(chunk))
+            if cached is not None:
+                return cached
+            return await AIService._complete(
+                messages=_summary_chunk_messages(chunk),
+                **SUMMARY_MAP_COMPLETION,
+                refresh=refresh,
+                timeout=timeout,
+                operation="summary_map"
+            )
+
+        try:
+            return list(await asyncio.gather(*(summarize(chunk) for chunk in chunks)))
+        except openai.OpenAIError as e:
+            raise ValueError(f"OpenAI API error during summarization: {str(e)}")
+
+    @staticmethod
+    async def _combine_summaries(group: List[str], refresh: bool = False, timeout: Optional[float] = None) -> str:
+        return await AIService._complete(
+            messages=_summary_reduce_messages(group),
+            **SUMMARY_REDUCE_COMPLETION,
+            refresh=refresh,
+            timeout=timeout,
+            operation="summary_reduce"
+        )
+
+    @staticmethod
+    async def reduce_summaries(
+        partials: List[str],
+        refresh: bool = False,
+        timeout: Optional[float] = None
+    ) -> str:
+        """Combines partial summaries, level by level, SUMMARY_REDUCE_FANIN at a time."""
+        if not partials:
+            return ""
+
+        fanin = max(config.SUMMARY_REDUCE_FANIN, 2)
+        try:
+            while len(partials) > 1:
+                groups = [partials[i:i + fanin] for i in range(0, len(partials), fanin)]
+                partials = list(await asyncio.gather(
+                    *(AIService._combine_summaries(group, refresh, timeout) for group in groups)
+                ))
+        except openai.OpenAIError as e:
+            raise ValueError(f"OpenAI API error during summarization: {str(e)}")
+        return partials[0]
+
+    @staticmethod
+    async def generate_summary(content: str, refresh: bool = False, timeout: Optional[float] = None) -> str:
+        """Summarizes a text of any length: chunks are summarized in parallel, then reduced."""
+        chunks = split_into_chunks(content, config.SUMMARY_CHUNK_CHARS)
+        partials = await AIService.summarize_chunks(chunks, refresh=refresh, timeout=timeout)
+        return await AIService.reduce_summaries(partials, refresh=refresh, timeout=timeout)
+
+    @staticmethod
+    def stream_quiz(
+        course_title: str,
+        course_description: str,
+        num_questions: int = 5,
+        refresh: bool = False,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Streams the raw JSON of generate_quiz; see JSONArrayStream to consume it question by question."""
+        return AIService._stream(
+            messages=_quiz_messages(course_title, course_description, num_questions),
+            **QUIZ_COMPLETION,
+            refresh=refresh,
+            parse=_parse_quiz,
+            timeout=timeout,
+            operation="quiz_stream"
+        )
+
+    @staticmethod
+    def stream_transcript(video_url: str, refresh: bool = False, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Streams the text of generate_transcript; apply normalize_transcript to the full text."""
+        return AIService._stream(
+            messages=_transcript_messages(video_url),
+            **TRANSCRIPT_COMPLETION,
+            refresh=refresh,
+            timeout=timeout,
+            operation="transcript_stream"
+        )
+
+    @staticmethod
+    def stream_summary_chunk(chunk: str, refresh: bool = False, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        return AIService._stream(
+            messages=_summary_chunk_messages(chunk),
+            **SUMMARY_MAP_COMPLETION,
+            refresh=refresh,
+            timeout=timeout,
+            operation="summary_stream"
+        )
+
+    @staticmethod
+    async def stream_reduced_summary(
+        partials: List[str],
+        refresh: bool = False,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """Same result as reduce_summaries, with the last combination streamed."""
+        fanin = max(config.SUMMARY_REDUCE_FANIN, 2)
+        try:
+            while len(partials) > fanin:
+                groups = [partials[i:i + fanin] for i in range(0, len(partials), fanin)]
+                partials = list(await asyncio.gather(
+                    *(AIService._combine_summaries(group, refresh, timeout) for group in groups)
+                ))
+        except openai.OpenAIError as e:
+            raise ValueError(f"OpenAI API error during summarization: {str(e)}")
+
+        if len(partials) <= 1:
+            if partials:
+                yield partials[0]
+            return
+        async for delta in AIService._stream(
+            messages=_summary_reduce_messages(partials),
+            **SUMMARY_REDUCE_COMPLETION,
+            refresh=refresh,
+            timeout=timeout,
+            operation="summary_stream"
+        ):
+            yield delta
+
+    @staticmethod
+    async def generate_flashcards(
+        content: str,
+        num_cards: int = 10,
+        refresh: bool = False,
+        timeout: Optional[float] = None
+    ) -> List[Dict[str, str]]:
+        """Generates question/answer flashcards from note content."""
+        prompt = f"""Create {num_cards} flashcards to help a student review the following course notes.
+Each flashcard has a short question and a concise answer.
+Return format:
+{{
+  "flashcards": [
+    {{"question": "Question text", "answer": "Answer text"}},
+    ...
+  ]
+}}
+Ensure the response is a valid JSON object.
+
+Notes:
+{content}
 """
 
+        def parse_flashcards(raw: str) -> List[Dict[str, str]]:
+            data = json.loads(raw)
+            cards = data.get("flashcards") if isinstance(data, dict) else data
+            if not isinstance(cards, list) or not all(
+                isinstance(card, dict) and card.get("question") and card.get("answer") for card in cards
+            ):
+                raise ValueError("Invalid flashcards format returned by OpenAI")
+            return [{"question": card["question"], "answer": card["answer"]} for card in cards]
+
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
+            return await AIService._complete(
                 messages=[
-                    {"role": "system", "content": "You are an AI that transcribes educational video content."},
+                    {"role": "system", "content": "You are an assistant that creates study flashcards."},
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=2000,
-                temperature=0.3 
+                max_tokens=1500,
+                temperature=0.5,
+                refresh=refresh,
+                parse=parse_flashcards,
+                timeout=timeout,
+                operation="flashcards"
             )
 
-            transcript = response.choices[0].message.content.strip()
-            if not transcript or "transcription not available" in transcript.lower():
-                return "Transcription not available"
-            return transcript
-
-        except openai.error.OpenAIError as e:
-            raise ValueError(f"OpenAI API error during transcription: {str(e)}")
-        except Exception as e:
-            raise ValueError(f"Unexpected error while generating transcript: {str(e)}")
\ No newline at end of file
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Failed to parse flashcards response: {str(e)}")
+        except openai.OpenAIError as e:
+            raise ValueError(f"OpenAI API error: {str(e)}")
@@ -0,0 +1,182 @@
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from anyio import CancelScope
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.orm import Session, selectinload
+
+from app.models.note import Note
+from app.models.quiz import Quiz
+from app.models.video import Video
+from app.services.ai_service import AIService, normalize_transcript
+from app.services.db import SessionLocal
+from app.services.entity_cache import entity_cache
+from app.services.quiz_grading import answer_keys
+from app.services.search_service import search_index
+from app.services.vector_index import vector_index
+from app.services.json_stream import JSONArrayStream
+from app.services.note_summary import NoteSummaryService
+from app.services.quiz_persistence import QuizPersistenceService
+from app.services.sse import sse_event
+
+
+class AIStreamService:
+    """Server-sent event streams of the AI generations, persisting results as they arrive.
+
+    Each stream opens its own session: the request session is closed before the body is sent.
+    Events are "token" (text delta), the generation specific events, then "done" or "error".
+    """
+
+    @staticmethod
+    async def quiz_events(
+        course_id: int,
+        course_title: str,
+        course_description: str,
+        num_questions: int = 5,
+        refresh: bool = False,
+        tokens: bool = False
+    ) -> AsyncIterator[str]:
+        """Emits "quiz" once the quiz row exists, then one "question" per question as soon as its JSON
+        object is complete; each question is committed when emitted. An interrupted or failed
+        generation removes the partial quiz."""
+        db = SessionLocal()
+        parser = JSONArrayStream("questions")
+        quiz_id: Optional[int] = None
+        position = 0
+        completed = False
+        try:
+            async for delta in AIService.stream_quiz(course_title, course_description, num_questions, refresh=refresh):
+                if tokens:
+                    yield sse_event("token", {"text": delta})
+                for question in parser.feed(delta):
+                    if not isinstance(question, dict) or not question.get("text"):
+                        raise ValueError("Invalid question returned by OpenAI")
+                    if quiz_id is None:
+                        title = parser.header.get("title") or f"{course_title} quiz"
+                        description = parser.header.get("description")
+                        quiz_id = await run_in_threadpool(
+                            AIStreamService._create_quiz, db, course_id, title, description)
+                        yield sse_event("quiz", {"quiz_id": quiz_id, "title": title, "description": description})
+                    question_id = await run_in_threadpool(
+                        AIStreamService._add_question, db, quiz_id, question, position)
+                    yield sse_event("question", {"id": question_id, "position": position, **question})
+                    position += 1
+
+            quiz_data = json.loads(parser.text)
+            if not isinstance(quiz_data, dict) or "title" not in quiz_data:
+                raise ValueError("Invalid quiz format returned by OpenAI")
+            quiz_id = await run_in_threadpool(AIStreamService._finish_quiz, db, course_id, quiz_id, quiz_data)
+            completed = True
+            yield sse_event("done", {"quiz_id": quiz_id, "questions": position})
+        except (ValueError, KeyError, TypeError) as e: # JSONDecodeError est un ValueError
+            yield sse_event("error", {"detail": f"Quiz generation failed: {str(e)}"})
+        finally:
+            with CancelScope(shield=True): # client déconnecté : la tâche est annulée, le nettoyage doit aboutir
+                if not completed and quiz_id is not None:
+                    await run_in_threadpool(AIStreamService._discard_quiz, db, quiz_id)
+                await run_in_threadpool(db.close)
+
+    @staticmethod
+    async def summary_events(note_id: int, refresh: bool = False) -> AsyncIterator[str]:
+        """No session is held during the stream: the note is read before it and written after it."""
+        try:
+            chunks, known = await run_in_threadpool(AIStreamService._plan_summary, note_id, refresh)
+            parts, partials = [], []
+            async for delta in NoteSummaryService.stream(chunks, known, partials, refresh=refresh):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+            summary = "".join(parts).strip()
+            await run_in_threadpool(AIStreamService._save_summary, note_id, chunks, partials, summary, refresh)
+            yield sse_event("done", {"note_id": note_id, "summary": summary})
+        except ValueError as e:
+            yield sse_event("error", {"detail": str(e)})
+
+    @staticmethod
+    async def transcript_events(video_id: int, video_url: str, refresh: bool = False) -> AsyncIterator[str]:
+        parts = []
+        try:
+            async for delta in AIService.stream_transcript(video_url, refresh=refresh):
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        except ValueError as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        transcript = normalize_transcript("".join(parts).strip())
+        await run_in_threadpool(AIStreamService._save_transcript, video_id, transcript)
+        yield sse_event("done", {"video_id": video_id, "transcript": transcript})
+
+    @staticmethod
+    def _create_quiz(db: Session, course_id: int, title: str, description: Optional[str]) -> int:
+        quiz_id = QuizPersistenceService.create_quiz(db, course_id, title, description)
+        db.commit()
+        return quiz_id
+
+    @staticmethod
+    def _add_question(db: Session, quiz_id: int, question: Dict[str, Any], position: int) -> int:
+        question_id, = QuizPersistenceService.add_questions(db, quiz_id, [question], start_position=position)
+        db.commit()
+        entity_cache.invalidate("quiz", quiz_id)
+        answer_keys.invalidate(quiz_id)
+        return question_id
+
+    @staticmethod
+    def _finish_quiz(db: Session, course_id: int, quiz_id: Optional[int], quiz_data: Dict[str, Any]) -> int:
+        if quiz_id is None: # aucune question reçue
+            quiz_id = QuizPersistenceService.create_quiz(db, course_id, quiz_data["title"], quiz_data.get("description"))
+        else:
+            db.execute(
+                update(Quiz).where(Quiz.id == quiz_id)
+                .values(title=quiz_data["title"], description=quiz_data.get("description"))
+            )
+        db.commit()
+        entity_cache.invalidate("quiz", quiz_id)
+        return quiz_id
+
+    @staticmethod
+    def _discard_quiz(db: Session, quiz_id: int) -> None:
+        db.rollback()
+        quiz = db.get(Quiz, quiz_id)
+        if quiz is not None:
+            db.delete(quiz)
+            db.commit()
+            entity_cache.invalidate("quiz", quiz_id)
+            answer_keys.invalidate(quiz_id)
+
+    @staticmethod
+    def _load_note(db: Session, note_id: int) -> Note:
+        note = db.query(Note).options(selectinload(Note.chunk_summaries)).filter(Note.id == note_id).first()
+        if note is None:
+            raise ValueError("Note not found")
+        return note
+
+    @staticmethod
+    def _plan_summary(note_id: int, refresh: bool) -> Tuple[List[str], Dict[str, str]]:
+        with SessionLocal() as db:
+            note = AIStreamService._load_note(db, note_id)
+            return NoteSummaryService.plan(note.content, note.chunk_summaries, refresh=refresh)
+
+    @staticmethod
+    def _save_summary(note_id: int, chunks: List[str], partials: List[str], summary: str, refresh: bool) -> None:
+        with SessionLocal() as db:
+            note = AIStreamService._load_note(db, note_id)
+            NoteSummaryService.apply(note, chunks, partials, summary, refresh=refresh)
+            db.commit()
+        entity_cache.invalidate("note", note_id)
+
+    @staticmethod
+    def _save_transcript(video_id: int, transcript: str) -> None:
+        with SessionLocal() as db:
+            db.execute(
+                update(Video).where(Video.id == video_id).values(
+                    transcript=transcript,
+                    is_synchronized=True,
+                    transcript_error=None,
+                    transcript_next_attempt_at=None
+                )
+            )
+            db.commit()
+            # UPDATE Core : les hooks de session ne voient pas ce texte
+            search_index.reindex(db, "video", video_id)
+            vector_index.reindex(db, "video", video_id)
+        entity_cache.invalidate("video", video_id)
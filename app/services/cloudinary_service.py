@@ -1,40 +1,82 @@
 import os
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
-import base64
-import tempfile
-from typing import Dict, Any
+import random
+import time
+from typing import Dict, Any, BinaryIO, List, Optional, Union
 import logging
 
+from app.config import config
+from app.services.metrics import cloudinary_upload_duration, cloudinary_upload_bytes, cloudinary_upload_throughput
+from app.services.resilience import DeadlineExceeded, UpstreamError, cloudinary_breaker, deadline_expired, remaining
+from app.services.service_registry import LazyModule, ServiceNotConfigured, services
+
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
 
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET")
-)
+cloudinary = LazyModule("cloudinary")
+cloudinary_api = LazyModule("cloudinary.api") # Admin API (suppression par lots)
+
+# statuts de delete_resources considérés comme définitifs
+DELETED_STATUSES = ("deleted", "not_found")
+
+def _configure_cloudinary():
+    # le SDK lit aussi CLOUDINARY_URL ; les variables séparées priment quand elles sont définies
+    if not os.getenv("CLOUDINARY_URL") and not os.getenv("CLOUDINARY_CLOUD_NAME"):
+        raise ServiceNotConfigured("CLOUDINARY_CLOUD_NAME is not set in the environment variables")
+    settings = {
+        "cloud_name": os.getenv("CLOUDINARY_CLOUD_NAME"),
+        "api_key": os.getenv("CLOUDINARY_API_KEY"),
+        "api_secret": os.getenv("CLOUDINARY_API_SECRET")
+    }
+    cloudinary.config(**{key: value for key, value in settings.items() if value})
+    return LazyModule("cloudinary.uploader")
+
+services.register("cloudinary", _configure_cloudinary)
 
 class CloudinaryService:
     @staticmethod
-    def upload_video(file_base64: str, resource_type: str = "video", folder: str = "course_videos") -> Dict[str, Any]:
+    def ensure_configured() -> None:
+        """Raises ServiceNotConfigured early, e.g. before reading an upload body."""
+        services.get("cloudinary")
+
+    @staticmethod
+    def upload_video(
+        file: Union[str, BinaryIO],
+        filename: Optional[str] = None,
+        resource_type: str = "video",
+        folder: str = "course_videos"
+    ) -> Dict[str, Any]:
+        """Uploads a video from a local path or a file object using Cloudinary's chunked upload.
+
+        Each chunk request is bounded by CLOUDINARY_TIMEOUT, capped by the time left before the
+        request deadline when the upload starts.
+        """
+        start = time.perf_counter()
+        outcome = "error"
         try:
-            file_data = base64.b64decode(file_base64)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as temp_file:
-                temp_file.write(file_data)
-                temp_file_path = temp_file.name
-
-            result = cloudinary.uploader.upload(
-                temp_file_path,
-                resource_type=resource_type,
-                folder=folder,
-                overwrite=True,
-                quality="auto",
-                fetch_format="auto"
-            )
-
-            os.unlink(temp_file_path)
+            options = {}
+            if filename:
+                options["filename"] = filename
+
+            uploader = services.get("cloudinary")
+            with cloudinary_breaker.track():
+                result = uploader.upload_large(
+                    file,
+                    resource_type=resource_type,
+                    folder=folder,
+                    chunk_size=config.VIDEO_UPLOAD_CHUNK_SIZE,
+                    overwrite=True,
+                    quality="auto",
+                    fetch_format="auto",
+                    timeout=remaining(config.CLOUDINARY_TIMEOUT),
+                    **options
+                )
+            outcome = "success"
+
+            elapsed = time.perf_counter() - start
+            uploaded_bytes = result.get("bytes") or 0
+            cloudinary_upload_bytes.labels().inc(uploaded_bytes)
+            if uploaded_bytes and elapsed > 0:
+                cloudinary_upload_throughput.labels().observe(uploaded_bytes / elapsed)
 
             return {
                 "public_id": result["public_id"],
@@ -45,21 +87,72 @@ class CloudinaryService:
                 "duration": result.get("duration")
             }
 
-        except base64.binascii.Error:
-            logger.error("Invalid Base64 encoding")
-            raise ValueError("Invalid Base64 data provided")
+        except (ServiceNotConfigured, UpstreamError):
+            raise
         except IOError as e:
             logger.error(f"File operation failed: {e}")
             raise
         except Exception as e:
+            if deadline_expired(): # délai du SDK ramené à l'échéance de la requête
+                raise DeadlineExceeded() from e
             logger.error(f"Error while uploading to Cloudinary: {e}")
             raise
+        finally:
+            cloudinary_upload_duration.labels(outcome).observe(time.perf_counter() - start)
+
+    @staticmethod
+    def delete_videos(
+        public_ids: List[str],
+        resource_type: str = "video",
+        batch_size: int = config.CLOUDINARY_DELETE_BATCH_SIZE,
+        retries: int = config.CLOUDINARY_DELETE_RETRIES,
+        base_delay: float = config.CLOUDINARY_RETRY_BASE_DELAY
+    ) -> Dict[str, int]:
+        """Deletes assets with the Admin API, batch_size public ids per call.
+
+        A failed call, or ids reported with another status than deleted / not_found, are retried
+        with jittered exponential backoff. Raises RuntimeError if ids are still left afterwards.
+        """
+        services.get("cloudinary")
+        counts = {"deleted": 0, "not_found": 0}
+        failed: List[str] = []
+        for start in range(0, len(public_ids), batch_size):
+            pending = public_ids[start:start + batch_size]
+            for attempt in range(retries + 1):
+                if attempt:
+                    time.sleep(base_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+                try:
+                    with cloudinary_breaker.track():
+                        result = cloudinary_api.delete_resources(
+                            pending, resource_type=resource_type, timeout=config.CLOUDINARY_TIMEOUT)
+                except ServiceNotConfigured:
+                    raise
+                except Exception as e:
+                    logger.error(f"Error while deleting {len(pending)} assets (attempt {attempt + 1}): {e}")
+                    continue
+                statuses = result.get("deleted", {})
+                for public_id in pending:
+                    if statuses.get(public_id) in DELETED_STATUSES:
+                        counts[statuses[public_id]] += 1
+                pending = [public_id for public_id in pending if statuses.get(public_id) not in DELETED_STATUSES]
+                if not pending:
+                    break
+            failed += pending
+        if failed:
+            raise RuntimeError(f"{len(failed)} of {len(public_ids)} assets could not be deleted: {', '.join(failed[:10])}")
+        return counts
 
     @staticmethod
     def delete_video(public_id: str, resource_type: str = "video") -> Dict[str, Any]:
         try:
-            result = cloudinary.uploader.destroy(public_id, resource_type=resource_type)
-            return result
+            uploader = services.get("cloudinary")
+            with cloudinary_breaker.track():
+                return uploader.destroy(public_id, resource_type=resource_type,
+                                        timeout=remaining(config.CLOUDINARY_TIMEOUT))
+        except (ServiceNotConfigured, UpstreamError):
+            raise
         except Exception as e:
+            if deadline_expired():
+                raise DeadlineExceeded() from e
             logger.error(f"Error while deleting: {e}")
-            raise
\ No newline at end of file
+            raise
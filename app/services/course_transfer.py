@@ -0,0 +1,272 @@
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.config import config
+from app.models.answer import Answer
+from app.models.course import Course
+from app.models.note import Note
+from app.models.question import Question
+from app.models.quiz import Quiz
+from app.models.video import Video
+from app.schemas.course_transfer import (
+    CourseImportResult, CourseRecord, NoteRecord, QuizRecord, VideoRecord
+)
+from app.services.db import SessionLocal, engine
+from app.services.quiz_persistence import QuizPersistenceService
+from app.services.search_service import SearchService, search_index
+
+RECORD_SCHEMAS = {"course": CourseRecord, "note": NoteRecord, "video": VideoRecord, "quiz": QuizRecord}
+
+NOTE_COLUMNS = ("title", "content", "summary", "course_id", "created_at", "updated_at")
+VIDEO_COLUMNS = ("title", "description", "cloudinary_public_id", "cloudinary_url", "duration", "transcript",
+                 "course_id", "created_at", "is_synchronized", "transcript_attempts")
+
+# Taille des morceaux envoyés au client pendant l'export
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+
+class CourseImportError(ValueError):
+    """Raised for a malformed NDJSON line; the whole import is rolled back."""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"Line {line}: {message}")
+        self.line = line
+
+
+async def ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int, batch_size: int) -> AsyncIterator[List[bytes]]:
+    """Splits a byte stream into lines, yielded in lists of up to batch_size. Memory stays bounded by one batch."""
+    buffer = bytearray()
+    batch: List[bytes] = []
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            batch.append(bytes(buffer[start:end]))
+            line_number += 1
+            start = end + 1
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise CourseImportError(line_number + 1, f"line exceeds {max_line_bytes} bytes")
+    if buffer.strip():
+        batch.append(bytes(buffer))
+    if batch:
+        yield batch
+
+
+def _copy_value(value: Any) -> str:
+    # CSV de COPY : champ vide non quoté = NULL, tout le reste entre guillemets
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class CourseImporter:
+    """Writes NDJSON course records in one transaction.
+
+    Notes and videos are buffered and written in batches (COPY on PostgreSQL, a multi-row
+    INSERT elsewhere); each quiz is written with its questions and answers in three statements.
+    """
+
+    def __init__(self, db: Session, batch_size: int = config.COURSE_IMPORT_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.result = CourseImportResult()
+        self._course_id: Optional[int] = None
+        self._line = 0
+        self._pending: Dict[type, List[Dict[str, Any]]] = {Note: [], Video: []}
+
+    def feed(self, lines: List[bytes]) -> None:
+        for raw in lines:
+            self._line += 1
+            if not raw.strip():
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError as e:
+                raise CourseImportError(self._line, f"invalid JSON ({e})")
+            if not isinstance(record, dict):
+                raise CourseImportError(self._line, "expected a JSON object")
+            record_type = record.pop("type", None)
+            schema = RECORD_SCHEMAS.get(record_type)
+            if schema is None:
+                raise CourseImportError(self._line, f"unknown record type {record_type!r}")
+            try:
+                data = schema(**record)
+            except ValidationError as e:
+                errors = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+                raise CourseImportError(self._line, errors)
+            if record_type != "course" and self._course_id is None:
+                raise CourseImportError(self._line, f"'{record_type}' record before any 'course' record")
+            getattr(self, f"_add_{record_type}")(data)
+
+    def finish(self) -> CourseImportResult:
+        """Writes the remaining batches and commits."""
+        for model in self._pending:
+            self._flush(model)
+        self.db.commit()
+        if not SearchService.uses_postgres():
+            # les INSERT en masse ne passent pas par l'unit of work : index reconstruit à la prochaine recherche
+            search_index.reset()
+        return self.result
+
+    def _add_course(self, data: CourseRecord) -> None:
+        self._course_id = self.db.execute(insert(Course).returning(Course.id), data.dict()).scalar_one()
+        self.result.course_ids.append(self._course_id)
+
+    def _add_note(self, data: NoteRecord) -> None:
+        created_at = data.created_at or datetime.utcnow()
+        row = data.dict()
+        row.update(course_id=self._course_id, created_at=created_at, updated_at=data.updated_at or created_at)
+        self._queue(Note, row)
+        self.result.notes += 1
+
+    def _add_video(self, data: VideoRecord) -> None:
+        # seules les métadonnées sont importées : le fichier reste sur Cloudinary
+        row = data.dict()
+        row.update(course_id=self._course_id, created_at=data.created_at or datetime.utcnow(),
+                   is_synchronized=True, transcript_attempts=0)
+        self._queue(Video, row)
+        self.result.videos += 1
+
+    def _add_quiz(self, data: QuizRecord) -> None:
+        QuizPersistenceService.create_quiz_tree(self.db, self._course_id, data.dict())
+        self.result.quizzes += 1
+        self.result.questions += len(data.questions)
+        self.result.answers += sum(len(question.answers) for question in data.questions)
+
+    def _queue(self, model: type, row: Dict[str, Any]) -> None:
+        self._pending[model].append(row)
+        if len(self._pending[model]) >= self.batch_size:
+            self._flush(model)
+
+    def _flush(self, model: type) -> None:
+        rows = self._pending[model]
+        if not rows:
+            return
+        columns = NOTE_COLUMNS if model is Note else VIDEO_COLUMNS
+        if engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2":
+            self._copy(model.__tablename__, columns, rows)
+        else:
+            self.db.execute(insert(model), [{column: row[column] for column in columns} for row in rows])
+        self._pending[model] = []
+
+    def _copy(self, table: str, columns: tuple, rows: List[Dict[str, Any]]) -> None:
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write(",".join(_copy_value(row[column]) for column in columns))
+            buffer.write("\n")
+        buffer.seek(0)
+        # même connexion (donc même transaction) que la session
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _ndjson(record_type: str, fields: Dict[str, Any]) -> str:
+    return json.dumps({"type": record_type, **fields}, default=_json_default, ensure_ascii=False) + "\n"
+
+
+class CourseTransferService:
+    @staticmethod
+    def export_lines(course_id: int, batch_size: int = config.COURSE_IMPORT_BATCH_SIZE) -> Iterator[str]:
+        """NDJSON lines of a course: the course, then its notes, videos and quizzes (questions and answers nested).
+
+        Rows are read with yield_per (a server-side cursor on PostgreSQL) in a session of their own,
+        so that the response can be streamed after the request session is closed.
+        """
+        db = SessionLocal()
+        try:
+            course = db.execute(
+                select(Course.title, Course.description).where(Course.id == course_id)
+            ).first()
+            if course is None:
+                return
+            yield _ndjson("course", dict(course._mapping))
+
+            notes = (
+                select(*(getattr(Note, column) for column in NOTE_COLUMNS if column != "course_id"))
+                .where(Note.course_id == course_id)
+                .order_by(Note.created_at, Note.id)
+            )
+            for row in db.execute(notes.execution_options(yield_per=batch_size)):
+                yield _ndjson("note", dict(row._mapping))
+
+            videos = (
+                select(*(getattr(Video, column) for column in VIDEO_COLUMNS[:6]), Video.created_at)
+                .where(Video.course_id == course_id)
+                .order_by(Video.created_at, Video.id)
+            )
+            for row in db.execute(videos.execution_options(yield_per=batch_size)):
+                yield _ndjson("video", dict(row._mapping))
+
+            yield from CourseTransferService._export_quizzes(db, course_id, batch_size)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _export_quizzes(db: Session, course_id: int, batch_size: int) -> Iterator[str]:
+        # une seule requête ordonnée par quiz puis question : on ne garde en mémoire qu'un quiz à la fois
+        rows = (
+            select(Quiz.id, Quiz.title, Quiz.description,
+                   Question.id.label("question_id"), Question.text.label("question_text"), Question.explanation,
+                   Answer.text.label("answer_text"), Answer.is_correct)
+            .outerjoin(Question, Question.quiz_id == Quiz.id)
+            .outerjoin(Answer, Answer.question_id == Question.id)
+            .where(Quiz.course_id == course_id)
+            .order_by(Quiz.id, Question.position, Question.id, Answer.id)
+        )
+        quiz, quiz_id, question, question_id = None, None, None, None
+        for row in db.execute(rows.execution_options(yield_per=batch_size)):
+            if row.id != quiz_id:
+                if quiz is not None:
+                    yield _ndjson("quiz", quiz)
+                quiz_id, question_id = row.id, None
+                quiz = {"title": row.title, "description": row.description, "questions": []}
+            if row.question_id is not None and row.question_id != question_id:
+                question_id = row.question_id
+                question = {"text": row.question_text, "explanation": row.explanation, "answers": []}
+                quiz["questions"].append(question)
+            if row.answer_text is not None:
+                question["answers"].append({"text": row.answer_text, "is_correct": row.is_correct})
+        if quiz is not None:
+            yield _ndjson("quiz", quiz)
+
+    @staticmethod
+    def export_chunks(course_id: int) -> Iterator[bytes]:
+        """export_lines grouped into chunks of about EXPORT_CHUNK_BYTES."""
+        buffer = []
+        size = 0
+        for line in CourseTransferService.export_lines(course_id):
+            data = line.encode()
+            buffer.append(data)
+            size += len(data)
+            if size >= EXPORT_CHUNK_BYTES:
+                yield b"".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield b"".join(buffer)
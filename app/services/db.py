@@ -1,14 +1,116 @@
-from sqlalchemy import create_engine
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 from app.config import config
+from app.services.metrics import Histogram, registry, record_sql_statement, metric_header, gauge_lines, histogram_samples
+
+logger = logging.getLogger(__name__)
+
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class PoolStats:
+    """Checkout wait times and timeouts of the engine pool."""
+
+    def __init__(self):
+        self.wait_seconds = Histogram(POOL_WAIT_BUCKETS)
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float, pool: QueuePool) -> None:
+        self.wait_seconds.observe(seconds)
+        if seconds * 1000 > config.DB_POOL_WAIT_WARNING_MS:
+            logger.warning(f"Waited {seconds * 1000:.0f} ms for a database connection ({pool.status()})")
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+pool_stats = PoolStats()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection."""
 
-engine = create_engine(config.DATABASE_URL)
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            pool_stats.record_timeout()
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start, self)
+
+def _engine_options(database_url: str) -> Dict[str, Any]:
+    options = {"pool_pre_ping": config.DB_POOL_PRE_PING, "pool_recycle": config.DB_POOL_RECYCLE}
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options # une seule connexion partagée : pas de file d'attente à dimensionner
+    options.update(
+        poolclass=InstrumentedQueuePool,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT
+    )
+    return options
+
+engine = create_engine(config.DATABASE_URL, **_engine_options(config.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+if engine.dialect.name == "sqlite":
+    # SQLite n'applique ON DELETE CASCADE que si les clés étrangères sont activées, connexion par connexion
+    @event.listens_for(engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+def get_pool_status() -> Dict[str, Any]:
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__, "timeouts": pool_stats.timeouts,
+              "wait_seconds": pool_stats.wait_seconds.snapshot()}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0), # négatif tant que le pool n'est pas plein
+            max_overflow=config.DB_MAX_OVERFLOW,
+            timeout=pool.timeout()
+        )
+    return status
+
+def _collect_pool_metrics():
+    status = get_pool_status()
+    lines = gauge_lines("db_pool_timeouts_total", "Pool checkouts that timed out", status["timeouts"], "counter")
+    for key in ("size", "checked_in", "checked_out", "overflow"):
+        if key in status:
+            lines += gauge_lines(f"db_pool_{key}", f"Connection pool {key.replace('_', ' ')}", status[key])
+    lines += metric_header("db_pool_checkout_wait_seconds", "histogram", "Time waited for a pool connection")
+    lines += histogram_samples("db_pool_checkout_wait_seconds", status["wait_seconds"])
+    return lines
+
+registry.register_collector(_collect_pool_metrics)
+
+if config.METRICS_ENABLED:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        context._statement_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record_statement(conn, cursor, statement, parameters, context, executemany):
+        record_sql_statement(time.perf_counter() - context._statement_start)
+
 def get_db() :
     db = SessionLocal()
     try :
         yield db
     finally :
-        db.close()
\ No newline at end of file
+        db.close()
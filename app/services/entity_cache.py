@@ -0,0 +1,139 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Type
+
+from fastapi import Request, Response, status
+from pydantic import BaseModel
+
+from app.config import config
+from app.services.metrics import registry, gauge_lines
+
+EntityKey = Tuple[str, int] # ("quiz", 12)
+
+
+class CachedBody:
+    __slots__ = ("body", "etag", "course_id", "expires_at")
+
+    def __init__(self, body: bytes, course_id: Optional[int], expires_at: float):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.course_id = course_id
+        self.expires_at = expires_at
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match utilise la comparaison faible : W/"x" correspond à "x"
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class EntityCache:
+    """Read-through cache of serialized GET responses for single courses, notes, videos and quizzes.
+
+    Entries are the JSON bodies with their strong ETag, so a hit skips both the database and the
+    serialization. Write routes call invalidate() after committing. The cache is per process:
+    with several workers, the TTL bounds how long another worker can serve an old body.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, enabled: bool = True):
+        self.enabled = enabled
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        # une entité peut avoir plusieurs vues (ex. quiz et quiz complet)
+        self._entries: "OrderedDict[EntityKey, Dict[Hashable, CachedBody]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # incrémenté à chaque invalidation : une lecture commencée avant n'est pas mise en cache
+        self._epoch = 0
+        self._counters = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0, "evictions": 0}
+
+    def respond(self, request: Request, key: EntityKey, schema: Type[BaseModel], load: Callable[[], Any],
+                view: Hashable = None) -> Response:
+        """Response for GET key: 304 if If-None-Match matches, else the cached or freshly serialized body.
+
+        load() returns the ORM object (or raises HTTPException) and only runs on a miss.
+        """
+        entry = self._get(key, view)
+        if entry is None:
+            epoch = self._epoch
+            instance = load()
+            body = schema.model_validate(instance, from_attributes=True).model_dump_json().encode()
+            entry = CachedBody(body, getattr(instance, "course_id", None), time.monotonic() + self._ttl)
+            self._put(key, view, entry, epoch)
+
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            with self._lock:
+                self._counters["not_modified"] += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def invalidate(self, kind: str, entity_id: int) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._counters["invalidations"] += 1
+            self._entries.pop((kind, entity_id), None)
+
+    def invalidate_course(self, course_id: int) -> None:
+        """Drops the course and every cached entity that belongs to it."""
+        with self._lock:
+            self._epoch += 1
+            self._counters["invalidations"] += 1
+            for key in [key for key, views in self._entries.items()
+                        if key == ("course", course_id) or any(e.course_id == course_id for e in views.values())]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._counters, "size": len(self._entries), "max_entries": self._max_entries}
+
+    def _get(self, key: EntityKey, view: Hashable) -> Optional[CachedBody]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key, {}).get(view)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry
+            self._counters["misses"] += 1
+            return None
+
+    def _put(self, key: EntityKey, view: Hashable, entry: CachedBody, epoch: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if epoch != self._epoch: # écriture concurrente : le corps lu est peut-être déjà périmé
+                return
+            self._entries.setdefault(key, {})[view] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+
+entity_cache = EntityCache(
+    max_entries=config.ENTITY_CACHE_SIZE,
+    ttl_seconds=config.ENTITY_CACHE_TTL,
+    enabled=config.ENTITY_CACHE_ENABLED
+)
+
+
+def _collect_entity_cache_metrics():
+    stats = entity_cache.stats()
+    lines = []
+    for key in ("hits", "misses", "not_modified", "invalidations", "evictions"):
+        lines += gauge_lines(f"entity_cache_{key}_total", f"Entity read cache {key.replace('_', ' ')}", stats[key], "counter")
+    lines += gauge_lines("entity_cache_size", "Entities in the read cache", stats["size"])
+    return lines
+
+registry.register_collector(_collect_entity_cache_metrics)
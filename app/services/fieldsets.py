@@ -0,0 +1,32 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy.orm import Query, Session
+
+
+class InvalidFields(ValueError):
+    """Raised when fields= names a field the endpoint does not expose."""
+
+
+def select_fields(fields: Optional[str], allowed: Sequence[str], default: Sequence[str]) -> List[str]:
+    """Parses a comma-separated fields= value. The id is always returned; None means the default fields."""
+    if fields is None:
+        return list(default)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise InvalidFields(f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return ["id"] + [name for name in dict.fromkeys(names) if name != "id"]
+
+
+def projected_query(db: Session, model: Any, names: Sequence[str], order_columns: Sequence[Any]) -> Query:
+    """Query selecting only the given columns (plus the order columns, needed for the next cursor).
+
+    Rows are plain tuples: the other columns, large Text ones included, are neither fetched nor hydrated.
+    """
+    columns = [getattr(model, name) for name in names]
+    columns += [column for column in order_columns if column.key not in names]
+    return db.query(*columns)
+
+
+def rows_to_dicts(rows: Sequence[Any], names: Sequence[str]) -> List[Dict[str, Any]]:
+    return [{name: getattr(row, name) for name in names} for row in rows]
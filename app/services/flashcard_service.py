@@ -0,0 +1,45 @@
+from typing import Dict, List, Optional
+
+from app.models.flashcard import Flashcard
+from app.models.note import Note
+from app.services.ai_service import AIService
+from app.services.text_chunker import content_hash
+
+
+class FlashcardService:
+    @staticmethod
+    def is_current(note: Note) -> bool:
+        """True when the note has a stored set generated from its current content."""
+        current = content_hash(note.content)
+        return bool(note.flashcards) and all(card.content_hash == current for card in note.flashcards)
+
+    @staticmethod
+    def stored(note: Note, num_cards: int = 10, refresh: bool = False) -> Optional[List[Flashcard]]:
+        """The stored set when it can be served: current, of the requested size, and no refresh."""
+        if not refresh and FlashcardService.is_current(note) and note.flashcards[0].num_cards == num_cards:
+            return list(note.flashcards)
+        return None
+
+    @staticmethod
+    async def generate(content: str, num_cards: int = 10, refresh: bool = False) -> List[Dict[str, str]]:
+        """Flashcards of content from OpenAI (question and answer), without database access."""
+        return await AIService.generate_flashcards(content, num_cards, refresh=refresh)
+
+    @staticmethod
+    def store(note: Note, content: str, cards: List[Dict[str, str]], num_cards: int = 10) -> List[Flashcard]:
+        """Replaces the set of the note. Cards are hashed with the content they were generated from:
+        if the note changed meanwhile, the set is not current and the next call regenerates it.
+
+        The caller commits.
+        """
+        current = content_hash(content)
+        note.flashcards = [
+            Flashcard(content_hash=current, question=card["question"], answer=card["answer"], position=position,
+                      num_cards=num_cards)
+            for position, card in enumerate(cards)
+        ]
+        return note.flashcards
+
+    @staticmethod
+    def invalidate(note: Note) -> None:
+        note.flashcards = []
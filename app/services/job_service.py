@@ -0,0 +1,256 @@
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple, TypeVar
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import config
+from app.models.job import Job
+from app.services.db import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Session, Dict[str, Any]], Dict[str, Any]]
+T = TypeVar("T")
+
+
+class JobQueueFull(Exception):
+    """Raised when the worker pool already has too many jobs waiting."""
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused with a different payload."""
+
+
+class JobQueue:
+    """Runs persisted jobs on a bounded pool of worker threads, off the request path.
+
+    Handlers run in a worker thread with their own session. Async calls (AIService, ...) are
+    sent to the application event loop with run_coroutine so they share its async clients.
+    A running job holds a lease renewed every lease_seconds / 3; when its process dies the
+    lease runs out and resume_pending() hands the job to a worker again.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, lease_seconds: float):
+        self._max_workers = max_workers
+        self._lease_seconds = lease_seconds
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._handlers: Dict[str, JobHandler] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dispatched: Set[int] = set() # jobs envoyés au pool et pas encore terminés
+        self._backlog = False # des jobs sont restés en attente faute de place
+        self._running: Set[int] = set() # jobs réclamés par ce process, dont le bail est renouvelé
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def submit(self, db: Session, kind: str, payload: Dict[str, Any],
+               idempotency_key: Optional[str] = None) -> Tuple[Job, bool]:
+        """Persists a job and dispatches it. Returns (job, created)."""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+
+        if idempotency_key:
+            existing = self._find(db, kind, idempotency_key)
+            if existing is not None:
+                return self._check_replay(existing, payload), False
+
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull("Too many jobs waiting, retry later")
+
+        db_job = Job(kind=kind, status="pending", idempotency_key=idempotency_key,
+                     payload=json.dumps(payload, sort_keys=True))
+        db.add(db_job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # une requête concurrente avec la même clé a gagné la course
+            db.rollback()
+            self._slots.release()
+            return self._check_replay(self._find(db, kind, idempotency_key), payload), False
+        except Exception:
+            self._slots.release()
+            raise
+        db.refresh(db_job)
+
+        self._dispatch(db_job.id)
+        return db_job, True
+
+    def enqueue(self, db: Session, kind: str, payload: Dict[str, Any]) -> Job:
+        """Adds a pending job to the caller's transaction, so that it exists only if that commits.
+
+        Call dispatch_committed(job.id) after the commit.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        db_job = Job(kind=kind, status="pending", payload=json.dumps(payload, sort_keys=True))
+        db.add(db_job)
+        db.flush()
+        return db_job
+
+    def dispatch_committed(self, job_id: int) -> bool:
+        """Runs a job added with enqueue().
+
+        With a full queue it stays pending and is dispatched when a worker frees a slot.
+        """
+        if not self._acquire_or_defer():
+            logger.warning(f"Job queue full, job {job_id} left pending")
+            return False
+        self._dispatch(job_id)
+        return True
+
+    def run_coroutine(self, awaitable: Awaitable[T]) -> T:
+        """Runs a coroutine on the application event loop from a worker thread and waits for it.
+
+        Raises RuntimeError when no running loop is bound (bind_loop at startup): a private loop would
+        not share the OpenAI client, the limiters nor the single-flight state of the application.
+        """
+        if self._loop is None or not self._loop.is_running():
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise RuntimeError("No running application event loop bound to the job queue")
+        return asyncio.run_coroutine_threadsafe(awaitable, self._loop).result()
+
+    def get(self, db: Session, job_id: int) -> Optional[Job]:
+        return db.query(Job).filter(Job.id == job_id).first()
+
+    def resume_pending(self) -> int:
+        """Dispatches pending jobs, and running jobs whose lease expired, left over by a previous
+        process or by a full queue."""
+        with SessionLocal() as db:
+            job_ids = [job_id for (job_id,) in db.query(Job.id)
+                       .filter(self._claimable(datetime.utcnow()), Job.kind.in_(list(self._handlers)))
+                       .order_by(Job.id)]
+        with self._lock:
+            job_ids = [job_id for job_id in job_ids if job_id not in self._dispatched]
+        resumed = 0
+        for job_id in job_ids:
+            if not self._acquire_or_defer():
+                break
+            self._dispatch(job_id)
+            resumed += 1
+        return resumed
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+            self._stopping.set()
+            self._heartbeat = None
+
+    @staticmethod
+    def _claimable(now: datetime):
+        # en attente, ou "running" sans bail valide : le process qui l'exécutait s'est arrêté
+        stale = or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now)
+        return or_(Job.status == "pending", and_(Job.status == "running", stale))
+
+    @staticmethod
+    def _find(db: Session, kind: str, idempotency_key: str) -> Optional[Job]:
+        return db.query(Job).filter(Job.kind == kind, Job.idempotency_key == idempotency_key).first()
+
+    @staticmethod
+    def _check_replay(job: Job, payload: Dict[str, Any]) -> Job:
+        if json.loads(job.payload) != json.loads(json.dumps(payload)):
+            raise IdempotencyConflict("Idempotency key already used with a different payload")
+        return job
+
+    def _acquire_or_defer(self) -> bool:
+        # sous le même verrou que _release_slot : le slot libéré ensuite voit toujours _backlog
+        with self._lock:
+            if self._slots.acquire(blocking=False):
+                return True
+            self._backlog = True
+            return False
+
+    def _release_slot(self, job_id: int) -> None:
+        with self._lock:
+            self._dispatched.discard(job_id)
+            self._slots.release()
+            backlog, self._backlog = self._backlog, False
+        if backlog:
+            self.resume_pending()
+
+    def _dispatch(self, job_id: int) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="job-worker")
+            if self._heartbeat is None:
+                self._stopping.clear()
+                self._heartbeat = threading.Thread(target=self._renew_leases, name="job-heartbeat", daemon=True)
+                self._heartbeat.start()
+            self._dispatched.add(job_id)
+            self._executor.submit(self._run, job_id)
+
+    def _renew_leases(self) -> None:
+        while not self._stopping.wait(self._lease_seconds / 3):
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            try:
+                with SessionLocal() as db:
+                    db.execute(
+                        update(Job).where(Job.id.in_(running), Job.status == "running")
+                        .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=self._lease_seconds),
+                                updated_at=Job.updated_at)
+                    )
+                    db.commit()
+            except Exception as e:
+                logger.error(f"Unable to renew job leases: {e}")
+
+    def _run(self, job_id: int) -> None:
+        try:
+            with SessionLocal() as db:
+                # claim atomique : un autre process peut avoir repris le même job
+                now = datetime.utcnow()
+                claimed = db.execute(
+                    update(Job).where(Job.id == job_id, self._claimable(now))
+                    .values(status="running", lease_expires_at=now + timedelta(seconds=self._lease_seconds))
+                ).rowcount
+                db.commit()
+                if not claimed:
+                    return
+
+                with self._lock:
+                    self._running.add(job_id)
+                db_job = db.query(Job).filter(Job.id == job_id).one()
+                try:
+                    result = self._handlers[db_job.kind](db, json.loads(db_job.payload))
+                    db_job.result = json.dumps(result or {})
+                    db_job.status = "succeeded"
+                    db_job.lease_expires_at = None
+                    db.commit()
+                except Exception as e:
+                    logger.error(f"Job {job_id} ({db_job.kind}) failed: {e}")
+                    db.rollback()
+                    db_job.status = "failed"
+                    db_job.error = str(e)
+                    db_job.lease_expires_at = None
+                    db.commit()
+        except Exception as e:
+            logger.error(f"Unable to run job {job_id}: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(job_id)
+            try:
+                self._release_slot(job_id)
+            except Exception as e:
+                logger.error(f"Unable to resume pending jobs: {e}")
+
+
+job_queue = JobQueue(max_workers=config.JOB_WORKERS, max_pending=config.JOB_QUEUE_SIZE,
+                     lease_seconds=config.JOB_LEASE_SECONDS)
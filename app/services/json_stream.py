@@ -0,0 +1,68 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+
+class JSONArrayStream:
+    """Extracts the items of a top-level array field from JSON text received in pieces.
+
+    feed() returns every object of the array completed by the new text, so a
+    {"title": ..., "questions": [{...}, {...}]} completion can be consumed question by
+    question while it is still being generated. The fields written before the array are
+    available in header once the array starts.
+    """
+
+    def __init__(self, field: str):
+        self._field_pattern = re.compile(r'"%s"\s*:\s*$' % re.escape(field))
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._array_depth: Optional[int] = None # profondeur des éléments du tableau
+        self._item_start: Optional[int] = None
+        self.header: Dict[str, Any] = {}
+
+    @property
+    def text(self) -> str:
+        return self._buffer
+
+    def feed(self, text: str) -> List[Any]:
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if (char == "[" and self._array_depth is None and self._depth == 1
+                        and self._field_pattern.search(buffer, 0, self._pos)):
+                    self._array_depth = self._depth + 1
+                    self.header = self._parse_header(buffer[:self._pos])
+                elif char == "{" and self._depth == self._array_depth:
+                    self._item_start = self._pos
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if char == "}" and self._item_start is not None and self._depth == self._array_depth:
+                    items.append(json.loads(buffer[self._item_start:self._pos + 1]))
+                    self._item_start = None
+            self._pos += 1
+        return items
+
+    @staticmethod
+    def _parse_header(prefix: str) -> Dict[str, Any]:
+        # '{"title": "...", "questions": ' -> on ferme l'objet avec un tableau vide
+        try:
+            header = json.loads(prefix + "[]}")
+        except json.JSONDecodeError:
+            return {}
+        return header if isinstance(header, dict) else {}
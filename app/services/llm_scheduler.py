@@ -0,0 +1,284 @@
+import asyncio
+import contextvars
+import math
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional, TypeVar
+
+from app.config import config
+from app.services.metrics import registry, gauge_lines
+from app.services.resilience import UpstreamError
+from app.services.service_registry import LazyModule
+
+openai = LazyModule("openai")
+
+T = TypeVar("T")
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+# classe des appels OpenAI de la tâche courante ; les jobs et le pipeline de transcription passent en BACKGROUND
+llm_priority: contextvars.ContextVar[str] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+# attente maximale entre deux vérifications d'un appel qui n'est pas en tête de file
+IDLE_RECHECK_SECONDS = 1.0
+
+scheduler_wait = registry.histogram(
+    "ai_scheduler_wait_seconds", "Time an OpenAI call waited for the RPM/TPM budget", ("priority",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+rate_limit_responses = registry.counter(
+    "ai_rate_limited_total", "OpenAI 429 responses, by what happened next", ("outcome",))
+
+
+class AIRateLimited(UpstreamError):
+    """OpenAI still answered 429 after the retries; routes answer 429 with Retry-After."""
+    status_code = 429
+    outcome = "rate_limited"
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"OpenAI rate limit reached, retry in {math.ceil(retry_after)}s", retry_after)
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    # ~4 caractères par token ; OpenAI compte aussi max_tokens dans le budget TPM
+    return sum(len(message["content"]) for message in messages) // 4 + max_tokens
+
+
+@contextmanager
+def background_priority() -> Iterator[None]:
+    token = llm_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        llm_priority.reset(token)
+
+
+async def in_background(awaitable: Awaitable[T]) -> T:
+    """Awaits a coroutine with BACKGROUND priority (e.g. through JobQueue.run_coroutine)."""
+    with background_priority():
+        return await awaitable
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously; per_minute <= 0 means unlimited."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def refill(self, now: float) -> None:
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float, reserve: float = 0.0) -> float:
+        """Seconds until amount can be taken while leaving reserve (a fraction of the capacity)."""
+        if self.unlimited:
+            return 0.0
+        # une demande plus grande que la capacité part quand le seau est plein (le niveau devient négatif)
+        missing = min(amount + reserve * self.capacity, self.capacity) - self.level
+        return max(missing, 0.0) * 60 / self.capacity
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self.level -= amount
+
+    def give_back(self, amount: float) -> None:
+        if not self.unlimited:
+            self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    __slots__ = ("tokens", "loop", "event")
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def wake(self) -> None:
+        self.loop.call_soon_threadsafe(self.event.set)
+
+
+class LLMScheduler:
+    """Admits OpenAI calls within the account's requests-per-minute and tokens-per-minute limits.
+
+    Each call takes one request and its estimated tokens from two token buckets, then settle()
+    corrects the estimate with the usage of the response. Calls wait in FIFO order per priority:
+    background calls only go when no interactive call is waiting and leave interactive_reserve
+    of each budget untouched. A 429 pauses every call for Retry-After (or a jittered exponential
+    backoff) and is retried up to max_retries times before AIRateLimited is raised.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float, interactive_reserve: float,
+                 max_retries: int, base_delay: float, max_delay: float):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.interactive_reserve = interactive_reserve
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._queues: Dict[str, Deque[_Waiter]] = {priority: deque() for priority in PRIORITIES}
+        self._paused_until = 0.0
+        # verrou de threads : le pool de jobs peut appeler depuis une autre boucle (asyncio.run)
+        self._lock = threading.Lock()
+
+    async def run(self, request: Callable[[], Awaitable[T]], estimated_tokens: int) -> T:
+        """Waits for the budget, then awaits request(); 429s and transient errors are retried.
+
+        Each failed or cancelled attempt (e.g. the slower one of a hedged call) gives its reservation
+        back. After a success, the caller passes the response usage to settle(estimated_tokens, used).
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire(estimated_tokens)
+            succeeded = False
+            backoff = 0.0
+            try:
+                response = await request()
+                succeeded = True
+                return response
+            except openai.RateLimitError as e:
+                delay = self._retry_after(e) or self._backoff(attempt)
+                self.pause(delay)
+                if attempt == self.max_retries:
+                    rate_limit_responses.labels("gave_up").inc()
+                    raise AIRateLimited(delay) from e
+                rate_limit_responses.labels("retried").inc()
+            except openai.APITimeoutError:
+                raise # le délai de l'appel est celui de l'appelant : pas de nouvel essai
+            except (openai.APIConnectionError, openai.InternalServerError):
+                if attempt == self.max_retries:
+                    raise
+                backoff = self._backoff(attempt)
+            finally:
+                if not succeeded:
+                    self.settle(estimated_tokens, 0) # réservation rendue, quelle que soit l'erreur
+            if backoff:
+                await asyncio.sleep(backoff)
+
+    async def acquire(self, tokens: int) -> None:
+        priority = llm_priority.get()
+        waiter = _Waiter(tokens)
+        start = time.monotonic()
+        with self._lock:
+            self._queues[priority].append(waiter)
+        try:
+            while True:
+                waiter.event.clear() # avant le test : un réveil pendant le test n'est pas perdu
+                with self._lock:
+                    delay = self._try_grant(waiter, priority)
+                if delay is None:
+                    break
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException: # annulé ou délai de l'appelant dépassé : quitte la file
+            with self._lock:
+                if waiter in self._queues[priority]:
+                    self._queues[priority].remove(waiter)
+                    self._wake_heads()
+            raise
+        scheduler_wait.labels(priority).observe(time.monotonic() - start)
+
+    def settle(self, estimated_tokens: int, used_tokens: int) -> None:
+        """Gives back (or takes) the difference between the estimate and the tokens actually used."""
+        with self._lock:
+            self.tokens.refill(time.monotonic())
+            if used_tokens < estimated_tokens:
+                self.tokens.give_back(estimated_tokens - used_tokens)
+                self._wake_heads()
+            else:
+                self.tokens.take(used_tokens - estimated_tokens)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                "waiting": {priority: len(queue) for priority, queue in self._queues.items()},
+                "requests_available": None if self.requests.unlimited else self.requests.level,
+                "tokens_available": None if self.tokens.unlimited else self.tokens.level,
+                "paused_seconds": max(self._paused_until - now, 0.0),
+            }
+
+    def _try_grant(self, waiter: _Waiter, priority: str) -> Optional[float]:
+        # sous self._lock ; None = accordé, sinon secondes à attendre avant de réessayer
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+        queue = self._queues[priority]
+        if queue[0] is not waiter:
+            return IDLE_RECHECK_SECONDS # réveillé quand il arrive en tête
+        reserve = 0.0
+        if priority == BACKGROUND:
+            if self._queues[INTERACTIVE]:
+                return IDLE_RECHECK_SECONDS
+            reserve = self.interactive_reserve
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        wait = max(self.requests.wait_time(1, reserve), self.tokens.wait_time(waiter.tokens, reserve))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(waiter.tokens)
+        queue.popleft()
+        self._wake_heads()
+        return None
+
+    def _wake_heads(self) -> None:
+        for queue in self._queues.values():
+            if queue:
+                queue[0].wake()
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            if headers.get("retry-after-ms"):
+                return float(headers["retry-after-ms"]) / 1000
+            if headers.get("retry-after"):
+                return float(headers["retry-after"])
+        except ValueError: # date HTTP : ignorée, backoff par défaut
+            pass
+        return None
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+llm_scheduler = LLMScheduler(
+    requests_per_minute=config.AI_RPM_LIMIT,
+    tokens_per_minute=config.AI_TPM_LIMIT,
+    interactive_reserve=config.AI_INTERACTIVE_RESERVE,
+    max_retries=config.AI_RATE_LIMIT_RETRIES,
+    base_delay=config.AI_RETRY_BASE_DELAY,
+    max_delay=config.AI_RETRY_MAX_DELAY
+)
+
+
+def _collect_scheduler_metrics():
+    stats = llm_scheduler.stats()
+    lines = []
+    for priority, waiting in stats["waiting"].items():
+        lines += gauge_lines(f"ai_scheduler_waiting_{priority}", f"{priority.capitalize()} OpenAI calls waiting for budget", waiting)
+    for key in ("requests_available", "tokens_available"):
+        if stats[key] is not None:
+            lines += gauge_lines(f"ai_budget_{key}", f"OpenAI {key.replace('_', ' ')} in the per-minute budget", stats[key])
+    return lines
+
+registry.register_collector(_collect_scheduler_metrics)
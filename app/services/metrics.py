@@ -0,0 +1,241 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.config import config
+
+# Seconds, same defaults as the Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+class Histogram:
+    """Thread-safe fixed-bucket histogram."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # dernier compteur : +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            if value > self._max:
+                self._max = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns cumulative bucket counts keyed by upper bound, plus count, sum and max."""
+        with self._lock:
+            counts = list(self._counts)
+            total, count, maximum = self._sum, self._count, self._max
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative["+Inf" if bound == float("inf") else repr(bound)] = running
+        return {"buckets": cumulative, "count": count, "sum": total, "max": maximum}
+
+
+class CounterValue:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _NoopChild:
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1.0) -> None:
+        pass
+
+
+_NOOP = _NoopChild()
+
+
+class MetricFamily:
+    """A named metric with a fixed set of label names, one child per label values."""
+
+    def __init__(self, registry: "Registry", name: str, help_text: str, metric_type: str,
+                 label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.type = metric_type
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: Any):
+        if not self.registry.enabled:
+            return _NOOP
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = Histogram(self.buckets) if self.type == "histogram" else CounterValue()
+                    self._children[key] = child
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for key, child in sorted(self._children.items()):
+            labels = dict(zip(self.label_names, key))
+            if self.type == "histogram":
+                lines.extend(histogram_samples(self.name, child.snapshot(), labels))
+            else:
+                lines.append(f"{self.name}{_format_labels(labels)} {child.value}")
+        return lines
+
+
+def histogram_samples(name: str, snapshot: Dict[str, Any], labels: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Formats a Histogram.snapshot() as Prometheus _bucket/_sum/_count samples."""
+    labels = labels or {}
+    lines = [f"{name}_bucket{_format_labels({**labels, 'le': bound})} {count}"
+             for bound, count in snapshot["buckets"].items()]
+    lines.append(f"{name}_sum{_format_labels(labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+    return lines
+
+
+def metric_header(name: str, metric_type: str, help_text: str) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+
+
+def gauge_lines(name: str, help_text: str, value: float, metric_type: str = "gauge") -> List[str]:
+    return metric_header(name, metric_type, help_text) + [f"{name} {value}"]
+
+
+# Un collector produit à la demande des lignes déjà formatées (état d'un pool, d'un cache...)
+Collector = Callable[[], Iterable[str]]
+
+
+class Registry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._families: Dict[str, MetricFamily] = {}
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily(self, name, help_text, "counter", label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> MetricFamily:
+        return self._register(MetricFamily(self, name, help_text, "histogram", label_names, buckets))
+
+    def register_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text exposition format (0.0.4)."""
+        lines: List[str] = []
+        for family in self._families.values():
+            lines.extend(family.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, family: MetricFamily) -> MetricFamily:
+        self._families[family.name] = family
+        return family
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+registry = Registry(enabled=config.METRICS_ENABLED)
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+http_request_db_statements = registry.histogram(
+    "http_request_db_statements", "SQL statements executed per HTTP request", ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000))
+http_request_db_duration = registry.histogram(
+    "http_request_db_duration_seconds", "Time spent in SQL per HTTP request", ("method", "route"))
+db_statement_duration = registry.histogram(
+    "db_statement_duration_seconds", "SQL statement execution time", (),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+ai_request_duration = registry.histogram(
+    "ai_request_duration_seconds", "OpenAI call latency", ("operation", "outcome"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0))
+ai_stream_first_token = registry.histogram(
+    "ai_stream_time_to_first_token_seconds", "Time until the first streamed OpenAI token", ("operation",),
+    buckets=(0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 30.0))
+ai_tokens = registry.counter(
+    "ai_tokens_total", "OpenAI tokens used", ("operation", "kind"))
+transcripts_processed = registry.counter(
+    "transcripts_processed_total", "Videos handled by the background transcript pipeline", ("outcome",))
+cloudinary_upload_duration = registry.histogram(
+    "cloudinary_upload_duration_seconds", "Cloudinary upload time", ("outcome",),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0))
+cloudinary_upload_bytes = registry.counter(
+    "cloudinary_upload_bytes_total", "Bytes uploaded to Cloudinary")
+cloudinary_upload_throughput = registry.histogram(
+    "cloudinary_upload_throughput_bytes_per_second", "Cloudinary upload throughput", (),
+    buckets=(1e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7, 5e7, 1e8))
+
+# [nombre de requêtes SQL, durée cumulée] de la requête HTTP en cours
+_request_sql: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("request_sql", default=None)
+
+
+def record_sql_statement(seconds: float) -> None:
+    db_statement_duration.labels().observe(seconds)
+    current = _request_sql.get()
+    if current is not None:
+        current[0] += 1
+        current[1] += seconds
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and SQL usage per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        sql = [0, 0.0]
+        token = _request_sql.set(sql)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_sql.reset(token)
+            # le routeur FastAPI renseigne scope["route"] : on agrège par modèle de chemin
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.labels(method, path, status_code[0]).observe(elapsed)
+            http_request_db_statements.labels(method, path).observe(sql[0])
+            http_request_db_duration.labels(method, path).observe(sql[1])
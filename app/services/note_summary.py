@@ -0,0 +1,70 @@
+from typing import AsyncIterator, Dict, Iterable, List, Tuple
+
+from app.config import config
+from app.models.note import Note
+from app.models.note_chunk_summary import NoteChunkSummary
+from app.services.ai_service import AIService
+from app.services.text_chunker import split_into_chunks
+
+
+class NoteSummaryService:
+    """Summaries of notes in three steps, so that no transaction stays open during the OpenAI calls:
+    plan reads the note, generate calls OpenAI on plain data, apply writes the result (the caller commits)."""
+
+    @staticmethod
+    def plan(
+        content: str,
+        stored: Iterable[NoteChunkSummary] = (),
+        refresh: bool = False
+    ) -> Tuple[List[str], Dict[str, str]]:
+        """Chunks of content and the partial summaries already stored for them, by chunk key (none on refresh)."""
+        chunks = split_into_chunks(content, config.SUMMARY_CHUNK_CHARS)
+        known = {} if refresh else {row.content_hash: row.summary for row in stored}
+        return chunks, known
+
+    @staticmethod
+    async def generate(chunks: List[str], known: Dict[str, str], refresh: bool = False) -> Tuple[List[str], str]:
+        """Partial summaries of the chunks (only the unknown ones go through OpenAI) and the final summary."""
+        partials = await AIService.summarize_chunks(chunks, known, refresh=refresh)
+        return partials, await AIService.reduce_summaries(partials, refresh=refresh)
+
+    @staticmethod
+    def apply(note: Note, chunks: List[str], partials: List[str], summary: str, refresh: bool = False) -> None:
+        """Sets note.summary and keeps the partial summaries of the current chunks in note_chunk_summaries."""
+        keys = [AIService.summary_chunk_key(chunk) for chunk in chunks]
+        stored = {} if refresh else {row.content_hash: row for row in note.chunk_summaries}
+        NoteSummaryService._store(note, keys, partials, stored)
+        note.summary = summary
+
+    @staticmethod
+    async def stream(
+        chunks: List[str],
+        known: Dict[str, str],
+        partials: List[str],
+        refresh: bool = False
+    ) -> AsyncIterator[str]:
+        """Same result as generate, yielding the final summary text as it is generated.
+
+        The partial summaries are appended to partials, for apply.
+        """
+        if len(chunks) == 1 and AIService.summary_chunk_key(chunks[0]) not in known:
+            # note courte : le résumé du bloc est le résumé final, on le diffuse directement
+            parts: List[str] = []
+            async for delta in AIService.stream_summary_chunk(chunks[0], refresh=refresh):
+                parts.append(delta)
+                yield delta
+            partials.append("".join(parts).strip())
+            return
+
+        partials.extend(await AIService.summarize_chunks(chunks, known, refresh=refresh))
+        async for delta in AIService.stream_reduced_summary(partials, refresh=refresh):
+            yield delta
+
+    @staticmethod
+    def _store(note: Note, keys: List[str], partials: List[str], stored: Dict[str, NoteChunkSummary]) -> None:
+        rows = []
+        for position, (key, partial) in enumerate(zip(keys, partials)):
+            row = stored.pop(key, None) or NoteChunkSummary(content_hash=key, summary=partial)
+            row.position = position
+            rows.append(row)
+        note.chunk_summaries = rows # les blocs disparus sont supprimés (delete-orphan)
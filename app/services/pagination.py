@@ -0,0 +1,91 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+# taille maximale d'une page des routes de liste
+MAX_PAGE_SIZE = 1000
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order_columns: Sequence[Any]) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise InvalidCursor("Invalid pagination cursor")
+    if not isinstance(values, list) or len(values) != len(order_columns):
+        raise InvalidCursor("Invalid pagination cursor")
+
+    decoded = []
+    for column, value in zip(order_columns, values):
+        if value is not None and column.type.python_type is datetime:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise InvalidCursor("Invalid pagination cursor")
+        decoded.append(value)
+    return decoded
+
+
+def _after(order_columns: Sequence[Any], values: Sequence[Any]):
+    # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), portable sur SQLite et PostgreSQL
+    clauses = []
+    for i, column in enumerate(order_columns):
+        equal_prefix = [order_columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, column > values[i]))
+    return or_(*clauses)
+
+
+def paginate(
+    query: Query,
+    order_columns: Sequence[Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0
+) -> Tuple[List[Any], Optional[str]]:
+    """Returns one page of query ordered by order_columns, and the cursor of the next page.
+
+    With a cursor the page is selected by keyset (WHERE (cols) > cursor), which stays fast on
+    deep pages and is stable under concurrent inserts. Without one, skip/limit offset paging is
+    used for backward compatibility. The last order column must be unique (the primary key).
+    """
+    query = query.order_by(*order_columns)
+    if cursor:
+        query = query.filter(_after(order_columns, decode_cursor(cursor, order_columns)))
+    elif skip:
+        query = query.offset(skip)
+
+    rows = query.limit(max(limit, 0) + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:max(limit, 0)]
+    if not rows: # limit < 1 : pas de page, donc pas de curseur
+        return rows, None
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in order_columns])
+
+
+def set_next_page_headers(request: Request, response: Response, next_cursor: Optional[str]) -> None:
+    """Exposes the next cursor as X-Next-Cursor and as an RFC 8288 Link header."""
+    if next_cursor is None:
+        return
+    params = {key: value for key, value in request.query_params.items() if key not in ("cursor", "skip")}
+    params["cursor"] = next_cursor
+    response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["Link"] = f'<{request.url.replace_query_params(**params)}>; rel="next"'
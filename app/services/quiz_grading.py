@@ -0,0 +1,185 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.config import config
+from app.models.answer import Answer
+from app.models.question import Question
+from app.models.question_stats import QuestionStats
+from app.models.quiz_attempt import QuizAttempt
+from app.models.quiz_response import QuizResponse
+from app.models.quiz_stats import QuizStats
+from app.schemas.quiz_attempt import AttemptAnswer
+from app.services.db import engine
+
+
+class InvalidAttempt(ValueError):
+    """Raised when a submitted response does not match the quiz."""
+
+
+class AnswerKey:
+    """Answer ids of every question of a quiz, and which of them are correct."""
+
+    __slots__ = ("answers", "correct")
+
+    def __init__(self, answers: Dict[int, FrozenSet[int]], correct: Dict[int, FrozenSet[int]]):
+        self.answers = answers # question_id -> answer ids
+        self.correct = correct # question_id -> correct answer ids
+
+
+class AnswerKeyCache:
+    """LRU of answer keys per quiz, so that grading never walks the quiz -> questions -> answers graph."""
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[int, AnswerKey]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0 # même principe que l'entity cache : pas de clé lue avant une invalidation
+
+    def get(self, quiz_id: int, load: Callable[[], AnswerKey]) -> AnswerKey:
+        with self._lock:
+            key = self._entries.get(quiz_id)
+            if key is not None:
+                self._entries.move_to_end(quiz_id)
+                return key
+            epoch = self._epoch
+        key = load()
+        with self._lock:
+            if epoch == self._epoch:
+                self._entries[quiz_id] = key
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        return key
+
+    def invalidate(self, quiz_id: int) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.pop(quiz_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+
+answer_keys = AnswerKeyCache(max_entries=config.QUIZ_ANSWER_KEY_CACHE_SIZE)
+
+
+def _upsert_counters(db: Session, model: Any, key_column: str, rows: List[Dict[str, Any]], counters: List[str]) -> None:
+    # INSERT ... ON CONFLICT DO UPDATE : incrément atomique, sans lecture préalable
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    statement = dialect_insert(model).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=[key_column],
+        set_={counter: getattr(model, counter) + getattr(statement.excluded, counter) for counter in counters}
+    )
+    db.execute(statement)
+
+
+class QuizGradingService:
+    @staticmethod
+    def load_answer_key(db: Session, quiz_id: int) -> AnswerKey:
+        """Answer key of a quiz in one query."""
+        answers: Dict[int, set] = {}
+        correct: Dict[int, set] = {}
+        rows = db.execute(
+            select(Question.id, Answer.id, Answer.is_correct)
+            .outerjoin(Answer, Answer.question_id == Question.id)
+            .where(Question.quiz_id == quiz_id)
+        )
+        for question_id, answer_id, is_correct in rows:
+            answers.setdefault(question_id, set())
+            correct.setdefault(question_id, set())
+            if answer_id is not None:
+                answers[question_id].add(answer_id)
+                if is_correct:
+                    correct[question_id].add(answer_id)
+        return AnswerKey(
+            {question_id: frozenset(ids) for question_id, ids in answers.items()},
+            {question_id: frozenset(ids) for question_id, ids in correct.items()}
+        )
+
+    @staticmethod
+    def grade(key: AnswerKey, responses: List[AttemptAnswer]) -> List[Dict[str, Any]]:
+        """Grades the responses against the key; questions left out count as unanswered."""
+        submitted: Dict[int, Optional[int]] = {}
+        for response in responses:
+            if response.question_id not in key.answers:
+                raise InvalidAttempt(f"Question {response.question_id} is not part of this quiz")
+            if response.question_id in submitted:
+                raise InvalidAttempt(f"Question {response.question_id} is answered more than once")
+            if response.answer_id is not None and response.answer_id not in key.answers[response.question_id]:
+                raise InvalidAttempt(f"Answer {response.answer_id} does not belong to question {response.question_id}")
+            submitted[response.question_id] = response.answer_id
+
+        graded = []
+        for question_id, correct_ids in key.correct.items():
+            answer_id = submitted.get(question_id)
+            graded.append({
+                "question_id": question_id,
+                "answer_id": answer_id,
+                "is_correct": answer_id is not None and answer_id in correct_ids,
+                "correct_answer_ids": sorted(correct_ids),
+            })
+        return graded
+
+    @staticmethod
+    def submit(db: Session, quiz_id: int, responses: List[AttemptAnswer]) -> Dict[str, Any]:
+        """Grades an attempt, stores it with its responses and bumps the counters. The caller commits."""
+        key = answer_keys.get(quiz_id, lambda: QuizGradingService.load_answer_key(db, quiz_id))
+        if not key.answers:
+            raise InvalidAttempt("This quiz has no questions")
+        graded = QuizGradingService.grade(key, responses)
+        score = sum(response["is_correct"] for response in graded)
+        created_at = datetime.utcnow()
+
+        attempt_id = db.execute(
+            insert(QuizAttempt).returning(QuizAttempt.id),
+            {"quiz_id": quiz_id, "score": score, "total": len(graded), "created_at": created_at}
+        ).scalar_one()
+        db.execute(insert(QuizResponse), [
+            {"attempt_id": attempt_id, "question_id": response["question_id"],
+             "answer_id": response["answer_id"], "is_correct": response["is_correct"]}
+            for response in graded
+        ])
+        _upsert_counters(db, QuizStats, "quiz_id",
+                         [{"quiz_id": quiz_id, "attempts": 1, "correct": score, "answered": len(graded)}],
+                         ["attempts", "correct", "answered"])
+        _upsert_counters(db, QuestionStats, "question_id", [
+            {"question_id": response["question_id"], "quiz_id": quiz_id,
+             "attempts": 1, "correct": int(response["is_correct"])}
+            for response in graded
+        ], ["attempts", "correct"])
+
+        return {"id": attempt_id, "quiz_id": quiz_id, "score": score, "total": len(graded),
+                "created_at": created_at, "responses": graded}
+
+    @staticmethod
+    def get_stats(db: Session, quiz_id: int) -> Dict[str, Any]:
+        """Reads the precomputed counters: two small queries, whatever the number of attempts."""
+        quiz_stats = db.get(QuizStats, quiz_id)
+        rows = db.execute(
+            select(Question.id, QuestionStats.attempts, QuestionStats.correct)
+            .outerjoin(QuestionStats, QuestionStats.question_id == Question.id)
+            .where(Question.quiz_id == quiz_id)
+            .order_by(Question.position, Question.id)
+        )
+        questions = [
+            {"question_id": question_id, "attempts": attempts or 0, "correct": correct or 0,
+             "correct_rate": correct / attempts if attempts else None}
+            for question_id, attempts, correct in rows
+        ]
+        attempts = quiz_stats.attempts if quiz_stats is not None else 0
+        return {
+            "quiz_id": quiz_id,
+            "attempts": attempts,
+            "average_score": quiz_stats.correct / quiz_stats.answered if attempts and quiz_stats.answered else None,
+            "questions": questions,
+        }
@@ -0,0 +1,64 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.quiz import Quiz
+from app.models.question import Question
+from app.models.answer import Answer
+
+
+class QuizPersistenceService:
+    @staticmethod
+    def create_quiz_tree(db: Session, course_id: int, quiz_data: Dict[str, Any]) -> int:
+        """Writes a quiz with its questions and answers in a constant number of statements.
+
+        The quiz is inserted first, then every question in one multi-row INSERT ... RETURNING
+        and every answer in one batched INSERT, whatever the number of questions. Returns the
+        quiz id; the caller owns the transaction (commit/rollback).
+        """
+        quiz_id = QuizPersistenceService.create_quiz(db, course_id, quiz_data["title"], quiz_data.get("description"))
+        QuizPersistenceService.add_questions(db, quiz_id, quiz_data.get("questions") or [])
+        return quiz_id
+
+    @staticmethod
+    def create_quiz(db: Session, course_id: int, title: str, description: Optional[str] = None) -> int:
+        return db.execute(
+            insert(Quiz).returning(Quiz.id),
+            {"title": title, "description": description, "course_id": course_id},
+        ).scalar_one()
+
+    @staticmethod
+    def add_questions(db: Session, quiz_id: int, questions: List[Dict[str, Any]], start_position: int = 0) -> List[int]:
+        """Inserts questions (and their answers) in two statements. Returns the ids in input order."""
+        if not questions:
+            return []
+
+        # RETURNING order is not guaranteed for multi-row inserts: map ids back by position
+        rows = db.execute(
+            insert(Question).returning(Question.id, Question.position),
+            [
+                {
+                    "text": question_data["text"],
+                    "explanation": question_data.get("explanation", ""),
+                    "quiz_id": quiz_id,
+                    "position": position,
+                }
+                for position, question_data in enumerate(questions, start_position)
+            ],
+        ).all()
+        question_ids = [question_id for question_id, _ in sorted(rows, key=lambda row: row.position)]
+
+        answers = [
+            {
+                "text": answer_data["text"],
+                "is_correct": bool(answer_data.get("is_correct", False)),
+                "question_id": question_id,
+            }
+            for question_id, question_data in zip(question_ids, questions)
+            for answer_data in question_data.get("answers") or []
+        ]
+        if answers:
+            db.execute(insert(Answer), answers)
+
+        return question_ids
@@ -0,0 +1,315 @@
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, List, Optional, TypeVar
+
+from app.config import config
+from app.services.metrics import registry, gauge_lines
+from app.services.service_registry import LazyModule, ServiceNotConfigured
+
+openai = LazyModule("openai")
+cloudinary_exceptions = LazyModule("cloudinary.exceptions")
+
+T = TypeVar("T")
+
+# durée maximale (en secondes) que le client accorde à la requête, propagée aux appels OpenAI et Cloudinary
+REQUEST_TIMEOUT_HEADER = "x-request-timeout"
+
+# instant (time.monotonic) au-delà duquel la requête en cours n'attend plus ses appels sortants
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+breaker_rejections = registry.counter(
+    "circuit_breaker_rejections_total", "Upstream calls refused while the circuit was open", ("upstream",))
+breaker_transitions = registry.counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes", ("upstream", "state"))
+hedged_calls = registry.counter(
+    "upstream_hedged_calls_total", "Idempotent calls sent a second time because the first was slow, by winner",
+    ("upstream", "winner"))
+
+
+class UpstreamError(ValueError):
+    """OpenAI or Cloudinary call not made or abandoned; the application answers status_code.
+
+    A ValueError, so that SSE streams, jobs and the transcript pipeline handle it like any
+    other AI error.
+    """
+    status_code = 502
+    outcome = "error" # label des métriques de latence
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(UpstreamError):
+    status_code = 504
+    outcome = "deadline_exceeded"
+
+    def __init__(self):
+        super().__init__("Request deadline exceeded")
+
+
+class CircuitOpen(UpstreamError):
+    status_code = 503
+    outcome = "circuit_open"
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} is unavailable, retry in {math.ceil(retry_after)}s", retry_after)
+
+
+# --- Deadlines ---
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[None]:
+    """Sets a deadline seconds from now; an earlier deadline already set is kept."""
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(timeout: float) -> float:
+    """timeout, capped by the time left before the deadline. Raises DeadlineExceeded when none is left."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return timeout
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(timeout, left)
+
+
+def deadline_expired() -> bool:
+    deadline = _deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+class DeadlineMiddleware:
+    """Pure ASGI middleware: X-Request-Timeout (seconds) bounds every upstream call of the request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        seconds = None
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == REQUEST_TIMEOUT_HEADER.encode():
+                    try:
+                        seconds = float(value)
+                    except ValueError:
+                        pass # en-tête invalide : ignoré
+                    break
+        if seconds is None or not seconds > 0:
+            await self.app(scope, receive, send)
+            return
+        with deadline_scope(seconds):
+            await self.app(scope, receive, send)
+
+
+# --- Circuit breakers ---
+
+class TrackedCall:
+    """One logical call under CircuitBreaker.track(); attempt() times each request sent upstream."""
+
+    def __init__(self, slow_call_seconds: Optional[float]):
+        self.slow_call_seconds = slow_call_seconds
+        self.attempts = 0
+        self.slow = False
+
+    @contextmanager
+    def attempt(self) -> Iterator[None]:
+        self.attempts += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally: # annulée comprise
+            if self.slow_call_seconds is not None and time.monotonic() - start >= self.slow_call_seconds:
+                self.slow = True
+
+
+class CircuitBreaker:
+    """Fails fast while an upstream is unhealthy.
+
+    failure_threshold consecutive failures open the circuit; calls then raise CircuitOpen for
+    reset_timeout seconds, after which one probe call is let through (half-open): its success
+    closes the circuit, its failure opens it again. is_failure decides which exceptions say
+    the upstream is unhealthy (not 4xx answers); a call slower than slow_call_seconds is a
+    failure too, even if it was cancelled by its caller's timeout. A call cut short by the
+    request deadline (before slow_call_seconds) is not counted.
+
+    One track() block is one outcome, whatever the retries inside it: a short burst of
+    errors retried by the caller does not count once per attempt.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float,
+                 is_failure: Callable[[BaseException], bool], slow_call_seconds: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.slow_call_seconds = slow_call_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        """Raises CircuitOpen while the circuit is open, without taking the half-open probe."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at < self.reset_timeout:
+                self._reject()
+
+    @contextmanager
+    def track(self) -> Iterator[TrackedCall]:
+        """Wraps one logical upstream call (sync or async code, retries included) and records its outcome.
+
+        When the block times its requests with TrackedCall.attempt(), only their durations are
+        compared with slow_call_seconds (waiting for a rate budget or a slot is not the upstream's).
+        """
+        self._before()
+        call = TrackedCall(self.slow_call_seconds)
+        start = time.monotonic()
+
+        def slow() -> bool:
+            return call.slow if call.attempts else self._slow(start)
+
+        try:
+            yield call
+        except Exception as e:
+            if deadline_expired() and not slow():
+                self._release() # abandonné à l'échéance de la requête : rien à conclure sur le service
+            else:
+                self._after(self.is_failure(e) or slow())
+            raise
+        except BaseException: # annulé : verdict seulement si l'appel a déjà été trop lent
+            if slow():
+                self._after(True)
+            else:
+                self._release()
+            raise
+        self._after(slow())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "failures": self._failures}
+
+    def _before(self) -> None:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.OPEN or self._probing:
+                self._reject()
+            self._probing = True
+
+    def _after(self, failed: bool) -> None:
+        with self._lock:
+            self._probing = False
+            if not failed:
+                self._failures = 0
+                if self.state != self.CLOSED:
+                    self._set_state(self.CLOSED)
+                return
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                if self.state != self.OPEN:
+                    self._set_state(self.OPEN)
+
+    def _release(self) -> None:
+        with self._lock:
+            self._probing = False
+
+    def _slow(self, start: float) -> bool:
+        return self.slow_call_seconds is not None and time.monotonic() - start >= self.slow_call_seconds
+
+    def _reject(self) -> None:
+        # sous self._lock
+        breaker_rejections.labels(self.name).inc()
+        retry_after = self.reset_timeout - (time.monotonic() - self._opened_at)
+        raise CircuitOpen(self.name, max(retry_after, 1.0) if self.state == self.OPEN else 1.0)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        breaker_transitions.labels(self.name, state).inc()
+
+
+def _openai_failure(error: BaseException) -> bool:
+    # 429 et 4xx : le service répond, il n'est pas en panne
+    return isinstance(error, (openai.APIConnectionError, openai.InternalServerError))
+
+
+def _cloudinary_failure(error: BaseException) -> bool:
+    healthy = (cloudinary_exceptions.BadRequest, cloudinary_exceptions.AuthorizationRequired,
+               cloudinary_exceptions.NotAllowed, cloudinary_exceptions.NotFound,
+               cloudinary_exceptions.AlreadyExists, cloudinary_exceptions.RateLimited)
+    # OSError : fichier local illisible, pas une panne de Cloudinary
+    return not isinstance(error, healthy + (OSError, UpstreamError, ServiceNotConfigured))
+
+
+openai_breaker = CircuitBreaker(
+    "OpenAI", config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT, _openai_failure,
+    slow_call_seconds=config.AI_SLOW_CALL_SECONDS or None
+)
+cloudinary_breaker = CircuitBreaker(
+    "Cloudinary", config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_TIMEOUT, _cloudinary_failure
+)
+
+
+# --- Hedging ---
+
+async def hedged(call: Callable[[], Awaitable[T]], hedge_after: float, upstream: str, max_attempts: int = 2) -> T:
+    """Runs call(), and again if it has not finished after hedge_after seconds; the first result wins.
+
+    Only for idempotent calls. The slower attempt is cancelled. A failure is not retried here:
+    it is returned unless another attempt is still running.
+    """
+    if hedge_after <= 0 or max_attempts <= 1:
+        return await call()
+    first = asyncio.ensure_future(call())
+    running = [first]
+    attempts = 1
+    try:
+        while True:
+            wait = hedge_after if attempts < max_attempts else None
+            done, _ = await asyncio.wait(running, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                running.append(asyncio.ensure_future(call()))
+                attempts += 1
+                continue
+            error: Optional[BaseException] = None
+            for task in done:
+                running.remove(task)
+                if task.exception() is None:
+                    if attempts > 1:
+                        hedged_calls.labels(upstream, "first" if task is first else "hedge").inc()
+                    return task.result()
+                error = task.exception()
+            if not running:
+                raise error
+    finally:
+        for task in running:
+            task.cancel()
+
+
+def _collect_breaker_metrics() -> List[str]:
+    lines = []
+    for breaker in (openai_breaker, cloudinary_breaker):
+        state = breaker.stats()["state"]
+        value = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}[state]
+        lines += gauge_lines(f"circuit_breaker_state_{breaker.name.lower()}",
+                             f"{breaker.name} circuit (0 closed, 1 half-open, 2 open)", value)
+    return lines
+
+registry.register_collector(_collect_breaker_metrics)
@@ -0,0 +1,268 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import DDL, event, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.config import config
+from app.models.note import Note
+from app.models.video import Video
+from app.services.db import engine
+
+SEARCH_TYPES = ("note", "video")
+
+# Colonnes indexées par type : (titre, [corps...])
+SEARCHABLE = {
+    "note": (Note, "title", ("content",)),
+    "video": (Video, "title", ("description", "transcript")),
+}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or the to with "
+    "au aux ce ces dans de des du en est et la le les leur ou par pour sur un une".split()
+)
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Lowercases, strips accents and splits on word boundaries."""
+    if not value:
+        return []
+    normalized = unicodedata.normalize("NFKD", value.lower())
+    normalized = "".join(char for char in normalized if not unicodedata.combining(char))
+    return [token for token in _TOKEN_RE.findall(normalized) if token not in _STOPWORDS]
+
+
+class InvertedIndex:
+    """Pure-Python BM25 inverted index over notes and videos, used when the database is not PostgreSQL.
+
+    It is built from the database on first use and kept up to date from committed ORM changes.
+    """
+
+    TITLE_WEIGHT = 2
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._postings: Dict[str, Dict[Tuple[str, int], int]] = defaultdict(dict)
+        self._documents: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        self._total_length = 0
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def reset(self) -> None:
+        """Drops the index; it is rebuilt from the database on the next search."""
+        with self._lock:
+            self._built = False
+            self._postings.clear()
+            self._documents.clear()
+            self._total_length = 0
+
+    def build(self, db: Session) -> None:
+        with self._lock:
+            self.reset()
+            for doc_type, (model, title_field, body_fields) in SEARCHABLE.items():
+                columns = [model.id, model.course_id, getattr(model, title_field)] + [getattr(model, f) for f in body_fields]
+                for row in db.query(*columns).yield_per(1000):
+                    self._add(doc_type, row[0], row[1], row[2], row[3:])
+            self._built = True
+
+    def upsert(self, doc_type: str, doc_id: int, course_id: int, title: Optional[str],
+               bodies: Sequence[Optional[str]]) -> None:
+        with self._lock:
+            self._remove((doc_type, doc_id))
+            self._add(doc_type, doc_id, course_id, title, bodies)
+
+    def remove(self, doc_type: str, doc_id: int) -> None:
+        with self._lock:
+            self._remove((doc_type, doc_id))
+
+    def reindex(self, db: Session, doc_type: str, doc_id: int) -> None:
+        """Reloads one document from the database, after a Core UPDATE the session hooks do not see."""
+        if not self._built: # construit depuis la base à la première recherche
+            return
+        model, title_field, body_fields = SEARCHABLE[doc_type]
+        columns = [model.course_id, getattr(model, title_field)] + [getattr(model, f) for f in body_fields]
+        row = db.query(*columns).filter(model.id == doc_id).first()
+        if row is None:
+            self.remove(doc_type, doc_id)
+        else:
+            self.upsert(doc_type, doc_id, row[0], row[1], row[2:])
+
+    def remove_course(self, course_id: int) -> None:
+        with self._lock:
+            for key in [key for key, doc in self._documents.items() if doc["course_id"] == course_id]:
+                self._remove(key)
+
+    def search(self, query: str, course_id: Optional[int] = None, types: Sequence[str] = SEARCH_TYPES,
+               skip: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            postings = [self._postings.get(term, {}) for term in terms]
+            if not all(postings):
+                return []
+            # tous les termes doivent apparaître (même sémantique que websearch_to_tsquery)
+            candidates = set.intersection(*(set(posting) for posting in sorted(postings, key=len)))
+
+            total_docs = len(self._documents)
+            avg_length = self._total_length / total_docs if total_docs else 0
+            results = []
+            for key in candidates:
+                doc = self._documents[key]
+                if key[0] not in types or (course_id is not None and doc["course_id"] != course_id):
+                    continue
+                score = 0.0
+                for posting in postings:
+                    tf = posting[key]
+                    idf = math.log(1 + (total_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                    norm = tf + self.K1 * (1 - self.B + self.B * doc["length"] / (avg_length or 1))
+                    score += idf * tf * (self.K1 + 1) / norm
+                results.append({"type": key[0], "id": key[1], "title": doc["title"],
+                                "course_id": doc["course_id"], "rank": score})
+
+        results.sort(key=lambda result: (-result["rank"], result["type"], result["id"]))
+        return results[skip:skip + limit]
+
+    def _add(self, doc_type: str, doc_id: int, course_id: int, title: Optional[str], bodies: Iterable[Optional[str]]) -> None:
+        frequencies = Counter()
+        for token in tokenize(title):
+            frequencies[token] += self.TITLE_WEIGHT
+        for body in bodies:
+            frequencies.update(tokenize(body))
+
+        key = (doc_type, doc_id)
+        length = sum(frequencies.values())
+        self._documents[key] = {"title": title, "course_id": course_id, "length": length, "terms": list(frequencies)}
+        self._total_length += length
+        for term, frequency in frequencies.items():
+            self._postings[term][key] = frequency
+
+    def _remove(self, key: Tuple[str, int]) -> None:
+        doc = self._documents.pop(key, None)
+        if doc is None:
+            return
+        self._total_length -= doc["length"]
+        for term in doc["terms"]:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(key, None)
+                if not posting:
+                    del self._postings[term]
+
+
+search_index = InvertedIndex()
+
+
+class SearchService:
+    @staticmethod
+    def uses_postgres() -> bool:
+        return engine.dialect.name == "postgresql"
+
+    @staticmethod
+    def search(db: Session, query: str, course_id: Optional[int] = None, types: Sequence[str] = SEARCH_TYPES,
+               skip: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        if SearchService.uses_postgres():
+            return SearchService._search_postgres(db, query, course_id, types, skip, limit)
+
+        if not search_index.built:
+            search_index.build(db)
+        return search_index.search(query, course_id=course_id, types=types, skip=skip, limit=limit)
+
+    @staticmethod
+    def _search_postgres(db: Session, query: str, course_id: Optional[int], types: Sequence[str],
+                         skip: int, limit: int) -> List[Dict[str, Any]]:
+        selects = []
+        for doc_type in types:
+            table = SEARCHABLE[doc_type][0].__tablename__
+            selects.append(
+                f"SELECT '{doc_type}' AS type, id, title, course_id, ts_rank_cd(search_vector, query) AS rank "
+                f"FROM {table}, websearch_to_tsquery(CAST(:config AS regconfig), :query) AS query "
+                f"WHERE search_vector @@ query"
+                + (" AND course_id = :course_id" if course_id is not None else "")
+            )
+        if not selects:
+            return []
+
+        sql = text(" UNION ALL ".join(selects) + " ORDER BY rank DESC, type, id LIMIT :limit OFFSET :skip")
+        params = {"config": config.SEARCH_TEXT_CONFIG, "query": query, "course_id": course_id,
+                  "limit": limit, "skip": skip}
+        return [dict(row._mapping) for row in db.execute(sql, params)]
+
+
+# PostgreSQL : colonnes tsvector générées (maintenues à chaque écriture) + index GIN
+def _tsvector_ddl(table: str, title_field: str, body_fields: Sequence[str]) -> DDL:
+    language = config.SEARCH_TEXT_CONFIG.replace("'", "")
+    body = " || ' ' || ".join(f"coalesce({field}, '')" for field in body_fields)
+    return DDL(
+        f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+        f"setweight(to_tsvector('{language}'::regconfig, coalesce({title_field}, '')), 'A') || "
+        f"setweight(to_tsvector('{language}'::regconfig, {body}), 'B')) STORED; "
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)"
+    ).execute_if(dialect="postgresql")
+
+
+for _model, _title_field, _body_fields in SEARCHABLE.values():
+    event.listen(_model.__table__, "after_create", _tsvector_ddl(_model.__tablename__, _title_field, _body_fields))
+
+
+def create_search_vectors(connection: Connection) -> None:
+    """Adds the tsvector columns and GIN indexes to tables created before them (after_create only
+    covers the tables create_all creates). Idempotent; no-op outside PostgreSQL."""
+    if connection.dialect.name != "postgresql":
+        return
+    for model, title_field, body_fields in SEARCHABLE.values():
+        connection.execute(_tsvector_ddl(model.__tablename__, title_field, body_fields))
+
+
+# SQLite : l'index en mémoire suit les modifications une fois committées
+_MODEL_TYPES = {model: doc_type for doc_type, (model, _, _) in SEARCHABLE.items()}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_search_changes(session, flush_context):
+    if SearchService.uses_postgres() or not search_index.built:
+        return
+    changes = session.info.setdefault("search_changes", {})
+    for instance in list(session.new) + list(session.dirty):
+        doc_type = _MODEL_TYPES.get(type(instance))
+        if doc_type is not None:
+            # valeurs copiées maintenant : les instances sont expirées après le commit
+            _, title_field, body_fields = SEARCHABLE[doc_type]
+            changes[(doc_type, instance.id)] = (
+                instance.course_id,
+                getattr(instance, title_field),
+                [getattr(instance, field) for field in body_fields],
+            )
+    for instance in session.deleted:
+        doc_type = _MODEL_TYPES.get(type(instance))
+        if doc_type is not None:
+            changes[(doc_type, instance.id)] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_search_changes(session):
+    changes = session.info.pop("search_changes", None)
+    if not changes:
+        return
+    for (doc_type, doc_id), values in changes.items():
+        if values is None:
+            search_index.remove(doc_type, doc_id)
+        else:
+            search_index.upsert(doc_type, doc_id, *values)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_search_changes(session):
+    session.info.pop("search_changes", None)
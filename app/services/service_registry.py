@@ -0,0 +1,61 @@
+import importlib
+import threading
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ServiceNotConfigured(RuntimeError):
+    """An external service is used but its credentials are missing."""
+
+
+class LazyModule:
+    """Module proxy imported on first attribute access.
+
+    The OpenAI and Cloudinary SDKs take most of the cold import time of the app: with this,
+    workers that never call them (or not yet) do not pay for it.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+
+class ServiceRegistry:
+    """Shared clients created on first use instead of at import time."""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def reset(self, name: Optional[str] = None) -> None:
+        """Drops the cached instance(s); the next get() builds them again (credential rotation, tests)."""
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+    def initialized(self) -> List[str]:
+        return sorted(self._instances)
+
+
+services = ServiceRegistry()
@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+from app.config import config
+from app.services.metrics import registry, gauge_lines
+
+T = TypeVar("T")
+
+single_flight_calls = registry.counter(
+    "ai_single_flight_calls_total", "Identical AI calls started (leader) or merged into one in flight (coalesced)",
+    ("operation", "role"))
+
+
+class SingleFlight:
+    """Merges concurrent calls with the same key: the first one runs, the others wait for its result.
+
+    The call runs in a task of its own, bounded by the timeout of the caller that started it (the
+    key is free again when it expires). Every caller waits with its own timeout, shielded: a caller
+    that gives up or is cancelled (client gone) does not cancel the call for the others.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        # clé préfixée par la boucle : les jobs sans boucle applicative tournent dans asyncio.run
+        self._flights: Dict[Tuple[int, Hashable], "asyncio.Task[Any]"] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]], timeout: float,
+                 operation: str = "call") -> Tuple[T, bool]:
+        """Returns (result, coalesced); coalesced is True when the result comes from another caller's call.
+
+        Raises asyncio.TimeoutError when timeout expires first, and the call's exception otherwise.
+        """
+        if not self.enabled:
+            return await asyncio.wait_for(call(), timeout), False
+
+        flight_key = (id(asyncio.get_running_loop()), key)
+        task = self._flights.get(flight_key)
+        coalesced = task is not None
+        if task is None:
+            task = asyncio.ensure_future(asyncio.wait_for(call(), timeout))
+            self._flights[flight_key] = task
+            task.add_done_callback(lambda done: self._finish(flight_key, done))
+        single_flight_calls.labels(operation, "coalesced" if coalesced else "leader").inc()
+        return await asyncio.wait_for(asyncio.shield(task), timeout), coalesced
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def _finish(self, flight_key: Tuple[int, Hashable], task: "asyncio.Task[Any]") -> None:
+        if self._flights.get(flight_key) is task:
+            del self._flights[flight_key]
+        if not task.cancelled():
+            task.exception() # déjà transmise aux appelants ; évite "exception was never retrieved"
+
+
+# appels OpenAI, clé = clé du cache de réponses (prompt, modèle, paramètres)
+ai_flights = SingleFlight(enabled=config.AI_SINGLE_FLIGHT_ENABLED)
+
+
+def _collect_single_flight_metrics():
+    return gauge_lines("ai_single_flight_in_flight", "Distinct AI calls in flight", ai_flights.in_flight())
+
+registry.register_collector(_collect_single_flight_metrics)
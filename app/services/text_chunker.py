@@ -0,0 +1,59 @@
+import hashlib
+import re
+from typing import List
+
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _split_long_paragraph(paragraph: str, max_chars: int) -> List[str]:
+    pieces, current = [], ""
+    for sentence in _SENTENCE_SPLIT.split(paragraph):
+        while len(sentence) > max_chars: # phrase sans ponctuation : coupe brute
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(text: str, max_chars: int, boundary_every: int = 4) -> List[str]:
+    """Packs paragraphs into chunks of at most max_chars.
+
+    Besides the size limit, a chunk also ends after any paragraph whose hash falls on a
+    content-defined boundary (about one paragraph in boundary_every). Editing a paragraph
+    therefore only changes its own chunk (and at worst the following ones up to the next
+    boundary), so unchanged chunks keep their hash and their cached summary.
+    """
+    paragraphs = []
+    for paragraph in _PARAGRAPH_SPLIT.split(text):
+        paragraph = paragraph.strip()
+        if paragraph:
+            paragraphs.extend(_split_long_paragraph(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph])
+
+    chunks, current = [], []
+    size = 0
+    for paragraph in paragraphs:
+        if current and size + 2 + len(paragraph) > max_chars:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + (2 if size else 0)
+        if int(content_hash(paragraph)[:8], 16) % boundary_every == 0:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, update
+
+from app.config import config
+from app.models.video import Video
+from app.services.ai_service import AIService
+from app.services.db import SessionLocal
+from app.services.entity_cache import entity_cache
+from app.services.llm_scheduler import background_priority
+from app.services.search_service import search_index
+from app.services.vector_index import vector_index
+from app.services.metrics import transcripts_processed
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptPipeline:
+    """Generates pending transcripts (Video.is_synchronized == False) in the background.
+
+    Due videos are claimed with a conditional UPDATE that pushes transcript_next_attempt_at
+    forward (a lease), so several processes can run the pipeline without transcribing the same
+    video twice. Failures are retried with exponential backoff up to TRANSCRIPT_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, concurrency: int, poll_interval: float, max_attempts: int,
+                 base_delay: float, max_delay: float):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self) -> None:
+        """Wakes the pipeline up after new pending transcripts were committed (thread-safe)."""
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def drain(self) -> int:
+        """Processes due videos batch by batch until none is left. Returns how many were handled."""
+        handled = 0
+        if not AIService.is_configured(): # les vidéos restent en attente sans consommer de tentatives
+            return handled
+        while True:
+            batch = await run_in_threadpool(self._claim_batch, self.concurrency)
+            if not batch:
+                return handled
+            await asyncio.gather(*(self._process(video_id, url, attempts) for video_id, url, attempts in batch))
+            handled += len(batch)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Transcript pipeline iteration failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _claim_batch(self, limit: int) -> List[Tuple[int, str, int]]:
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=config.AI_TIMEOUT * 2)
+        due = or_(Video.transcript_next_attempt_at.is_(None), Video.transcript_next_attempt_at <= now)
+        claimed = []
+        with SessionLocal() as db:
+            candidates = (
+                db.query(Video.id, Video.cloudinary_url, Video.transcript_attempts)
+                .filter(Video.is_synchronized.is_(False), Video.transcript_attempts < self.max_attempts, due)
+                .order_by(Video.transcript_next_attempt_at, Video.id)
+                .limit(limit)
+                .all()
+            )
+            for video_id, url, attempts in candidates:
+                won = db.execute(
+                    update(Video)
+                    .where(Video.id == video_id, Video.is_synchronized.is_(False), due)
+                    .values(transcript_next_attempt_at=lease_until)
+                ).rowcount
+                if won:
+                    claimed.append((video_id, url, attempts))
+            db.commit()
+        return claimed
+
+    async def _process(self, video_id: int, url: str, attempts: int) -> None:
+        try:
+            with background_priority(): # passe après les requêtes des utilisateurs
+                transcript = await AIService.generate_transcript(url)
+        except Exception as e:
+            attempts += 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+            outcome = "failed" if attempts >= self.max_attempts else "retry"
+            logger.error(f"Transcript for video {video_id} failed (attempt {attempts}/{self.max_attempts}): {e}")
+            transcripts_processed.labels(outcome).inc()
+            await run_in_threadpool(
+                self._save, video_id,
+                transcript_attempts=attempts,
+                transcript_error=str(e),
+                transcript_next_attempt_at=datetime.utcnow() + timedelta(seconds=delay)
+            )
+            return
+
+        transcripts_processed.labels("success").inc()
+        await run_in_threadpool(
+            self._save, video_id,
+            transcript=transcript,
+            is_synchronized=True,
+            transcript_attempts=attempts + 1,
+            transcript_error=None,
+            transcript_next_attempt_at=None
+        )
+
+    @staticmethod
+    def _save(video_id: int, **values) -> None:
+        with SessionLocal() as db:
+            # un update_video/regenerate concurrent a pu passer avant : on n'écrase qu'un état en attente
+            db.execute(update(Video).where(Video.id == video_id, Video.is_synchronized.is_(False)).values(**values))
+            db.commit()
+            if "transcript" in values: # UPDATE Core : les hooks de session ne voient pas ce texte
+                search_index.reindex(db, "video", video_id)
+                vector_index.reindex(db, "video", video_id)
+        entity_cache.invalidate("video", video_id)
+
+
+transcript_pipeline = TranscriptPipeline(
+    concurrency=config.TRANSCRIPT_WORKERS,
+    poll_interval=config.TRANSCRIPT_POLL_INTERVAL,
+    max_attempts=config.TRANSCRIPT_MAX_ATTEMPTS,
+    base_delay=config.TRANSCRIPT_RETRY_BASE_DELAY,
+    max_delay=config.TRANSCRIPT_RETRY_MAX_DELAY
+)
@@ -0,0 +1,54 @@
+import os
+import tempfile
+from typing import AsyncIterator
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import FormData, Headers
+from starlette.formparsers import MultiPartParser
+
+# Taille du tampon mémoire avant écriture sur disque
+SPOOL_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when a streamed upload goes over the configured size limit."""
+
+
+async def limit_size(chunks: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    """Passes the chunks through, raising UploadTooLarge as soon as their total goes over max_bytes."""
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLarge(f"Upload exceeds the maximum size of {max_bytes} bytes")
+        yield chunk
+
+
+async def parse_multipart(headers: Headers, chunks: AsyncIterator[bytes], max_bytes: int) -> FormData:
+    """Parses a multipart/form-data body, reading at most max_bytes whether or not a Content-Length
+    was sent. The caller closes the form.
+    """
+    return await MultiPartParser(headers, limit_size(chunks, max_bytes)).parse()
+
+
+async def spool_to_disk(chunks: AsyncIterator[bytes], max_bytes: int, suffix: str = "") -> str:
+    """Writes an async stream of chunks to a temporary file with bounded memory. Returns its path.
+
+    The caller is responsible for deleting the file.
+    """
+    buffer = bytearray()
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        async for chunk in limit_size(chunks, max_bytes):
+            buffer += chunk
+            if len(buffer) >= SPOOL_BUFFER_SIZE:
+                await run_in_threadpool(temp_file.write, buffer)
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(temp_file.write, buffer)
+        temp_file.close()
+        return temp_file.name
+    except BaseException:
+        temp_file.close()
+        os.unlink(temp_file.name)
+        raise
@@ -0,0 +1,554 @@
+import json
+import logging
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.config import config
+from app.models.note import Note
+from app.models.video import Video
+from app.services.search_service import tokenize
+from app.services.service_registry import LazyModule, services
+from app.services.text_chunker import split_into_chunks
+
+np = LazyModule("numpy")
+
+logger = logging.getLogger(__name__)
+
+DOC_TYPES = ("note", "video")
+
+# Colonnes dont le texte est vectorisé, par type : (modèle, [champs...])
+EMBEDDED = {
+    "note": (Note, ("title", "content")),
+    "video": (Video, ("title", "description", "transcript")),
+}
+
+# Lignes comparées par produit matriciel à la fois (64 Mo en float32, dimension 256)
+SEARCH_BLOCK_ROWS = 65536
+KMEANS_ITERATIONS = 8
+EMBED_BATCH = 256
+DEAD = -1
+
+
+class HashingEmbedder:
+    """Deterministic local embedder: signed feature hashing of word unigrams and bigrams, L2-normalized.
+
+    No model and no network: good enough for lexical similarity, and stable across runs and
+    machines (crc32, not the salted built-in hash), which keeps offline tests reproducible.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+            if not features:
+                continue
+            hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features),
+                                 dtype=np.uint32, count=len(features))
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], (hashes >> 1) % self.dim, signs)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+# Embedders disponibles (VECTOR_EMBEDDER) ; un embedder expose name, dim et embed(texts)
+EMBEDDERS: Dict[str, Callable[[], Any]] = {
+    "hashing": lambda: HashingEmbedder(config.VECTOR_DIM),
+}
+
+
+def _create_embedder():
+    factory = EMBEDDERS.get(config.VECTOR_EMBEDDER)
+    if factory is None:
+        raise ValueError(f"Unknown VECTOR_EMBEDDER {config.VECTOR_EMBEDDER!r} (available: {', '.join(EMBEDDERS)})")
+    return factory()
+
+services.register("embedder", _create_embedder)
+
+
+def document_chunks(title: Optional[str], bodies: Sequence[Optional[str]]) -> List[str]:
+    """Texts embedded for one document: each chunk of the body, prefixed by the title."""
+    body = "\n\n".join(part for part in bodies if part)
+    chunks = split_into_chunks(body, config.VECTOR_CHUNK_CHARS) if body else []
+    title = title or ""
+    return [f"{title}\n\n{chunk}" for chunk in chunks] or ([title] if title else [])
+
+
+def _doc_key(doc_type: str, doc_id: int) -> int:
+    return doc_id * len(DOC_TYPES) + DOC_TYPES.index(doc_type)
+
+
+def _split_key(key: int) -> Tuple[str, int]:
+    return DOC_TYPES[key % len(DOC_TYPES)], key // len(DOC_TYPES)
+
+
+class CourseVectors:
+    """Chunk vectors of one course: a float32 matrix and the document key of each row, both memory-mapped.
+
+    Rows are appended; a changed or deleted document has its rows marked dead. Small courses are
+    searched by a full scan. From VECTOR_IVF_MIN_ROWS rows on, the rows are clustered (k-means)
+    and stored sorted by cluster, so that a query only scans the VECTOR_IVF_PROBES clusters
+    closest to it: contiguous ranges of the file, plus the rows appended since the clustering.
+    Access is serialized by the instance lock.
+    """
+
+    def __init__(self, directory: str, course_id: int, embedder: Any):
+        self.lock = threading.RLock()
+        self.embedder = embedder
+        base = os.path.join(directory, f"course_{course_id}")
+        self.vectors_path, self.keys_path, self.lists_path = base + ".f32", base + ".keys", base + ".lists"
+        self.header_path, self.centroids_path = base + ".json", base + ".centroids.npy"
+        self.count = 0
+        self.dead = 0
+        self.capacity = 0
+        self.clustered = 0 # lignes triées par cluster en tête de fichier
+        self.vectors = None
+        self.keys = None
+        self.lists = None # cluster de chaque ligne (-1 : pas encore de clusters)
+        self.centroids = None
+        self.offsets = None # début de chaque cluster dans les lignes triées
+        self.rows: Dict[int, List[int]] = {} # clé de document -> lignes
+
+    @property
+    def loaded(self) -> bool:
+        return self.vectors is not None
+
+    def load(self) -> bool:
+        """Opens the files if they exist and were built with the current embedder."""
+        try:
+            with open(self.header_path) as handle:
+                header = json.load(handle)
+        except (OSError, ValueError):
+            return False
+        if header.get("embedder") != self.embedder.name or header.get("dim") != self.embedder.dim:
+            return False
+        self.count, self.dead, self.capacity = header["count"], header["dead"], header["capacity"]
+        self.clustered = header.get("clustered", 0)
+        self._map()
+        self._index_rows()
+        if self.clustered:
+            self.centroids = np.load(self.centroids_path)
+            self._compute_offsets()
+        return True
+
+    def reset(self, capacity: int = 1024) -> None:
+        self.close()
+        os.makedirs(os.path.dirname(self.vectors_path), exist_ok=True)
+        for path in (self.vectors_path, self.keys_path, self.lists_path):
+            with open(path, "wb"):
+                pass
+        self.count, self.dead, self.capacity, self.clustered, self.rows = 0, 0, 0, 0, {}
+        self.centroids = self.offsets = None
+        self._grow(capacity)
+        self._write_header()
+
+    def close(self) -> None:
+        if self.vectors is not None:
+            for array in (self.vectors, self.keys, self.lists):
+                array.flush()
+        self.vectors = self.keys = self.lists = None
+
+    def delete_files(self) -> None:
+        self.close()
+        for path in (self.header_path, self.vectors_path, self.keys_path, self.lists_path, self.centroids_path):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def replace(self, doc_type: str, doc_id: int, texts: Sequence[str], save: bool = True) -> None:
+        key = _doc_key(doc_type, doc_id)
+        self._remove_rows(key)
+        if texts:
+            vectors = self.embedder.embed(texts)
+            if self.count + len(vectors) > self.capacity:
+                self._grow(max(self.capacity * 2, self.count + len(vectors)))
+            end = self.count + len(vectors)
+            self.vectors[self.count:end] = vectors
+            self.keys[self.count:end] = key
+            self.lists[self.count:end] = (vectors @ self.centroids.T).argmax(axis=1) if self.clustered else -1
+            self.rows[key] = list(range(self.count, end))
+            self.count = end
+        self._maybe_compact()
+        if save:
+            self._write_header()
+
+    def remove(self, doc_type: str, doc_id: int) -> None:
+        if self._remove_rows(_doc_key(doc_type, doc_id)):
+            self._maybe_compact()
+            self._write_header()
+
+    def save(self) -> None:
+        self._write_header()
+
+    def document_vectors(self, doc_type: str, doc_id: int) -> Optional["np.ndarray"]:
+        rows = self.rows.get(_doc_key(doc_type, doc_id))
+        return None if not rows else np.asarray(self.vectors[rows])
+
+    @property
+    def needs_clustering(self) -> bool:
+        alive = self.count - self.dead
+        if not self.clustered:
+            return alive >= config.VECTOR_IVF_MIN_ROWS
+        # trop de lignes ajoutées (hors clusters triés) ou supprimées depuis le dernier clustering
+        return self.count - self.clustered > self.clustered // 4 or self.dead * 2 > self.count
+
+    def search(self, queries: "np.ndarray", limit: int, types: Sequence[str],
+               exclude: Optional[Tuple[str, int]] = None) -> List[Tuple[str, int, float]]:
+        """Top documents by cosine similarity (vectors are normalized: a dot product).
+
+        The score of a row is its best similarity over the query vectors, and the score of a
+        document the best score of its rows. Each scanned range is one matrix product, of which
+        only the best candidates are kept.
+        """
+        if self.count == self.dead:
+            return []
+        allowed = np.array([doc_type in types for doc_type in DOC_TYPES])
+        excluded = _doc_key(*exclude) if exclude else DEAD
+        # plusieurs lignes par document : on garde assez de candidats pour en remplir limit
+        candidates = max(limit * 8, 64)
+
+        if self.clustered:
+            probes = self._probes(queries)
+            ranges = [(int(self.offsets[c]), int(self.offsets[c + 1])) for c in probes]
+            # lignes ajoutées depuis le clustering : seules celles des clusters sondés
+            tail = self.clustered + np.flatnonzero(np.isin(self.lists[self.clustered:self.count], probes))
+        else:
+            ranges = [(start, min(start + SEARCH_BLOCK_ROWS, self.count))
+                      for start in range(0, self.count, SEARCH_BLOCK_ROWS)]
+            tail = None
+
+        best_scores, best_rows = [], []
+        for start, end in ranges:
+            for block_start in range(start, end, SEARCH_BLOCK_ROWS):
+                rows = np.arange(block_start, min(block_start + SEARCH_BLOCK_ROWS, end))
+                self._best(self.vectors[rows[0]:rows[-1] + 1], rows, queries, candidates, allowed, excluded,
+                           best_scores, best_rows)
+        if tail is not None and len(tail):
+            self._best(self.vectors[tail], tail, queries, candidates, allowed, excluded, best_scores, best_rows)
+        if not best_scores:
+            return []
+
+        scores, rows = np.concatenate(best_scores), np.concatenate(best_rows)
+        order = np.argsort(-scores)
+        documents: Dict[int, float] = {}
+        for row, score in zip(rows[order].tolist(), scores[order].tolist()):
+            if score <= 0 or len(documents) >= limit: # -inf : ligne exclue ; 0 : aucun terme commun
+                break
+            documents.setdefault(int(self.keys[row]), score)
+        return [(*_split_key(key), score) for key, score in documents.items()]
+
+    def cluster(self, seed: int = 0) -> None:
+        """Spherical k-means over the live rows, then rewrites the files sorted by cluster (dead rows dropped)."""
+        alive = np.flatnonzero(self.keys[:self.count] != DEAD)
+        if len(alive) == 0:
+            return
+        rng = np.random.default_rng(seed)
+        nlist = int(min(max(np.sqrt(len(alive)) / 2, 16), 2048, len(alive)))
+        sample = np.sort(rng.choice(alive, size=min(len(alive), nlist * 32), replace=False))
+        points = np.asarray(self.vectors[sample])
+        centroids = points[rng.choice(len(points), size=nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = (points @ centroids.T).argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, points)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            filled = norms[:, 0] > 0 # cluster vide : on garde l'ancien centroïde
+            centroids[filled] = sums[filled] / norms[filled]
+
+        assignment = np.empty(len(alive), dtype=np.int32)
+        for start in range(0, len(alive), SEARCH_BLOCK_ROWS):
+            block = alive[start:start + SEARCH_BLOCK_ROWS]
+            assignment[start:start + len(block)] = (self.vectors[block] @ centroids.T).argmax(axis=1)
+        order = alive[np.argsort(assignment, kind="stable")]
+        assignment.sort(kind="stable")
+
+        # nouveaux fichiers écrits à côté puis substitués : un arrêt en cours de route laisse l'ancien index
+        capacity = len(alive) + max(1024, len(alive) // 4)
+        paths = (self.vectors_path, self.keys_path, self.lists_path)
+        temp_paths = [path + ".tmp" for path in paths]
+        dim = self.embedder.dim
+        vectors = np.memmap(temp_paths[0], dtype=np.float32, mode="w+", shape=(capacity, dim))
+        keys = np.memmap(temp_paths[1], dtype=np.int64, mode="w+", shape=(capacity,))
+        lists = np.memmap(temp_paths[2], dtype=np.int32, mode="w+", shape=(capacity,))
+        for start in range(0, len(order), SEARCH_BLOCK_ROWS):
+            block = order[start:start + SEARCH_BLOCK_ROWS]
+            vectors[start:start + len(block)] = self.vectors[block]
+            keys[start:start + len(block)] = self.keys[block]
+        lists[:len(order)] = assignment
+        for array in (vectors, keys, lists):
+            array.flush()
+        del vectors, keys, lists
+
+        self.close()
+        np.save(self.centroids_path, centroids)
+        for temp_path, path in zip(temp_paths, paths):
+            os.replace(temp_path, path)
+        self.count, self.dead, self.capacity, self.clustered = len(order), 0, capacity, len(order)
+        self.centroids = centroids
+        self._map()
+        self._index_rows()
+        self._compute_offsets()
+        self._write_header()
+
+    def _probes(self, queries: "np.ndarray") -> "np.ndarray":
+        # plusieurs vecteurs (related) : les clusters les plus proches de l'un d'eux, au plus le double
+        nprobe = min(config.VECTOR_IVF_PROBES * (1 if len(queries) == 1 else 2), len(self.centroids))
+        scores = (queries @ self.centroids.T).max(axis=0)
+        return np.sort(np.argpartition(-scores, nprobe - 1)[:nprobe])
+
+    def _best(self, vectors: "np.ndarray", rows: "np.ndarray", queries: "np.ndarray", candidates: int,
+              allowed: "np.ndarray", excluded: int, best_scores: list, best_rows: list) -> None:
+        scores = vectors @ queries[0] if len(queries) == 1 else (vectors @ queries.T).max(axis=1)
+        keys = self.keys[rows]
+        scores[(keys == DEAD) | (keys == excluded) | ~allowed[keys % len(DOC_TYPES)]] = -np.inf
+        if len(scores) > candidates:
+            top = np.argpartition(scores, -candidates)[-candidates:]
+            scores, rows = scores[top], rows[top]
+        best_scores.append(scores)
+        best_rows.append(rows)
+
+    def _map(self) -> None:
+        dim = self.embedder.dim
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, dim))
+        self.keys = np.memmap(self.keys_path, dtype=np.int64, mode="r+", shape=(self.capacity,))
+        self.lists = np.memmap(self.lists_path, dtype=np.int32, mode="r+", shape=(self.capacity,))
+
+    def _grow(self, capacity: int) -> None:
+        self.close()
+        # agrandir le fichier suffit : la nouvelle zone est lue comme des zéros
+        os.truncate(self.vectors_path, capacity * self.embedder.dim * 4)
+        os.truncate(self.keys_path, capacity * 8)
+        os.truncate(self.lists_path, capacity * 4)
+        self.capacity = capacity
+        self._map()
+
+    def _index_rows(self) -> None:
+        self.rows = {}
+        for row, key in enumerate(self.keys[:self.count].tolist()):
+            if key != DEAD:
+                self.rows.setdefault(key, []).append(row)
+
+    def _compute_offsets(self) -> None:
+        sizes = np.bincount(self.lists[:self.clustered], minlength=len(self.centroids))
+        self.offsets = np.concatenate(([0], np.cumsum(sizes)))
+
+    def _remove_rows(self, key: int) -> bool:
+        rows = self.rows.pop(key, None)
+        if not rows:
+            return False
+        self.keys[rows] = DEAD
+        self.dead += len(rows)
+        return True
+
+    def _maybe_compact(self) -> None:
+        # index en clusters : les lignes mortes partent au prochain clustering (needs_clustering)
+        if self.clustered or self.dead < 1024 or self.dead * 2 < self.count:
+            return
+        alive = np.flatnonzero(self.keys[:self.count] != DEAD)
+        # destination toujours avant la source : la copie par blocs ne réécrit rien qui reste à lire
+        for start in range(0, len(alive), SEARCH_BLOCK_ROWS):
+            source = alive[start:start + SEARCH_BLOCK_ROWS]
+            self.vectors[start:start + len(source)] = self.vectors[source]
+            self.keys[start:start + len(source)] = self.keys[source]
+        self.count, self.dead = len(alive), 0
+        self._index_rows()
+
+    def _write_header(self) -> None:
+        for array in (self.vectors, self.keys, self.lists):
+            array.flush()
+        header = {"embedder": self.embedder.name, "dim": self.embedder.dim, "count": self.count,
+                  "dead": self.dead, "capacity": self.capacity, "clustered": self.clustered}
+        temp_path = self.header_path + ".tmp"
+        with open(temp_path, "w") as handle:
+            json.dump(header, handle)
+        os.replace(temp_path, self.header_path)
+
+
+class VectorIndex:
+    """Per-course similarity index over note and video chunks, stored under VECTOR_INDEX_DIR.
+
+    A course is indexed from the database on its first query; afterwards committed changes are
+    applied incrementally. The files are written by the process that serves the course: with
+    several workers, give each one its own VECTOR_INDEX_DIR.
+    """
+
+    def __init__(self, directory: str, max_open: int, enabled: bool = True):
+        self.enabled = enabled
+        self.directory = directory
+        self._max_open = max_open
+        self._courses: "OrderedDict[int, CourseVectors]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def check_types(types: Sequence[str]) -> None:
+        unknown = set(types) - set(DOC_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown document types: {', '.join(sorted(unknown))}")
+
+    def search(self, db: Session, course_id: int, query: str, types: Sequence[str] = DOC_TYPES,
+               limit: int = 10) -> List[Dict[str, Any]]:
+        self.check_types(types)
+        course = self._ready(db, course_id)
+        queries = course.embedder.embed([query])
+        with course.lock:
+            hits = course.search(queries, limit, types)
+        return self._with_titles(db, course_id, hits)
+
+    def related(self, db: Session, course_id: int, doc_type: str, doc_id: int, types: Sequence[str] = DOC_TYPES,
+                limit: int = 10) -> List[Dict[str, Any]]:
+        """Documents closest to any chunk of the given one (all its chunk vectors are queried at once)."""
+        self.check_types(types)
+        course = self._ready(db, course_id)
+        with course.lock:
+            queries = course.document_vectors(doc_type, doc_id)
+            hits = [] if queries is None else course.search(queries, limit, types, exclude=(doc_type, doc_id))
+        return self._with_titles(db, course_id, hits)
+
+    def rebuild(self, db: Session, course_id: int) -> None:
+        course = self._course(course_id)
+        with course.lock:
+            self._build(db, course_id, course)
+
+    def upsert(self, doc_type: str, doc_id: int, course_id: int, title: Optional[str],
+               bodies: Sequence[Optional[str]]) -> None:
+        """Re-embeds a document if its course is already indexed (otherwise it is picked up by the first build)."""
+        course = self._course(course_id)
+        with course.lock:
+            if course.loaded or course.load():
+                course.replace(doc_type, doc_id, document_chunks(title, bodies))
+
+    def remove(self, doc_type: str, doc_id: int, course_id: int) -> None:
+        course = self._course(course_id)
+        with course.lock:
+            if course.loaded or course.load():
+                course.remove(doc_type, doc_id)
+
+    def reindex(self, db: Session, doc_type: str, doc_id: int) -> None:
+        """Reloads one document from the database and re-embeds it (for writes made with Core statements)."""
+        model, fields = EMBEDDED[doc_type]
+        row = db.execute(
+            select(model.course_id, *(getattr(model, field) for field in fields)).where(model.id == doc_id)
+        ).first()
+        if row is not None:
+            self.upsert(doc_type, doc_id, row[0], row[1], row[2:])
+
+    def drop_course(self, course_id: int) -> None:
+        course = self._course(course_id)
+        with course.lock:
+            course.delete_files()
+        with self._lock:
+            self._courses.pop(course_id, None)
+
+    def _ready(self, db: Session, course_id: int) -> CourseVectors:
+        course = self._course(course_id)
+        with course.lock:
+            if not (course.loaded or course.load()):
+                self._build(db, course_id, course)
+            if course.needs_clustering:
+                # fait par la lecture, comme la construction : les écritures restent rapides
+                course.cluster()
+        return course
+
+    def _course(self, course_id: int) -> CourseVectors:
+        with self._lock:
+            course = self._courses.get(course_id)
+            if course is None:
+                course = CourseVectors(self.directory, course_id, services.get("embedder"))
+                self._courses[course_id] = course
+                while len(self._courses) > self._max_open:
+                    _, evicted = self._courses.popitem(last=False)
+                    with evicted.lock:
+                        evicted.close()
+            else:
+                self._courses.move_to_end(course_id)
+            return course
+
+    @staticmethod
+    def _build(db: Session, course_id: int, course: CourseVectors) -> None:
+        course.reset()
+        for doc_type, (model, fields) in EMBEDDED.items():
+            columns = [model.id] + [getattr(model, field) for field in fields]
+            query = select(*columns).where(model.course_id == course_id).execution_options(yield_per=EMBED_BATCH)
+            for row in db.execute(query):
+                course.replace(doc_type, row[0], document_chunks(row[1], row[2:]), save=False)
+        course.save()
+
+    @staticmethod
+    def _with_titles(db: Session, course_id: int, hits: List[Tuple[str, int, float]]) -> List[Dict[str, Any]]:
+        titles = {}
+        for doc_type, (model, _) in EMBEDDED.items():
+            ids = [doc_id for hit_type, doc_id, _ in hits if hit_type == doc_type]
+            if ids:
+                titles.update(((doc_type, doc_id), title) for doc_id, title in
+                              db.execute(select(model.id, model.title).where(model.id.in_(ids))))
+        # un document supprimé entre-temps n'a plus de titre : ignoré
+        return [{"type": doc_type, "id": doc_id, "title": titles[(doc_type, doc_id)], "course_id": course_id,
+                 "score": score}
+                for doc_type, doc_id, score in hits if (doc_type, doc_id) in titles]
+
+
+vector_index = VectorIndex(
+    directory=config.VECTOR_INDEX_DIR,
+    max_open=config.VECTOR_INDEX_OPEN_COURSES,
+    enabled=config.VECTOR_INDEX_ENABLED
+)
+
+
+# Mise à jour incrémentale : les modifications ORM sont appliquées une fois committées
+_MODEL_TYPES = {model: doc_type for doc_type, (model, _) in EMBEDDED.items()}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_vector_changes(session, flush_context):
+    if not vector_index.enabled:
+        return
+    changes = session.info.setdefault("vector_changes", [])
+    for instance in list(session.new) + list(session.dirty):
+        doc_type = _MODEL_TYPES.get(type(instance))
+        if doc_type is None:
+            continue
+        _, fields = EMBEDDED[doc_type]
+        state = inspect(instance)
+        if instance not in session.new and not any(state.attrs[f].history.has_changes() for f in fields + ("course_id",)):
+            continue # résumé, état de transcription... : texte inchangé
+        previous_course = state.attrs.course_id.history.deleted
+        if previous_course and previous_course[0] != instance.course_id:
+            changes.append(("remove", doc_type, instance.id, previous_course[0], None))
+        changes.append(("upsert", doc_type, instance.id, instance.course_id,
+                        [getattr(instance, field) for field in fields]))
+    for instance in session.deleted:
+        doc_type = _MODEL_TYPES.get(type(instance))
+        if doc_type is not None:
+            changes.append(("remove", doc_type, instance.id, instance.course_id, None))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_vector_changes(session):
+    changes = session.info.pop("vector_changes", None)
+    if not changes:
+        return
+    for action, doc_type, doc_id, course_id, values in changes:
+        try:
+            if action == "remove":
+                vector_index.remove(doc_type, doc_id, course_id)
+            else:
+                vector_index.upsert(doc_type, doc_id, course_id, values[0], values[1:])
+        except Exception as e:
+            # l'index se reconstruit depuis la base : ne jamais faire échouer l'écriture
+            logger.error(f"Unable to update the vector index for {doc_type} {doc_id}: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_vector_changes(session):
+    session.info.pop("vector_changes", None)
@@ -0,0 +1,82 @@
+"""Measures the per-request cost of MetricsMiddleware and of the per-statement SQL hook.
+
+Usage:
+    python -m benchmarks.bench_metrics_overhead [--requests 20000]
+
+The same trivial route is driven through the ASGI interface with and without the
+middleware; the difference of the median per-request times is the instrumentation overhead.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ["METRICS_ENABLED"] = "true"
+
+from fastapi import FastAPI
+
+from app.services.metrics import MetricsMiddleware, record_sql_statement
+
+SCOPE = {
+    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+    "scheme": "http", "path": "/items/1", "raw_path": b"/items/1", "query_string": b"",
+    "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+}
+
+
+def make_app(instrumented):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def drive(app, requests):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await app(dict(SCOPE), receive, send)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    plain, instrumented = make_app(False), make_app(True)
+    asyncio.run(drive(plain, 1000))  # warm-up
+    asyncio.run(drive(instrumented, 1000))
+
+    deltas = []
+    for _ in range(args.rounds):
+        base = statistics.median(asyncio.run(drive(plain, args.requests)))
+        with_metrics = statistics.median(asyncio.run(drive(instrumented, args.requests)))
+        deltas.append(with_metrics - base)
+        print(f"plain {base * 1e6:8.1f} us   instrumented {with_metrics * 1e6:8.1f} us   "
+              f"overhead {(with_metrics - base) * 1e6:6.1f} us")
+    print(f"median middleware overhead: {statistics.median(deltas) * 1e6:.1f} us/request")
+
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        record_sql_statement(0.001)
+    print(f"SQL hook: {(time.perf_counter() - start) / args.requests * 1e6:.2f} us/statement")
+
+
+if __name__ == "__main__":
+    main()
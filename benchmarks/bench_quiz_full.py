@@ -0,0 +1,92 @@
+"""Checks that GET /quizzes/{id}/full runs a fixed number of queries, whatever the number of questions.
+
+Usage:
+    python -m benchmarks.bench_quiz_full [--database-url URL] [--sizes 1 50] [--answers 4]
+
+Creates one quiz per size, then counts the SQL statements (before_cursor_execute) of the
+first GET /quizzes/{id}/full of each quiz, served from the database. Runs against a
+temporary SQLite database by default. Exits with status 1 when the counts differ.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+if __name__ == "__main__":
+    # avant l'import de l'application : le moteur est créé à l'import
+    for index, arg in enumerate(sys.argv):
+        if arg == "--database-url" and index + 1 < len(sys.argv):
+            os.environ["DATABASE_URL"] = sys.argv[index + 1]
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='memoai-quiz-full-')}/bench.db")
+    os.environ.setdefault("TRANSCRIPT_POLL_INTERVAL", "3600")
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.models.course import Course
+from app.services.db import Base, SessionLocal, engine
+from app.services.quiz_persistence import QuizPersistenceService
+
+
+def make_quiz_data(num_questions, num_answers):
+    return {
+        "title": f"Quiz with {num_questions} questions",
+        "description": "Generated for benchmarking",
+        "questions": [
+            {
+                "text": f"Question {i}",
+                "explanation": f"Explanation {i}",
+                "answers": [{"text": f"Answer {i}.{j}", "is_correct": j == 0} for j in range(num_answers)],
+            }
+            for i in range(num_questions)
+        ],
+    }
+
+
+def count_statements(client, quiz_id):
+    statements = []
+
+    def count_statement(*args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        response = client.get(f"/quizzes/{quiz_id}/full")
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+    response.raise_for_status()
+    return len(statements), len(response.json()["questions"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.environ["DATABASE_URL"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 50])
+    parser.add_argument("--answers", type=int, default=4)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        course = Course(title="Quiz full benchmark")
+        db.add(course)
+        db.flush()
+        quiz_ids = [QuizPersistenceService.create_quiz_tree(db, course.id, make_quiz_data(size, args.answers))
+                    for size in args.sizes]
+        db.commit()
+
+    counts = []
+    print(f"{'questions':>10} {'returned':>9} {'statements':>11}")
+    with TestClient(app) as client:
+        for size, quiz_id in zip(args.sizes, quiz_ids):
+            statements, returned = count_statements(client, quiz_id)
+            counts.append(statements)
+            print(f"{size:>10} {returned:>9} {statements:>11}")
+
+    ok = len(set(counts)) == 1
+    print(f"  {'ok  ' if ok else 'FAIL'} query count does not grow with the number of questions")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
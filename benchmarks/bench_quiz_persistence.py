@@ -0,0 +1,106 @@
+"""Compares the legacy per-question flush path with QuizPersistenceService.
+
+Usage:
+    python -m benchmarks.bench_quiz_persistence [--database-url URL] [--repeat N]
+
+Runs against an in-memory SQLite database by default. Pass a PostgreSQL URL to
+measure real network round-trips.
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from app.services.db import Base
+from app.models.course import Course
+from app.models.quiz import Quiz
+from app.models.question import Question
+from app.models.answer import Answer
+from app.services.quiz_persistence import QuizPersistenceService
+
+SIZES = (10, 100, 1000)
+
+
+def make_quiz_data(num_questions):
+    return {
+        "title": "Benchmark quiz",
+        "description": "Generated for benchmarking",
+        "questions": [
+            {
+                "text": f"Question {i}",
+                "explanation": f"Explanation {i}",
+                "answers": [{"text": f"Answer {i}.{j}", "is_correct": j == 0} for j in range(4)],
+            }
+            for i in range(num_questions)
+        ],
+    }
+
+
+def legacy_create_quiz_tree(db, course_id, quiz_data):
+    # chemin historique de routes/ai.py : un flush par question
+    db_quiz = Quiz(title=quiz_data["title"], description=quiz_data["description"], course_id=course_id)
+    db.add(db_quiz)
+    db.flush()
+    for question_data in quiz_data["questions"]:
+        db_question = Question(text=question_data["text"], explanation=question_data.get("explanation", ""),
+                               quiz_id=db_quiz.id)
+        db.add(db_question)
+        db.flush()
+        for answer_data in question_data["answers"]:
+            db.add(Answer(text=answer_data["text"], is_correct=answer_data["is_correct"], question_id=db_question.id))
+    db.flush()
+    return db_quiz.id
+
+
+def bulk_create_quiz_tree(db, course_id, quiz_data):
+    return QuizPersistenceService.create_quiz_tree(db, course_id, quiz_data)
+
+
+def run(engine, writer, quiz_data, repeat):
+    statements = []
+
+    def count_statement(*args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    timings = []
+    try:
+        for _ in range(repeat):
+            with Session(engine) as db:
+                course = Course(title="Benchmark course")
+                db.add(course)
+                db.commit()
+                statements.clear()
+                start = time.perf_counter()
+                writer(db, course.id, quiz_data)
+                db.commit()
+                timings.append(time.perf_counter() - start)
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+    return statistics.median(timings), len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=os.environ["DATABASE_URL"])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(engine)
+
+    print(f"{'questions':>10} {'path':>8} {'median ms':>10} {'statements':>11}")
+    for size in SIZES:
+        quiz_data = make_quiz_data(size)
+        for name, writer in (("legacy", legacy_create_quiz_tree), ("bulk", bulk_create_quiz_tree)):
+            median, statements = run(engine, writer, quiz_data, args.repeat)
+            print(f"{size:>10} {name:>8} {median * 1000:>10.2f} {statements:>11}")
+
+
+if __name__ == "__main__":
+    main()
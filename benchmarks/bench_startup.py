@@ -0,0 +1,96 @@
+"""Measures how fast a fresh worker becomes ready: cold import, startup and first requests.
+
+Usage:
+    python -m benchmarks.bench_startup [--runs 5] [--without-openai-key]
+
+Each run is a fresh interpreter (cold imports, empty SQLite database). Reported per run:
+import of app.main, lifespan startup, the first and second GET /courses/ and whether the
+OpenAI / Cloudinary SDKs were imported by then. The table shows the median over the runs.
+With --without-openai-key, OPENAI_API_KEY is removed from the environment: the CRUD
+endpoints must still answer 200.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def child():
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ.setdefault("TRANSCRIPT_POLL_INTERVAL", "3600")
+
+    from fastapi.testclient import TestClient  # hors mesure : outillage de test
+
+    start = time.perf_counter()
+    from app.main import app
+    import_seconds = time.perf_counter() - start
+
+    from app.services.db import Base, engine
+    Base.metadata.create_all(engine)
+
+    client = TestClient(app)
+    start = time.perf_counter()
+    client.__enter__()
+    startup_seconds = time.perf_counter() - start
+
+    timings, statuses = [], []
+    for _ in range(2):
+        start = time.perf_counter()
+        response = client.get("/courses/")
+        timings.append(time.perf_counter() - start)
+        statuses.append(response.status_code)
+    client.__exit__(None, None, None)
+
+    print(json.dumps({
+        "import_s": import_seconds,
+        "startup_s": startup_seconds,
+        "first_request_s": timings[0],
+        "second_request_s": timings[1],
+        "statuses": statuses,
+        "openai_imported": "openai" in sys.modules,
+        "cloudinary_imported": "cloudinary" in sys.modules,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--without-openai-key", action="store_true")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    env = dict(os.environ)
+    if args.without_openai_key:
+        env.pop("OPENAI_API_KEY", None)
+    else:
+        env.setdefault("OPENAI_API_KEY", "benchmark")
+
+    results = []
+    for _ in range(args.runs):
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+            env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            sys.exit(f"Startup failed:\n{completed.stderr}")
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    for key in ("import_s", "startup_s", "first_request_s", "second_request_s"):
+        print(f"{key:>18}: {statistics.median(result[key] for result in results) * 1000:8.1f} ms")
+    last = results[-1]
+    print(f"{'statuses':>18}: {last['statuses']}")
+    print(f"{'openai imported':>18}: {last['openai_imported']}")
+    print(f"{'cloudinary imported':>18}: {last['cloudinary_imported']}")
+
+
+if __name__ == "__main__":
+    main()
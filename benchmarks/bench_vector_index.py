@@ -0,0 +1,112 @@
+"""Measures top-k queries of the vector index over a large course, exact scan vs clustered (IVF).
+
+Usage:
+    python -m benchmarks.bench_vector_index [--rows 1000000] [--dim 256] [--queries 20] [--related-chunks 8]
+
+Fills one course matrix with synthetic unit vectors grouped around topics (written straight
+into the memory map: the embedder is not benchmarked here). Times a semantic query (one
+query vector) and a "related" query (several chunk vectors at once) with a full scan, then
+clusters the course and times the same queries with VECTOR_IVF_PROBES clusters per vector,
+reporting the recall of the top 10 documents against the full scan. Warm page cache.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import numpy as np
+
+from app.config import config
+from app.services.vector_index import CourseVectors, HashingEmbedder
+
+CHUNKS_PER_DOCUMENT = 4
+TOPICS = 2000
+
+
+def fill(course, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    dim = course.embedder.dim
+    topics = rng.standard_normal((TOPICS, dim), dtype=np.float32)
+    course.reset(capacity=rows)
+    block = 100_000
+    for start in range(0, rows, block):
+        size = min(block, rows - start)
+        documents = np.arange(start, start + size) // CHUNKS_PER_DOCUMENT
+        # les morceaux d'un document partagent un sujet
+        vectors = topics[documents % TOPICS] + rng.standard_normal((size, dim), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        course.vectors[start:start + size] = vectors
+        course.keys[start:start + size] = documents * 2 # _doc_key("note", id)
+        course.lists[start:start + size] = -1
+    course.count = rows
+    course.save()
+    course.load()
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--related-chunks", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        course = CourseVectors(directory, 1, HashingEmbedder(args.dim))
+        start = time.perf_counter()
+        fill(course, args.rows)
+        print(f"{args.rows} rows x {args.dim} dims ({args.rows * args.dim * 4 / 1024 ** 2:.0f} MB) "
+              f"written and loaded in {time.perf_counter() - start:.1f} s")
+
+        rng = np.random.default_rng(1)
+        document_ids = rng.choice(args.rows // CHUNKS_PER_DOCUMENT, size=args.queries, replace=False)
+        semantic = [course.document_vectors("note", int(doc_id))[:1] for doc_id in document_ids]
+        related = []
+        for doc_id in document_ids:
+            vectors = course.document_vectors("note", int(doc_id))
+            related.append(np.vstack([vectors] * (args.related_chunks // len(vectors) + 1))[:args.related_chunks])
+
+        def run(queries, exclude):
+            return [course.search(q, 10, ("note",), exclude=("note", int(d)) if exclude else None)
+                    for q, d in zip(queries, document_ids)]
+
+        results = {}
+        for mode in ("full scan", "clustered"):
+            if mode == "clustered":
+                start = time.perf_counter()
+                course.cluster()
+                print(f"clustered into {len(course.centroids)} lists in {time.perf_counter() - start:.1f} s "
+                      f"(probes: {config.VECTOR_IVF_PROBES})")
+            run(semantic, False) # préchauffe le cache de pages
+            for label, queries, exclude in (("semantic (1 vector)", semantic, False),
+                                            (f"related ({args.related_chunks} vectors)", related, True)):
+                iterator = iter(zip(queries, document_ids))
+                median, worst = timed(lambda: course.search(next(iterator)[0], 10, ("note",)), len(queries))
+                hits = run(queries, exclude)
+                line = f"{mode:>10} {label:>22}: median {median:7.1f} ms  max {worst:7.1f} ms"
+                if mode == "clustered":
+                    exact = results[label]
+                    recall = statistics.mean(
+                        len({h[1] for h in approx} & {h[1] for h in truth}) / max(len(truth), 1)
+                        for approx, truth in zip(hits, exact)
+                    )
+                    line += f"  recall@10 {recall:.2f}"
+                results[label] = hits
+                print(line)
+        course.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Measures peak RSS of POST /videos/upload as the uploaded file grows.
+
+Usage:
+    python -m benchmarks.bench_video_upload_memory [--sizes 16 64 256] [--mode raw|multipart]
+
+Each size runs in a fresh subprocess so ru_maxrss is not shared between runs. The request
+body is generated chunk by chunk and fed straight to the ASGI app, and the Cloudinary upload
+is replaced by a local sink that reads the spooled file in Cloudinary-sized chunks: only the
+server side of the upload is measured. Growth should stop at about two
+VIDEO_UPLOAD_CHUNK_SIZE chunks (the chunk read from disk and its copy in the request).
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+ASGI_CHUNK = 64 * 1024
+BOUNDARY = "memoai-benchmark-boundary"
+
+
+def body_chunks(size, mode):
+    block = os.urandom(ASGI_CHUNK)
+    if mode == "multipart":
+        yield (
+            f"--{BOUNDARY}\r\n"
+            'Content-Disposition: form-data; name="file"; filename="video.mp4"\r\n'
+            "Content-Type: video/mp4\r\n\r\n"
+        ).encode()
+    sent = 0
+    while sent < size:
+        chunk = block[:min(ASGI_CHUNK, size - sent)]
+        sent += len(chunk)
+        yield chunk
+    if mode == "multipart":
+        fields = {"title": "Benchmark video", "course_id": "1"}
+        epilogue = "".join(
+            f'\r\n--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}'
+            for name, value in fields.items()
+        )
+        yield f"{epilogue}\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def upload(app, size, mode):
+    if mode == "multipart":
+        query = "generate_transcript=false"
+        content_type = f"multipart/form-data; boundary={BOUNDARY}"
+    else:
+        query = "generate_transcript=false&title=Benchmark+video&course_id=1"
+        content_type = "video/mp4"
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/videos/upload", "raw_path": b"/videos/upload",
+        "query_string": query.encode(), "root_path": "", "client": ("127.0.0.1", 1), "server": ("test", 80),
+        "headers": [(b"content-type", content_type.encode())],
+    }
+    chunks = body_chunks(size, mode)
+    status = {}
+
+    async def receive():
+        chunk = next(chunks, None)
+        if chunk is None:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        return {"type": "http.request", "body": chunk, "more_body": True}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        elif message["type"] == "http.response.body":
+            status.setdefault("body", b"")
+            status["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    if status.get("code") != 201:
+        raise RuntimeError(f"Upload failed with status {status.get('code')}: {status.get('body')!r}")
+
+
+def child(size_mb, mode):
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+    from fastapi import FastAPI
+    from app.config import config
+    from app.routes import videos
+    from app.services.db import Base, SessionLocal, engine
+    from app.services.cloudinary_service import CloudinaryService
+    from app.models.course import Course
+    import app.models  # noqa: F401
+
+    def local_sink(file, filename=None, **kwargs):
+        stream = open(file, "rb") if isinstance(file, str) else file
+        with stream:
+            read = 0
+            while True:
+                chunk = stream.read(config.VIDEO_UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                read += len(chunk)
+        return {"public_id": "benchmark", "url": "http://local/video.mp4",
+                "secure_url": "https://local/video.mp4", "resource_type": "video", "duration": read}
+
+    CloudinaryService.upload_video = staticmethod(local_sink)
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.add(Course(title="Benchmark course"))
+        db.commit()
+
+    app = FastAPI()
+    app.include_router(videos.router)
+
+    asyncio.run(upload(app, 1024 * 1024, mode))  # warm-up
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    asyncio.run(upload(app, size_mb * 1024 * 1024, mode))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"size_mb": size_mb, "mode": mode, "baseline_rss_kb": baseline, "peak_rss_kb": peak}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 64, 256], help="file sizes in MB")
+    parser.add_argument("--mode", choices=["raw", "multipart"], default="raw")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        child(args.child, args.mode)
+        return
+
+    print(f"{'size MB':>8} {'mode':>10} {'peak RSS MB':>12} {'growth MB':>10}")
+    for size_mb in args.sizes:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_video_upload_memory", "--child", str(size_mb), "--mode", args.mode],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        growth = (result["peak_rss_kb"] - result["baseline_rss_kb"]) / 1024
+        print(f"{size_mb:>8} {args.mode:>10} {result['peak_rss_kb'] / 1024:>12.1f} {growth:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
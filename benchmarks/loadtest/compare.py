@@ -0,0 +1,74 @@
+"""Compares two load-test result files and flags regressions.
+
+Usage:
+    python -m benchmarks.loadtest.compare baseline.json candidate.json [--threshold 10] [--fail-on-regression]
+
+For each endpoint of the isolated phases: p50/p95/p99 latency, throughput and peak RSS,
+with the relative change. A p95 latency or peak RSS increase, or a throughput decrease,
+larger than --threshold percent is reported as a regression.
+"""
+import argparse
+import json
+import sys
+
+METRICS = (
+    # (libellé, chemin dans le résultat, une hausse est-elle une régression)
+    ("p50 ms", ("latency_ms", "p50"), True),
+    ("p95 ms", ("latency_ms", "p95"), True),
+    ("p99 ms", ("latency_ms", "p99"), True),
+    ("req/s", ("throughput_rps",), False),
+    ("rss MB", ("peak_rss_mb",), True),
+)
+GATED = ("p95 ms", "req/s", "rss MB")
+
+
+def lookup(result, path):
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.baseline) as handle:
+        baseline = json.load(handle)
+    with open(args.candidate) as handle:
+        candidate = json.load(handle)
+
+    print(f"baseline {baseline['meta'].get('git_commit')}  candidate {candidate['meta'].get('git_commit')}")
+    print(f"{'endpoint':>22} {'metric':>7} {'baseline':>10} {'candidate':>10} {'change':>8}")
+    regressions = []
+    for name in sorted(set(baseline["endpoints"]) | set(candidate["endpoints"])):
+        before, after = baseline["endpoints"].get(name), candidate["endpoints"].get(name)
+        if before is None or after is None:
+            print(f"{name:>22} {'only in ' + ('candidate' if before is None else 'baseline'):>38}")
+            continue
+        for label, path, higher_is_worse in METRICS:
+            old, new = lookup(before, path), lookup(after, path)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            worse = change > args.threshold if higher_is_worse else change < -args.threshold
+            flag = " !" if worse and label in GATED else ""
+            if flag:
+                regressions.append(f"{name} {label} {change:+.1f}%")
+            print(f"{name:>22} {label:>7} {old:>10} {new:>10} {change:>+7.1f}%{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
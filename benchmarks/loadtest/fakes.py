@@ -0,0 +1,191 @@
+"""Local stand-ins for the OpenAI and Cloudinary HTTP APIs.
+
+Both run in the load-test process on uvicorn threads. The app under test reaches them
+through OPENAI_BASE_URL and the upload_prefix parameter of CLOUDINARY_URL, so the real
+SDK code paths (HTTP client, retries, streaming, chunked uploads) are exercised.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+WORDS = ("memory", "python", "function", "variable", "loop", "class", "module", "course",
+         "summary", "concept", "example", "definition", "student", "lesson", "review")
+
+
+class FakeOpenAIConfig:
+    def __init__(self, first_token_ms: float = 300, token_ms: float = 10, completion_words: int = 120,
+                 stall_rate: float = 0.0, stall_ms: float = 0.0, error_rate: float = 0.0, error_burst: int = 0):
+        self.first_token_ms = first_token_ms # latence avant le premier token
+        self.token_ms = token_ms # délai entre deux tokens
+        self.completion_words = completion_words # longueur des réponses texte
+        # pannes injectées (modifiables pendant le test) : part des requêtes ralenties de stall_ms ou en erreur 500
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self.error_rate = error_rate
+        self.error_burst = error_burst # les error_burst prochaines requêtes répondent 500
+
+
+def _completion_text(prompt: str, words: int) -> str:
+    quiz = re.search(r"Generate a quiz with (\d+) questions", prompt)
+    if quiz:
+        return json.dumps({
+            "title": "Load test quiz",
+            "description": "Generated by the fake OpenAI server",
+            "questions": [
+                {
+                    "text": f"Question {index} about {WORDS[index % len(WORDS)]}?",
+                    "explanation": "Because it is the first answer.",
+                    "answers": [{"text": f"Answer {answer}", "is_correct": answer == 0} for answer in range(4)],
+                }
+                for index in range(int(quiz.group(1)))
+            ],
+        }, indent=2)
+    flashcards = re.search(r"Create (\d+) flashcards", prompt)
+    if flashcards:
+        return json.dumps({"flashcards": [
+            {"question": f"What is {WORDS[index % len(WORDS)]}?", "answer": "A key concept of the course."}
+            for index in range(int(flashcards.group(1)))
+        ]})
+    return " ".join(WORDS[index % len(WORDS)] for index in range(words)) + "."
+
+
+def _tokens(text: str):
+    # découpage approximatif en tokens : un mot (avec son espace) par token
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+def create_fake_openai(settings: FakeOpenAIConfig) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        try:
+            body = await request.json()
+        except ClientDisconnect: # appel abandonné par le client (délai, requête doublée)
+            return Response(status_code=499)
+        app.state.requests += 1
+        if settings.error_burst > 0 or random.random() < settings.error_rate:
+            settings.error_burst = max(settings.error_burst - 1, 0)
+            return JSONResponse({"error": {"message": "Injected failure", "type": "server_error"}}, status_code=500)
+        if random.random() < settings.stall_rate:
+            await asyncio.sleep(settings.stall_ms / 1000)
+        prompt = body["messages"][-1]["content"]
+        text = _completion_text(prompt, settings.completion_words)
+        tokens = _tokens(text)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(tokens),
+                 "total_tokens": len(prompt) // 4 + len(tokens)}
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time()), "model": body["model"]}
+
+        if not body.get("stream"):
+            await asyncio.sleep((settings.first_token_ms + settings.token_ms * len(tokens)) / 1000)
+            return JSONResponse({
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        async def events():
+            await asyncio.sleep(settings.first_token_ms / 1000)
+            for token in tokens:
+                chunk = {**base, "object": "chat.completion.chunk",
+                         "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(settings.token_ms / 1000)
+            done = {**base, "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield f"data: {json.dumps(done)}\n\n"
+            if (body.get("stream_options") or {}).get("include_usage"):
+                yield f"data: {json.dumps({**base, 'object': 'chat.completion.chunk', 'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def create_fake_cloudinary(latency_ms: float = 50) -> FastAPI:
+    app = FastAPI()
+    app.state.uploaded_bytes = 0
+    app.state.destroyed = 0
+    app.state.latency_ms = latency_ms
+    app.state.error_rate = 0.0 # part des requêtes en erreur 500 (modifiable pendant le test)
+    app.state.requests = 0
+
+    @app.middleware("http")
+    async def inject_errors(request: Request, call_next):
+        app.state.requests += 1
+        if random.random() < app.state.error_rate:
+            return JSONResponse({"error": {"message": "Injected failure"}}, status_code=500)
+        return await call_next(request)
+
+    @app.post("/v1_1/{cloud_name}/{resource_type}/upload")
+    async def upload(cloud_name: str, resource_type: str, request: Request):
+        size = 0
+        async for chunk in request.stream(): # corps multipart non analysé : seul le volume compte
+            size += len(chunk)
+        app.state.uploaded_bytes += size
+        await asyncio.sleep(app.state.latency_ms / 1000)
+        total = re.search(r"/(\d+)$", request.headers.get("content-range", ""))
+        upload_id = request.headers.get("x-unique-upload-id") or uuid.uuid4().hex
+        public_id = f"course_videos/{upload_id}"
+        url = f"http://res.cloudinary.test/{cloud_name}/{resource_type}/upload/{public_id}.mp4"
+        return {
+            "public_id": public_id, "url": url, "secure_url": url.replace("http://", "https://"),
+            "resource_type": resource_type, "format": "mp4", "duration": 60,
+            "bytes": int(total.group(1)) if total else size,
+        }
+
+    @app.post("/v1_1/{cloud_name}/{resource_type}/destroy")
+    async def destroy(cloud_name: str, resource_type: str):
+        app.state.destroyed += 1
+        await asyncio.sleep(app.state.latency_ms / 1000)
+        return {"result": "ok"}
+
+    @app.delete("/v1_1/{cloud_name}/resources/{resource_type}/upload")
+    async def delete_resources(cloud_name: str, resource_type: str, request: Request):
+        # Admin API : corps JSON {"public_ids": [...]}
+        public_ids = (await request.json()).get("public_ids", [])
+        app.state.destroyed += len(public_ids)
+        await asyncio.sleep(app.state.latency_ms / 1000)
+        return {"deleted": {public_id: "deleted" for public_id in public_ids}, "partial": False}
+
+    return app
+
+
+class _ThreadedServer(uvicorn.Server):
+    def install_signal_handlers(self):
+        pass
+
+
+class BackgroundServer:
+    """Runs an ASGI app with uvicorn on a daemon thread of the current process."""
+
+    def __init__(self, app, port: int):
+        self.app = app
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self._server = _ThreadedServer(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self) -> "BackgroundServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Fake server on port {self.port} did not start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
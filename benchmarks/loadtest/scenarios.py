@@ -0,0 +1,75 @@
+"""Requests driven by the load test, one Scenario per endpoint, and the default traffic mix."""
+import random
+from typing import Any, Callable, Dict, List, Tuple
+
+# Contenu de note d'environ 4 ko : plusieurs paragraphes, comme une vraie prise de notes
+NOTE_PARAGRAPH = ("Python functions are first-class objects: they can be passed as arguments, "
+                  "returned from other functions and stored in data structures. ") * 4
+
+
+class Context:
+    """Ids created while seeding, used to build request paths."""
+
+    def __init__(self):
+        self.course_ids: List[int] = []
+        self.note_ids: List[int] = []
+        self.video_ids: List[int] = []
+        self.quiz_ids: List[int] = []
+        self.upload_body = b""
+
+
+Request = Tuple[str, str, Dict[str, Any]] # method, path, kwargs httpx
+
+
+class Scenario:
+    def __init__(self, name: str, weight: float, build: Callable[[Context, random.Random], Request],
+                 expected: Tuple[int, ...] = (200,)):
+        self.name = name
+        self.weight = weight # poids dans le mélange de trafic
+        self.build = build
+        self.expected = expected
+
+
+def note_content(rng: random.Random) -> str:
+    return "\n\n".join(f"{NOTE_PARAGRAPH} (part {rng.randint(0, 10 ** 9)})" for _ in range(5))
+
+
+SCENARIOS = [
+    Scenario("courses.list", 10, lambda ctx, rng: ("GET", "/courses/", {"params": {"limit": 20}})),
+    Scenario("courses.get", 10, lambda ctx, rng: ("GET", f"/courses/{rng.choice(ctx.course_ids)}", {})),
+    Scenario("courses.create", 2, lambda ctx, rng: (
+        "POST", "/courses/", {"json": {"title": f"Course {rng.randint(0, 10 ** 9)}", "description": "Load test"}}
+    ), expected=(201,)),
+    Scenario("courses.flashcards", 4, lambda ctx, rng: (
+        "GET", f"/courses/{rng.choice(ctx.course_ids)}/flashcards", {})),
+    Scenario("notes.list", 10, lambda ctx, rng: (
+        "GET", "/notes/", {"params": {"course_id": rng.choice(ctx.course_ids), "limit": 20}})),
+    Scenario("notes.get", 10, lambda ctx, rng: ("GET", f"/notes/{rng.choice(ctx.note_ids)}", {})),
+    Scenario("notes.create", 3, lambda ctx, rng: (
+        "POST", "/notes/", {"json": {"title": "Load test note", "content": note_content(rng),
+                                      "course_id": rng.choice(ctx.course_ids)}}
+    ), expected=(201,)),
+    Scenario("notes.update", 2, lambda ctx, rng: (
+        "PUT", f"/notes/{rng.choice(ctx.note_ids)}", {"json": {"content": note_content(rng)}})),
+    Scenario("notes.flashcards", 3, lambda ctx, rng: (
+        "POST", f"/notes/{rng.choice(ctx.note_ids)}/generate-flashcards", {"params": {"num_cards": 5}})),
+    Scenario("quizzes.list", 6, lambda ctx, rng: ("GET", "/quizzes/", {"params": {"limit": 20}})),
+    Scenario("quizzes.full", 6, lambda ctx, rng: ("GET", f"/quizzes/{rng.choice(ctx.quiz_ids)}/full", {})),
+    Scenario("videos.list", 6, lambda ctx, rng: ("GET", "/videos/", {"params": {"limit": 20}})),
+    Scenario("videos.upload", 1, lambda ctx, rng: (
+        "POST", "/videos/upload",
+        {"params": {"title": "Load test video", "course_id": rng.choice(ctx.course_ids)},
+         "content": ctx.upload_body, "headers": {"content-type": "video/mp4"}}
+    ), expected=(201,)),
+    Scenario("search", 6, lambda ctx, rng: (
+        "GET", "/search/", {"params": {"q": rng.choice(["python functions", "loop", "class module"])}})),
+    Scenario("ai.generate_quiz", 1, lambda ctx, rng: (
+        "POST", f"/ai/generate-quiz/{rng.choice(ctx.course_ids)}", {"params": {"num_questions": 5}}
+    ), expected=(202,)),
+    Scenario("ai.quiz_stream", 1, lambda ctx, rng: (
+        "POST", f"/ai/generate-quiz/{rng.choice(ctx.course_ids)}/stream", {"params": {"num_questions": 5}})),
+    Scenario("notes.summary_stream", 1, lambda ctx, rng: (
+        "POST", f"/notes/{rng.choice(ctx.note_ids)}/regenerate-summary/stream", {"params": {"refresh": True}})),
+]
+
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
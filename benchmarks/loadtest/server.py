@@ -0,0 +1,24 @@
+"""Serves the app for the load test: creates the tables, then runs app.main:app with uvicorn.
+
+Started by python -m benchmarks.loadtest in its own process, so that the memory of the
+app is measured apart from the load generator and the fake services.
+"""
+import argparse
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, required=True)
+    args = parser.parse_args()
+
+    from init_db import init_db
+    init_db()
+
+    from app.main import app
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,145 @@ from app.models.question import Question
 from app.models.answer import Answer
 from app.models.note import Note
 from app.models.video import Video
+from app.models.job import Job
+from app.models.ai_cache import AICacheEntry
+from app.models.note_chunk_summary import NoteChunkSummary
+from app.models.flashcard import Flashcard
+from app.models.quiz_attempt import QuizAttempt
+from app.models.quiz_response import QuizResponse
+from app.models.quiz_stats import QuizStats
+from app.models.question_stats import QuestionStats
+from app.services.search_service import create_search_vectors  # colonnes tsvector + index GIN sur PostgreSQL
 
+from sqlalchemy import MetaData, inspect, literal
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import CreateTable
+
+# clés étrangères déclarées ON DELETE CASCADE après coup : create_all ne modifie pas les tables existantes
+CASCADE_FOREIGN_KEYS = (("quizzes", "course_id"), ("questions", "quiz_id"), ("answers", "question_id"))
+
+# colonnes ajoutées à des tables existantes : (table, colonne)
+ADDED_COLUMNS = (
+    ("questions", "position"),
+    ("jobs", "lease_expires_at"),
+    ("flashcards", "num_cards"),
+    ("videos", "transcript_attempts"),
+    ("videos", "transcript_next_attempt_at"),
+    ("videos", "transcript_error"),
+)
+
+def _add_column_ddl(table, column):
+    model_column = Base.metadata.tables[table].c[column]
+    ddl = f"ALTER TABLE {table} ADD COLUMN {column} {model_column.type.compile(dialect=engine.dialect)}"
+    if not model_column.nullable:
+        # les lignes existantes prennent la valeur par défaut du modèle
+        default = literal(model_column.default.arg).compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" NOT NULL DEFAULT {default}"
+    return ddl
+
+def add_missing_columns():
+    """Adds the columns of ADDED_COLUMNS to tables created before them."""
+    with engine.connect() as connection:
+        inspector = inspect(connection)
+        tables = set(inspector.get_table_names())
+        added = []
+        for table, column in ADDED_COLUMNS:
+            if table not in tables or column in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            connection.exec_driver_sql(_add_column_ddl(table, column))
+            added.append(f"{table}.{column}")
+        connection.commit()
+        if added:
+            print(f"Columns added: {', '.join(added)}")
+
+def create_missing_indexes():
+    """Creates the model indexes missing from existing tables (create_all only indexes the tables it creates)."""
+    with engine.connect() as connection:
+        inspector = inspect(connection)
+        tables = set(inspector.get_table_names())
+        created = []
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection)
+                    created.append(index.name)
+        connection.commit()
+        if created:
+            print(f"Indexes created: {', '.join(created)}")
+
+def _foreign_keys_without_cascade(connection):
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table, column in CASCADE_FOREIGN_KEYS:
+        if table not in tables:
+            continue
+        for foreign_key in inspector.get_foreign_keys(table):
+            if (foreign_key["constrained_columns"] == [column]
+                    and foreign_key["options"].get("ondelete", "").upper() != "CASCADE"):
+                missing.append((table, column, foreign_key))
+    return missing
+
+def _rebuild_sqlite_table(connection, name):
+    # SQLite ne sait pas modifier une contrainte : table recopiée sous le schéma des modèles
+    table = Base.metadata.tables[name]
+    existing = {column["name"] for column in inspect(connection).get_columns(name)}
+    columns = ", ".join(column.name for column in table.columns if column.name in existing)
+    metadata = MetaData() # copie des modèles : les clés étrangères de la copie y trouvent leurs tables
+    for model_table in Base.metadata.sorted_tables:
+        model_table.to_metadata(metadata)
+    copy = table.to_metadata(metadata, name=f"{name}_migration")
+    connection.execute(CreateTable(copy))
+    connection.exec_driver_sql(f"INSERT INTO {name}_migration ({columns}) SELECT {columns} FROM {name}")
+    connection.exec_driver_sql(f"DROP TABLE {name}")
+    connection.exec_driver_sql(f"ALTER TABLE {name}_migration RENAME TO {name}")
+    for index in table.indexes:
+        index.create(connection)
+
+def migrate_cascade_foreign_keys():
+    """Recreates the foreign keys of CASCADE_FOREIGN_KEYS with ON DELETE CASCADE on existing databases."""
+    with engine.connect() as connection:
+        missing = _foreign_keys_without_cascade(connection)
+        if not missing:
+            return
+        if engine.dialect.name == "sqlite":
+            # hors transaction : PRAGMA foreign_keys est sans effet dans une transaction
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.commit()
+            try:
+                for table in dict.fromkeys(table for table, _, _ in missing):
+                    _rebuild_sqlite_table(connection, table)
+                if connection.exec_driver_sql("PRAGMA foreign_key_check").first() is not None:
+                    raise RuntimeError("Foreign key violations found, migration rolled back")
+                connection.commit()
+            finally:
+                connection.rollback()
+                connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+                connection.commit()
+        else:
+            quote = connection.dialect.identifier_preparer.quote
+            for table, column, foreign_key in missing:
+                name = quote(foreign_key["name"])
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {quote(table)} DROP CONSTRAINT {name}, "
+                    f"ADD CONSTRAINT {name} FOREIGN KEY ({quote(column)}) "
+                    f"REFERENCES {quote(foreign_key['referred_table'])} (id) ON DELETE CASCADE"
+                )
+            connection.commit()
+        print(f"Foreign keys migrated to ON DELETE CASCADE: {', '.join(f'{t}.{c}' for t, c, _ in missing)}")
 
 def init_db():
     try:
         Base.metadata.create_all(bind=engine)
+        add_missing_columns()
+        migrate_cascade_foreign_keys()
+        create_missing_indexes()
+        with engine.begin() as connection:
+            create_search_vectors(connection)
         print("Database tables created successfully.")
 
         with Session(engine) as session: